@@ -1,26 +1,109 @@
 import os
 from functools import lru_cache
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
-    DB_USER: str
-    DB_PASSWORD: str
-    DB_HOST: str
-    DB_PORT: str
-    DB_NAME: str
-    MYSQL_ROOT_PASSWORD: str
+    DB_BACKEND: Literal["mysql", "sqlite"] = "mysql"
+    DB_USER: str | None = None
+    DB_PASSWORD: str | None = None
+    DB_HOST: str | None = None
+    DB_PORT: str | None = None
+    DB_NAME: str | None = None
+    MYSQL_ROOT_PASSWORD: str | None = None
     TEST_DB_URL: str | None = None
     BASE_DIR: str = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    SQLITE_PATH: str = os.path.join(BASE_DIR, "data", "crypto.db")
+
+    ANALYTICS_ENGINE: Literal["sql", "duckdb"] = "sql"
+    DUCKDB_PATH: str = ":memory:"
+
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 10000
+    DB_WRITE_POOL_SIZE: int = 2
+    DB_WRITE_MAX_OVERFLOW: int = 2
+    DB_WRITE_STATEMENT_TIMEOUT_MS: int = 0
+
+    DB_REPLICA_URLS: list[str] = []
+    DB_REPLICA_STRATEGY: Literal["round_robin", "least_latency"] = "round_robin"
+    DB_REPLICA_MAX_LAG_SECONDS: float = 0
+    DB_REPLICA_CHECK_INTERVAL_SECONDS: float = 10
+
+    COINBASE_API_URL: str = "https://api.coinbase.com"
+    COINBASE_EXCHANGE_URL: str = "https://api.exchange.coinbase.com"
+    COINBASE_WS_URL: str = "wss://ws-feed.exchange.coinbase.com"
+    FX_RATE_URL: str = "https://api.exchangerate-api.com/v4/latest/USD"
+    SYMBOLS_TTL_SECONDS: int = 3600
+    SYMBOLS_CACHE_FILE: str = os.path.join(BASE_DIR, "data", "symbols.json")
+
+    FETCH_MAX_CONCURRENCY: int = 32
+    FETCH_LIMIT_PER_HOST: int = 16
+    FETCH_RATE_LIMIT: float = 0
+    FETCH_HOST_RATE_LIMITS: dict[str, float] = {"api.exchange.coinbase.com": 10}
+    FETCH_TIMEOUT_SECONDS: float = 10
+    FETCH_RETRIES: int = 3
+    FETCH_BACKOFF_BASE_SECONDS: float = 0.25
+    FETCH_BACKOFF_MAX_SECONDS: float = 5
+    FETCH_RETRY_AFTER_MAX_SECONDS: float = 60
+    FETCH_BREAKER_THRESHOLD: int = 5
+    FETCH_BREAKER_RESET_SECONDS: float = 30
+    FETCH_BULK_ENABLED: bool = True
+    FX_RATE_TTL_SECONDS: float = 300
+    FX_RATE_MAX_AGE_SECONDS: float = 6 * 60 * 60
+
+    # Планировщик внутри API; в проде сбор идёт отдельным процессом app.crypto.collector
+    RUN_SCHEDULER: bool = True
+    COLLECTOR_LOCK_NAME: str = "coinbaseparse.collector"
+    COLLECTOR_LOCK_CHECK_SECONDS: float = 5
+    # poll — опрос REST раз в минуту, stream — подписка на ticker по WebSocket
+    INGEST_MODE: Literal["poll", "stream"] = "poll"
+    INGEST_FLUSH_SECONDS: float = 10
+
+    HISTORY_STREAM_CHUNK_SIZE: int = 5000
+    HISTORY_PAGE_SIZE_DEFAULT: int = 1000
+    HISTORY_PAGE_SIZE_MAX: int = 10000
+
+    ROLLUPS_ENABLED: bool = True
+
+    # Секции cryptos (MySQL) и хранение тиков; 0 дней — хранить всё
+    CRYPTOS_PARTITION_INTERVAL: Literal["day", "month"] = "day"
+    CRYPTOS_PARTITIONS_AHEAD: int = 3
+    CRYPTOS_RETENTION_DAYS: int = 0
+    # archive — перед удалением выгрузить в Parquet, drop — просто удалить
+    CRYPTOS_RETENTION_MODE: Literal["archive", "drop"] = "archive"
+    CRYPTOS_ARCHIVE_DIR: str = os.path.join(BASE_DIR, "data", "archive")
+
+    # Как часто каждый процесс API проверяет новые тики для /latest и кэша; 0 — не проверять
+    TICK_WATCH_INTERVAL_SECONDS: float = 5
+
+    RESPONSE_CACHE_SIZE: int = 256
+    RESPONSE_CACHE_TTL_SECONDS: float = 120
+    RESPONSE_CACHE_MAX_ITEMS: int = 10000
+
+    JSON_DECIMAL_MODE: Literal["string", "float"] = "string"
+
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = False
+    LOG_ENQUEUE: bool = True
+    LOG_SAMPLE_INTERVAL_SECONDS: float = 60
 
     @property
     def DB_URL(self) -> str:
+        if self.DB_BACKEND == "sqlite":
+            return f"sqlite+aiosqlite:///{self.SQLITE_PATH}"
         return f"mysql+aiomysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
     @property
     def SYNC_DB_URL(self) -> str:
-        return f"mysql+pymysql://root:{settings.MYSQL_ROOT_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        if self.DB_BACKEND == "sqlite":
+            return f"sqlite:///{self.SQLITE_PATH}"
+        return f"mysql+pymysql://root:{self.MYSQL_ROOT_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
     model_config = SettingsConfigDict(env_file=f"{BASE_DIR}/.env", extra="ignore")
 
@@ -0,0 +1,84 @@
+"""
+Пересчёт часовых и дневных агрегатов по сырым тикам cryptos.
+
+Запуск:
+    python -m app.crypto.backfill
+    python -m app.crypto.backfill --date-from 2025-01-01 --date-to 2025-01-31
+
+Без дат пересчитывается весь период, за который есть данные. Каждый день
+пересчитывается в своей транзакции: агрегаты дня удаляются и строятся заново,
+а пометка неполного дня снимается, поэтому команду можно запускать повторно.
+"""
+import argparse
+import asyncio
+from datetime import date, datetime, time, timedelta
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.crypto.dao import CryptoDAO, CryptoDailyDAO, CryptoHourlyDAO, CryptoRollupDAO, CryptoRollupStaleDAO
+from app.crypto.models import CryptoRollup
+from app.dao.database import write_session_maker
+
+ROLLUP_DAOS: tuple[type[CryptoRollupDAO], ...] = (CryptoHourlyDAO, CryptoDailyDAO)
+
+
+async def backfill_day(session: AsyncSession, day: date) -> int:
+    """Перестроить агрегаты одного дня. Возвращает число учтённых тиков."""
+    dt_from = datetime.combine(day, time.min)
+    dt_to = dt_from + timedelta(days=1)
+
+    for dao in ROLLUP_DAOS:
+        await dao.delete_range(session=session, dt_from=dt_from, dt_to=dt_to)
+
+    rollups: dict[tuple[type[CryptoRollupDAO], str, datetime], CryptoRollup] = {}
+    ticks = 0
+    async for chunk in CryptoDAO.stream_ticks(session=session, dt_from=dt_from, dt_to=dt_to):
+        for name, price, dynamic, created_at in chunk:
+            for dao in ROLLUP_DAOS:
+                key = (dao, name, dao.truncate(created_at))
+                rollup = rollups.get(key)
+                if rollup is None:
+                    rollup = rollups[key] = dao.new_rollup(name, price, created_at)
+                dao.fold(rollup, price, dynamic, created_at)
+            ticks += 1
+
+    session.add_all(rollups.values())
+    await CryptoRollupStaleDAO.clear(session=session, date_from=day, date_to=day)
+    await session.flush()
+    return ticks
+
+
+async def backfill(
+        date_from: date | None = None,
+        date_to: date | None = None,
+        session_maker: async_sessionmaker[AsyncSession] = write_session_maker
+) -> int:
+    """Перестроить агрегаты за период (по умолчанию — за всё время). Возвращает число тиков."""
+    if date_from is None or date_to is None:
+        async with session_maker() as session:
+            first, last = await CryptoDAO.get_created_at_bounds(session=session)
+        if first is None:
+            logger.info("Нет данных для пересчёта агрегатов")
+            return 0
+        date_from = date_from or first.date()
+        date_to = date_to or last.date()
+
+    total = 0
+    day = date_from
+    while day <= date_to:
+        async with session_maker() as session:
+            ticks = await backfill_day(session=session, day=day)
+            await session.commit()
+        logger.info("Агрегаты за {day} пересчитаны: {ticks} тиков", day=day, ticks=ticks)
+        total += ticks
+        day += timedelta(days=1)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--date-from", type=date.fromisoformat)
+    parser.add_argument("--date-to", type=date.fromisoformat)
+    args = parser.parse_args()
+    asyncio.run(backfill(args.date_from, args.date_to))
@@ -0,0 +1,106 @@
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from functools import wraps
+from typing import Any
+
+from app.config import settings
+
+
+class TickCache:
+    """
+    LRU-кэш ответов сервиса чтения.
+
+    Данные меняются только когда планировщик записывает тик, поэтому кэш
+    сбрасывается по номеру поколения тика; TTL — лишь страховка на случай,
+    если сигнал о тике потерялся.
+    """
+
+    def __init__(self, max_size: int, ttl: float, max_items: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_items = max_items
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def bump_generation(self) -> int:
+        """Новый тик записан: всё закэшированное устарело"""
+        self.generation += 1
+        self._entries.clear()
+        return self.generation
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0 or _size(value) > self.max_items:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "generation": self.generation,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def cached[**P, R](self, func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        """
+        Кэшировать результат метода сервиса по имени и именованным параметрам.
+
+        Сессия в ключ не входит; методы должны вызываться с именованными аргументами.
+        """
+
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            key = (func.__qualname__, *sorted((k, v) for k, v in kwargs.items() if k != "session"))
+            found, value = self.get(key)
+            if found:
+                return value
+            generation = self.generation
+            value = await func(*args, **kwargs)
+            # Пока шёл запрос, мог записаться новый тик — такой ответ не кэшируем
+            if generation == self.generation:
+                self.set(key, value)
+            return value
+
+        return wrapper
+
+
+def _size(value: Any) -> int:
+    """Число строк в ответе: страница истории, свечи или просто список"""
+    for attr in ("items", "candles"):
+        items = getattr(value, attr, None)
+        if isinstance(items, list):
+            return len(items)
+    return len(value) if isinstance(value, list) else 1
+
+
+response_cache = TickCache(
+    max_size=settings.RESPONSE_CACHE_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_items=settings.RESPONSE_CACHE_MAX_ITEMS,
+)
@@ -0,0 +1,96 @@
+"""
+Отдельный процесс сбора цен.
+
+    python -m app.crypto.collector
+
+Коллекторов можно запустить сколько угодно: планировщик работает только у
+того, кто держит блокировку лидера, остальные ждут и подхватывают сбор, если
+лидер пропадёт.
+"""
+import asyncio
+import signal
+from collections.abc import Callable
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from loguru import logger
+
+from app.config import settings
+from app.crypto.scheduler import start_scheduler
+from app.crypto.services.FetchPipeline import fetch_pipeline
+from app.dao.database import create_embedded_schema, dispose_engines
+from app.dao.locks import LeaderLock, leader_lock
+from app.log import setup_logging
+
+
+async def _wait(stop: asyncio.Event, seconds: float) -> bool:
+    """Подождать; True — пришёл сигнал остановки"""
+    try:
+        await asyncio.wait_for(stop.wait(), seconds)
+    except TimeoutError:
+        return False
+    return True
+
+
+async def run_collector(
+        lock: LeaderLock,
+        stop: asyncio.Event,
+        check_interval: float = settings.COLLECTOR_LOCK_CHECK_SECONDS,
+        start: Callable[[], AsyncIOScheduler] = start_scheduler
+) -> None:
+    """Ждать лидерства, держать планировщик, пока блокировка за нами, до сигнала stop"""
+    waiting_logged = False
+    try:
+        while not stop.is_set():
+            try:
+                acquired = await lock.acquire()
+            except Exception as e:
+                logger.error("Не удалось взять блокировку коллектора: {error}", error=e)
+                acquired = False
+
+            if not acquired:
+                if not waiting_logged:
+                    logger.info("Сбор ведёт другой коллектор, ожидание")
+                    waiting_logged = True
+                await _wait(stop, check_interval)
+                continue
+
+            logger.info("Коллектор стал ведущим, сбор запущен")
+            waiting_logged = False
+            try:
+                scheduler = start()
+            except Exception:
+                await lock.release()
+                raise
+            try:
+                while not await _wait(stop, check_interval):
+                    if not await lock.is_held():
+                        logger.error("Блокировка коллектора потеряна, сбор остановлен")
+                        break
+            finally:
+                scheduler.shutdown(wait=False)
+                await lock.release()
+    finally:
+        await lock.close()
+
+
+async def main() -> None:
+    setup_logging()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    await create_embedded_schema()
+    try:
+        await run_collector(leader_lock(), stop)
+    finally:
+        await fetch_pipeline.close()
+        await dispose_engines()
+        await logger.complete()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
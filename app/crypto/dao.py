@@ -1,16 +1,85 @@
+from abc import ABC, abstractmethod
+from collections.abc import Collection
+from contextlib import aclosing
 from datetime import date, datetime, time
-from typing import Sequence
+from decimal import Decimal
+from typing import AsyncIterator, Sequence
 
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import ColumnElement, Join, Row, ScalarSelect, Select, select, and_, or_, cast, func, insert, join, literal, union_all
+from sqlalchemy import delete as sqlalchemy_delete
+from sqlalchemy.exc import IntegrityError
 
-from app.dao.base import BaseDAO
-from app.crypto.models import Crypto
+from app.dao import analytics, archive
+from app.dao.backends import statement_timeout
+from app.dao.base import BaseDAO, LookupDAO
+from app.dao.functions import epoch_seconds
+from app.crypto.models import Crypto, CryptoRollup, CryptoHourly, CryptoDaily, CryptoRollupStaleDay, FxRate, Symbol
+from app.crypto.prices import PRICE_RUB
+from app.crypto.schemas import SCryptoCreate
+from app.crypto.pagination import Keyset
+from app.metrics import timed_query
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+async def _fetch_extremes(session: AsyncSession, max_stmt: Select, min_stmt: Select) -> tuple[Row | None, Row | None]:
+    """Первые строки двух отсортированных выборок одним UNION ALL."""
+    stmt = union_all(
+        select(max_stmt.add_columns(literal("max").label("kind")).limit(1).subquery()),
+        select(min_stmt.add_columns(literal("min").label("kind")).limit(1).subquery()),
+    )
+    res = await session.execute(stmt)
+    extremes = {row.kind: row for row in res.all()}
+    return extremes.get("max"), extremes.get("min")
+
+
+class SymbolDAO(LookupDAO[Symbol]):
+    model = Symbol
+    key = "name"
+
+
+class FxRateDAO(LookupDAO[FxRate]):
+    model = FxRate
+    key = "rate"
 
 
 class CryptoDAO(BaseDAO[Crypto]):
     model = Crypto
 
+    @classmethod
+    async def _prepare_rows(cls, session: AsyncSession, values: list[BaseModel]) -> list[dict]:
+        """Имя валюты и курс из схемы заменяются ссылками на справочники"""
+        rows = [val.model_dump(exclude_unset=True) for val in values]
+        symbol_ids = await SymbolDAO.get_ids(session, {row["name"] for row in rows if row.get("name") is not None})
+        fx_rate_ids = await FxRateDAO.get_ids(session, {row["fx_rate"] for row in rows if row.get("fx_rate") is not None})
+        for row in rows:
+            row["symbol_id"] = symbol_ids.get(row.pop("name", None))
+            row["fx_rate_id"] = fx_rate_ids.get(row.pop("fx_rate", None))
+        return rows
+
+    @classmethod
+    def _priced_ticks(cls) -> Join:
+        """Тики вместе с курсом, по которому они записаны"""
+        return join(cls.model, FxRate, FxRate.id == cls.model.fx_rate_id, isouter=True)
+
+    @classmethod
+    def _price(cls) -> ColumnElement[Decimal]:
+        """
+        Цена в рублях: USD × курс тика с масштабом PRICE_RUB, как в app.crypto.prices.to_rub;
+        у старых тиков без курса — сохранённая рублёвая цена
+        """
+        return func.coalesce(
+            cast(cls.model.price_usd * FxRate.rate, PRICE_RUB), cls.model.price_rub_legacy, type_=PRICE_RUB
+        )
+
+    @staticmethod
+    def _symbol_id(currency: str) -> ScalarSelect:
+        """id валюты подзапросом: фильтр остаётся равенством по symbol_id и идёт по индексу"""
+        return select(Symbol.id).where(Symbol.name == currency.upper()).scalar_subquery()
+
     @staticmethod
     def _normalize_dates(date_from: date, date_to: date) -> tuple[datetime, datetime]:
         dt_from = datetime.combine(date_from, time.min)
@@ -18,102 +87,548 @@ class CryptoDAO(BaseDAO[Crypto]):
         return dt_from, dt_to
 
     @classmethod
+    def _select_history(cls) -> Select:
+        """Столбцы ответа истории: (id, name, price, dynamic, created_at); имя — из справочника"""
+        return (
+            select(cls.model.id, Symbol.name, cls._price().label("price"), cls.model.dynamic, cls.model.created_at)
+            .select_from(cls._priced_ticks().join(Symbol, Symbol.id == cls.model.symbol_id))
+        )
+
+    @staticmethod
+    def _live_from(dt_from: datetime) -> datetime:
+        """Начало живой части периода: всё раньше конца архива читается из Parquet"""
+        archived_until = archive.cryptos_archive.archived_until
+        return max(dt_from, archived_until) if archived_until is not None else dt_from
+
+    @staticmethod
+    def _remaining(limit: int | None, rows: Sequence) -> int | None:
+        return None if limit is None else limit - len(rows)
+
+    @classmethod
+    def _keyset(cls, after: Keyset | None) -> list:
+        """Условие "строго после курсора" при сортировке (created_at, id) по убыванию."""
+        if after is None:
+            return []
+        created_at, row_id = after
+        return [
+            or_(
+                cls.model.created_at < created_at,
+                and_(cls.model.created_at == created_at, cls.model.id < row_id)
+            )
+        ]
+
+    @classmethod
+    @timed_query
     async def get_history(
             cls,
             session: AsyncSession,
             date_from: date,
-            date_to: date
-    ) -> Sequence[Crypto]:
-        """История всех валют."""
+            date_to: date,
+            after: Keyset | None = None,
+            limit: int | None = None
+    ) -> Sequence[Row]:
+        """
+        История всех валют. С `after`/`limit` — страница по ключу (created_at, id).
+
+        Строки — кортежи (id, name, price, dynamic, created_at), без ORM-объектов.
+        Периоды, выгруженные политикой хранения, дочитываются из архива.
+        """
         dt_from, dt_to = cls._normalize_dates(date_from, date_to)
+        live_from = cls._live_from(dt_from)
 
         stmt = (
-            select(cls.model)
+            cls._select_history()
             .where(
                 and_(
-                    cls.model.created_at >= dt_from,
-                    cls.model.created_at <= dt_to
+                    cls.model.created_at >= live_from,
+                    cls.model.created_at <= dt_to,
+                    *cls._keyset(after)
                 )
             )
-            .order_by(cls.model.created_at.desc())
+            .order_by(cls.model.created_at.desc(), cls.model.id.desc())
+            .limit(limit)
         )
 
         result = await session.execute(stmt)
-        return result.scalars().all()
+        rows = result.all()
+        remaining = cls._remaining(limit, rows)
+        if live_from > dt_from and remaining != 0:
+            rows.extend(await archive.cryptos_archive.fetch(dt_from, dt_to, after=after, limit=remaining))
+        return rows
+
+    @classmethod
+    @timed_query
+    async def stream_history(
+            cls,
+            session: AsyncSession,
+            date_from: date,
+            date_to: date,
+            currency: str | None = None,
+            chunk_size: int = 5000
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        История пачками по `chunk_size` строк через серверный курсор.
+
+        В памяти держится только текущая пачка, поэтому потребление не зависит
+        от длины периода. Строки — кортежи (id, name, price, dynamic, created_at);
+        после живых строк идут архивные.
+        """
+        dt_from, dt_to = cls._normalize_dates(date_from, date_to)
+        live_from = cls._live_from(dt_from)
+
+        conditions = [
+            cls.model.created_at >= live_from,
+            cls.model.created_at <= dt_to
+        ]
+        if currency is not None:
+            conditions.append(cls.model.symbol_id == cls._symbol_id(currency))
+
+        stmt = (
+            cls._select_history()
+            .where(and_(*conditions))
+            .order_by(cls.model.created_at.desc(), cls.model.id.desc())
+            .execution_options(yield_per=chunk_size)
+        )
+        # Выгрузка читается столько, сколько её качает клиент: общий лимит на SELECT к ней не применяем
+        stmt = statement_timeout(stmt, 0)
+
+        result = await session.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
+        if live_from > dt_from:
+            async with aclosing(archive.cryptos_archive.stream(dt_from, dt_to, currency, chunk_size)) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+
+    @classmethod
+    @timed_query
+    async def stream_range(
+            cls,
+            session: AsyncSession,
+            dt_from: datetime,
+            dt_to: datetime,
+            chunk_size: int = 5000
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Строки истории [dt_from, dt_to) по возрастанию (created_at, id) — для
+        выгрузки в архив: (id, name, price, dynamic, created_at, price_usd, fx_rate).
+        """
+        stmt = (
+            cls._select_history()
+            .add_columns(cls.model.price_usd, FxRate.rate)
+            .where(cls.model.created_at >= dt_from, cls.model.created_at < dt_to)
+            .order_by(cls.model.created_at.asc(), cls.model.id.asc())
+            .execution_options(yield_per=chunk_size)
+        )
+        stmt = statement_timeout(stmt, 0)
+
+        result = await session.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
+    @classmethod
+    @timed_query
+    async def stream_ticks(
+            cls,
+            session: AsyncSession,
+            dt_from: datetime,
+            dt_to: datetime,
+            chunk_size: int = 5000
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Тики [dt_from, dt_to) по возрастанию времени: (name, price, dynamic, created_at)."""
+        stmt = (
+            select(Symbol.name, cls._price(), cls.model.dynamic, cls.model.created_at)
+            .select_from(cls._priced_ticks().join(Symbol, Symbol.id == cls.model.symbol_id))
+            .where(cls.model.created_at >= dt_from, cls.model.created_at < dt_to)
+            .order_by(cls.model.created_at.asc(), cls.model.id.asc())
+            .execution_options(yield_per=chunk_size)
+        )
+
+        result = await session.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
 
     @classmethod
+    @timed_query
+    async def get_newest_created_at(cls, session: AsyncSession) -> datetime | None:
+        """Время последнего тика: MAX по индексу ix_cryptos_created_at"""
+        return (await session.execute(select(func.max(cls.model.created_at)))).scalar()
+
+    @classmethod
+    @timed_query
+    async def get_latest_ticks(cls, session: AsyncSession, since: datetime | None = None) -> Sequence[Row]:
+        """
+        Строки (name, price, dynamic, created_at) по возрастанию времени.
+
+        С `since` — все тики новее него, иначе — последний тик каждой валюты.
+        """
+        ticks = cls._priced_ticks().join(Symbol, Symbol.id == cls.model.symbol_id)
+        if since is None:
+            newest = (
+                select(cls.model.symbol_id, func.max(cls.model.created_at).label("created_at"))
+                .group_by(cls.model.symbol_id)
+                .subquery()
+            )
+            ticks = ticks.join(
+                newest,
+                and_(newest.c.symbol_id == cls.model.symbol_id, newest.c.created_at == cls.model.created_at)
+            )
+        stmt = (
+            select(Symbol.name, cls._price().label("price"), cls.model.dynamic, cls.model.created_at)
+            .select_from(ticks)
+            .order_by(cls.model.created_at.asc(), cls.model.id.asc())
+        )
+        if since is not None:
+            stmt = stmt.where(cls.model.created_at > since)
+        return (await session.execute(stmt)).all()
+
+    @classmethod
+    @timed_query
+    async def get_created_at_bounds(cls, session: AsyncSession) -> tuple[datetime | None, datetime | None]:
+        """Время самого старого и самого нового тика"""
+        res = await session.execute(select(func.min(cls.model.created_at), func.max(cls.model.created_at)))
+        return tuple(res.one())
+
+    @classmethod
+    @timed_query
     async def get_currency_history(
             cls,
             session: AsyncSession,
             currency: str,
             date_from: date,
-            date_to: date
-    ) -> Sequence[Crypto]:
-        """История конкретной валюты."""
+            date_to: date,
+            after: Keyset | None = None,
+            limit: int | None = None
+    ) -> Sequence[Row]:
+        """История конкретной валюты. Строки и страницы — как у get_history."""
 
         dt_from, dt_to = cls._normalize_dates(date_from, date_to)
+        live_from = cls._live_from(dt_from)
 
         stmt = (
-            select(cls.model)
+            cls._select_history()
             .where(
                 and_(
-                    cls.model.name == currency.upper(),
-                    cls.model.created_at >= dt_from,
+                    cls.model.symbol_id == cls._symbol_id(currency),
+                    cls.model.created_at >= live_from,
                     cls.model.created_at <= dt_to,
+                    *cls._keyset(after)
                 )
             )
-            .order_by(cls.model.created_at.desc())
+            .order_by(cls.model.created_at.desc(), cls.model.id.desc())
+            .limit(limit)
         )
 
         result = await session.execute(stmt)
-        return result.scalars().all()
+        rows = result.all()
+        remaining = cls._remaining(limit, rows)
+        if live_from > dt_from and remaining != 0:
+            rows.extend(await archive.cryptos_archive.fetch(dt_from, dt_to, currency, after, remaining))
+        return rows
 
-    @staticmethod
-    async def get_max_dynamic(
+    @classmethod
+    @timed_query
+    async def get_dynamic_extremes(
+            cls,
             session: AsyncSession,
             currency: str,
             date_from: date,
             date_to: date
-    ) -> Crypto | None:
-        """Элемент с максимальной дневной динамикой"""
-        stmt = (
-            select(Crypto)
+    ) -> tuple[Row | None, Row | None]:
+        """
+        Строки с максимальной и минимальной дневной динамикой за один запрос.
+
+        UNION ALL двух ORDER BY ... LIMIT 1 по индексу (symbol_id, created_at, dynamic,
+        price_usd, fx_rate_id, price_rub_legacy): из cryptos читается только индекс,
+        курс — по первичному ключу fx_rates.
+        """
+        dt_from, dt_to = cls._normalize_dates(date_from, date_to)
+
+        window = and_(
+            cls.model.symbol_id == cls._symbol_id(currency),
+            cls.model.created_at >= dt_from,
+            cls.model.created_at <= dt_to,
+            cls.model.dynamic.is_not(None)
+        )
+        columns = (cls.model.created_at, cls.model.dynamic, cls._price().label("price"))
+        ticks = cls._priced_ticks()
+
+        return await _fetch_extremes(
+            session,
+            select(*columns).select_from(ticks).where(window).order_by(cls.model.dynamic.desc()),
+            select(*columns).select_from(ticks).where(window).order_by(cls.model.dynamic.asc()),
+        )
+
+    @staticmethod
+    async def _fetch_range(session: AsyncSession, stmt: Select) -> Sequence[Row]:
+        """Агрегат по диапазону: на колоночном движке, если он подключён, иначе в основной базе"""
+        if analytics.analytics_engine is not None:
+            return await analytics.analytics_engine.fetch_all(stmt)
+        res = await session.execute(stmt)
+        return res.all()
+
+    @classmethod
+    @timed_query
+    async def get_ohlc(
+            cls,
+            session: AsyncSession,
+            currency: str,
+            date_from: date,
+            date_to: date,
+            step_seconds: int
+    ) -> Sequence[Row]:
+        """
+        OHLC-свечи шириной `step_seconds` и средняя динамика по каждой.
+
+        Строки (bucket, open, high, low, close, avg_dynamic, count), где bucket —
+        начало свечи в секундах от эпохи. open/close берутся оконной функцией
+        по первой и последней записи свечи.
+        """
+        dt_from, dt_to = cls._normalize_dates(date_from, date_to)
+
+        epoch = epoch_seconds(cls.model.created_at)
+        bucket = epoch - epoch % step_seconds
+        price = cls._price()
+
+        ticks = (
+            select(
+                bucket.label("bucket"),
+                price.label("price"),
+                cls.model.dynamic,
+                func.first_value(price, type_=PRICE_RUB).over(
+                    partition_by=bucket,
+                    order_by=(cls.model.created_at.asc(), cls.model.id.asc())
+                ).label("open"),
+                func.first_value(price, type_=PRICE_RUB).over(
+                    partition_by=bucket,
+                    order_by=(cls.model.created_at.desc(), cls.model.id.desc())
+                ).label("close"),
+            )
+            .select_from(cls._priced_ticks())
             .where(
                 and_(
-                    Crypto.name == currency,
-                    Crypto.created_at >= datetime.combine(date_from, datetime.min.time()),
-                    Crypto.created_at <= datetime.combine(date_to, datetime.max.time()),
-                    Crypto.dynamic.is_not(None)
+                    cls.model.symbol_id == cls._symbol_id(currency),
+                    cls.model.created_at >= dt_from,
+                    cls.model.created_at <= dt_to
                 )
             )
-            .order_by(Crypto.dynamic.desc())
-            .limit(1)
+            .subquery()
         )
 
-        res = await session.execute(stmt)
-        return res.scalar_one_or_none()
+        stmt = (
+            select(
+                ticks.c.bucket,
+                func.min(ticks.c.open).label("open"),
+                func.max(ticks.c.price).label("high"),
+                func.min(ticks.c.price).label("low"),
+                func.min(ticks.c.close).label("close"),
+                func.avg(ticks.c.dynamic).label("avg_dynamic"),
+                func.count().label("count"),
+            )
+            .group_by(ticks.c.bucket)
+            .order_by(ticks.c.bucket)
+        )
+
+        return await cls._fetch_range(session=session, stmt=stmt)
+
+
+class CryptoRollupDAO(BaseDAO[CryptoRollup], ABC):
+    """Часовые и дневные агрегаты, которые планировщик дополняет каждым тиком."""
 
     @staticmethod
-    async def get_min_dynamic(
+    @abstractmethod
+    def truncate(moment: datetime) -> datetime:
+        """Начало периода агрегата, в который попадает момент"""
+
+    @classmethod
+    def new_rollup(cls, name: str, price: Decimal, tick_at: datetime) -> CryptoRollup:
+        return cls.model(
+            name=name,
+            bucket=cls.truncate(tick_at),
+            open=price,
+            high=price,
+            low=price,
+            close=price,
+            dynamic_sum=0.0,
+            dynamic_ticks=0,
+            ticks=0,
+        )
+
+    @staticmethod
+    def fold(rollup: CryptoRollup, price: Decimal, dynamic: Decimal | float | None, tick_at: datetime) -> None:
+        """Учесть очередной тик в агрегате. Тики должны идти по возрастанию времени."""
+        rollup.high = max(rollup.high, price)
+        rollup.low = min(rollup.low, price)
+        rollup.close = price
+        rollup.ticks += 1
+        if dynamic is None:
+            return
+        dynamic = float(dynamic)
+        if rollup.dynamic_ticks is not None:
+            rollup.dynamic_sum += dynamic
+            rollup.dynamic_ticks += 1
+        if rollup.max_dynamic is None or dynamic > rollup.max_dynamic:
+            rollup.max_dynamic = dynamic
+            rollup.max_dynamic_price = price
+            rollup.max_dynamic_at = tick_at
+        if rollup.min_dynamic is None or dynamic < rollup.min_dynamic:
+            rollup.min_dynamic = dynamic
+            rollup.min_dynamic_price = price
+            rollup.min_dynamic_at = tick_at
+
+    @classmethod
+    @timed_query
+    async def apply_tick(cls, session: AsyncSession, rows: Sequence[SCryptoCreate], tick_at: datetime) -> None:
+        """Дополнить агрегаты текущего периода тиком: один SELECT и один flush."""
+        if not rows:
+            return
+        bucket = cls.truncate(tick_at)
+        stmt = select(cls.model).where(
+            cls.model.bucket == bucket,
+            cls.model.name.in_([row.name for row in rows])
+        )
+        rollups = {rollup.name: rollup for rollup in (await session.execute(stmt)).scalars()}
+
+        for row in rows:
+            rollup = rollups.get(row.name)
+            if rollup is None:
+                rollup = rollups[row.name] = cls.new_rollup(row.name, row.price, tick_at)
+                session.add(rollup)
+            cls.fold(rollup, row.price, row.dynamic, tick_at)
+
+        await session.flush()
+
+    @classmethod
+    @timed_query
+    async def delete_range(cls, session: AsyncSession, dt_from: datetime, dt_to: datetime) -> None:
+        """Удалить агрегаты, чьи периоды начинаются в [dt_from, dt_to)"""
+        await session.execute(
+            sqlalchemy_delete(cls.model).where(cls.model.bucket >= dt_from, cls.model.bucket < dt_to)
+        )
+
+    @classmethod
+    def _window(cls, currency: str, date_from: date, date_to: date):
+        return and_(
+            cls.model.name == currency,
+            cls.model.bucket >= cls.truncate(datetime.combine(date_from, time.min)),
+            cls.model.bucket <= datetime.combine(date_to, time.max)
+        )
+
+    @classmethod
+    @timed_query
+    async def get_dynamic_extremes(
+            cls,
             session: AsyncSession,
             currency: str,
             date_from: date,
-            date_to: date
-    ) -> Crypto | None:
-        """Элемент с минимальной дневной динамикой"""
+            date_to: date,
+            skip: Collection[datetime] = ()
+    ) -> tuple[Row | None, Row | None]:
+        """
+        Экстремумы динамики по агрегатам; поля строк те же, что у CryptoDAO.get_dynamic_extremes.
+        Периоды из `skip` не учитываются.
+        """
+        window = cls._window(currency, date_from, date_to)
+        if skip:
+            window = and_(window, cls.model.bucket.not_in(skip))
+
+        return await _fetch_extremes(
+            session,
+            select(
+                cls.model.max_dynamic_at.label("created_at"),
+                cls.model.max_dynamic.label("dynamic"),
+                cls.model.max_dynamic_price.label("price"),
+            )
+            .where(window, cls.model.max_dynamic.is_not(None))
+            .order_by(cls.model.max_dynamic.desc()),
+            select(
+                cls.model.min_dynamic_at.label("created_at"),
+                cls.model.min_dynamic.label("dynamic"),
+                cls.model.min_dynamic_price.label("price"),
+            )
+            .where(window, cls.model.min_dynamic.is_not(None))
+            .order_by(cls.model.min_dynamic.asc()),
+        )
+
+
+    @classmethod
+    @timed_query
+    async def get_ohlc(cls, session: AsyncSession, currency: str, date_from: date, date_to: date) -> Sequence[Row]:
+        """Свечи шириной в период агрегата; строки те же, что у CryptoDAO.get_ohlc"""
         stmt = (
-            select(Crypto)
-            .where(
-                and_(
-                    Crypto.name == currency,
-                    Crypto.created_at >= datetime.combine(date_from, datetime.min.time()),
-                    Crypto.created_at <= datetime.combine(date_to, datetime.max.time()),
-                    Crypto.dynamic.is_not(None)
-                )
+            select(
+                epoch_seconds(cls.model.bucket).label("bucket"),
+                cls.model.open,
+                cls.model.high,
+                cls.model.low,
+                cls.model.close,
+                (cls.model.dynamic_sum / func.nullif(cls.model.dynamic_ticks, 0)).label("avg_dynamic"),
+                cls.model.ticks.label("count"),
             )
-            .order_by(Crypto.dynamic.asc())
-            .limit(1)
+            .where(cls._window(currency, date_from, date_to))
+            .order_by(cls.model.bucket)
         )
+        return (await session.execute(stmt)).all()
+
+
+class CryptoHourlyDAO(CryptoRollupDAO):
+    model = CryptoHourly
+
+    @staticmethod
+    def truncate(moment: datetime) -> datetime:
+        return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class CryptoDailyDAO(CryptoRollupDAO):
+    model = CryptoDaily
+
+    @staticmethod
+    def truncate(moment: datetime) -> datetime:
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class CryptoRollupStaleDAO(BaseDAO[CryptoRollupStaleDay]):
+    """
+    Дни с неполными агрегатами.
+
+    День помечается, когда тик записан, а агрегаты не обновлены (ROLLUPS_ENABLED
+    выключен или обновление не удалось), и миграцией — для данных, записанных
+    до агрегатов. Пометку снимает backfill дня. Таблица крошечная, поэтому
+    проверка полноты агрегатов не трогает тики.
+    """
+    model = CryptoRollupStaleDay
+
+    @classmethod
+    async def mark(cls, session: AsyncSession, day: date) -> None:
+        """Пометить день; повторная пометка ничего не меняет"""
+        if await session.get(cls.model, day) is not None:
+            return
+        try:
+            async with session.begin_nested():
+                await session.execute(insert(cls.model), [{"day": day}])
+        except IntegrityError:
+            # День успел пометить другой процесс
+            pass
+
+    @classmethod
+    @timed_query
+    async def get_days(cls, session: AsyncSession, date_from: date, date_to: date) -> list[date]:
+        """Помеченные дни периода по возрастанию"""
+        stmt = (
+            select(cls.model.day)
+            .where(cls.model.day >= date_from, cls.model.day <= date_to)
+            .order_by(cls.model.day)
+        )
+        return list((await session.execute(stmt)).scalars())
+
+    @classmethod
+    async def clear(cls, session: AsyncSession, date_from: date | None = None, date_to: date | None = None) -> None:
+        """Снять пометки с дней [date_from, date_to]; без границы — с той стороны без ограничения"""
+        stmt = sqlalchemy_delete(cls.model)
+        if date_from is not None:
+            stmt = stmt.where(cls.model.day >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(cls.model.day <= date_to)
+        await session.execute(stmt)
 
-        res = await session.execute(stmt)
-        return res.scalar_one_or_none()
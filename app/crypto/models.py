@@ -1,18 +1,108 @@
+from datetime import date, datetime
 from decimal import Decimal
 
 from sqlalchemy import (
+    ForeignKey,
     Integer,
+    SmallInteger,
     String,
     Float,
-    DECIMAL,
+    Date,
+    DateTime,
+    Index,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import Mapped, mapped_column
 
+from app.crypto.prices import FX_RATE, LEGACY_PRICE_RUB, PRICE_RUB, PRICE_USD
 from app.dao.database import Base
 
 
+class Symbol(Base):
+    """Справочник валют: тики ссылаются на него двухбайтовым symbol_id вместо строки"""
+    # SQLite нумерует автоматически только INTEGER PRIMARY KEY
+    id: Mapped[int] = mapped_column(SmallInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    name: Mapped[str] = mapped_column(String(50), nullable=False, unique=True)
+    updated_at = None
+
+
+class FxRate(Base):
+    """Курсы USD→RUB, по которым записаны тики; один и тот же курс хранится один раз"""
+    __tablename__ = "fx_rates"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    rate: Mapped[Decimal] = mapped_column(FX_RATE, nullable=False, unique=True)
+    updated_at = None
+
+
 class Crypto(Base):
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    name: Mapped[str] = mapped_column(String(50), nullable=False)
-    price: Mapped[Decimal] = mapped_column(DECIMAL(15, 6), nullable=False)
+    # В MySQL первичный ключ — (id, created_at): таблица секционирована по created_at.
+    # Внешних ключей секционированные таблицы InnoDB не поддерживают, поэтому
+    # ForeignKey здесь — только для встроенной схемы; symbol_id и fx_rate_id проставляет CryptoDAO
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    symbol_id: Mapped[int] = mapped_column(SmallInteger, ForeignKey("symbols.id"), nullable=False)
+    # Цена в рублях не хранится: это price_usd × курс тика (app.crypto.prices).
+    # Пусты только у старых тиков, у которых вместо них price_rub_legacy
+    price_usd: Mapped[Decimal | None] = mapped_column(PRICE_USD, nullable=True)
+    fx_rate_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("fx_rates.id"), nullable=True)
+    price_rub_legacy: Mapped[Decimal | None] = mapped_column(LEGACY_PRICE_RUB, nullable=True)
     dynamic: Mapped[float] = mapped_column(Float, nullable=True)
+    # Тики не меняются после записи
+    updated_at = None
+
+    __table_args__ = (
+        # История валюты и поиск экстремумов динамики: фильтр по symbol_id + диапазону
+        # created_at, dynamic и цена с курсом берутся прямо из индекса
+        Index(
+            "ix_cryptos_symbol_created_at",
+            "symbol_id", "created_at", "dynamic", "price_usd", "fx_rate_id", "price_rub_legacy"
+        ),
+        # История всех валют за период
+        Index("ix_cryptos_created_at", "created_at"),
+    )
+
+
+class CryptoRollup(Base):
+    """Агрегат тиков валюты за период: OHLC, экстремумы и сумма динамики, число тиков."""
+    __abstract__ = True
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(50), nullable=False)
+    bucket: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    open: Mapped[Decimal] = mapped_column(PRICE_RUB, nullable=False)
+    high: Mapped[Decimal] = mapped_column(PRICE_RUB, nullable=False)
+    low: Mapped[Decimal] = mapped_column(PRICE_RUB, nullable=False)
+    close: Mapped[Decimal] = mapped_column(PRICE_RUB, nullable=False)
+    min_dynamic: Mapped[float] = mapped_column(Float, nullable=True)
+    min_dynamic_price: Mapped[Decimal] = mapped_column(PRICE_RUB, nullable=True)
+    min_dynamic_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    max_dynamic: Mapped[float] = mapped_column(Float, nullable=True)
+    max_dynamic_price: Mapped[Decimal] = mapped_column(PRICE_RUB, nullable=True)
+    max_dynamic_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    # Для средней динамики свечи; пусты у агрегатов, построенных до этих столбцов
+    dynamic_sum: Mapped[float | None] = mapped_column(Float, nullable=True)
+    dynamic_ticks: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    ticks: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class CryptoHourly(CryptoRollup):
+    __tablename__ = "crypto_rollups_hourly"
+    __table_args__ = (
+        UniqueConstraint("name", "bucket", name="uq_crypto_rollups_hourly_name_bucket"),
+    )
+
+
+class CryptoDaily(CryptoRollup):
+    __tablename__ = "crypto_rollups_daily"
+    __table_args__ = (
+        UniqueConstraint("name", "bucket", name="uq_crypto_rollups_daily_name_bucket"),
+    )
+
+
+class CryptoRollupStaleDay(Base):
+    """День, агрегаты которого учли не все тики: до пересчёта backfill он читается по тикам"""
+    __tablename__ = "crypto_rollups_stale_days"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    updated_at = None
+
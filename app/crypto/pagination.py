@@ -0,0 +1,36 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from app.config import settings
+
+Keyset = tuple[datetime, int]
+
+
+@dataclass
+class Page[T]:
+    """Страница выдачи и курсор следующей (None — страниц больше нет)"""
+    items: list[T] = field(default_factory=list)
+    next_cursor: str | None = None
+
+
+def page_size(limit: int | None) -> int:
+    """Размер страницы с учётом ограничения сверху"""
+    return min(limit or settings.HISTORY_PAGE_SIZE_DEFAULT, settings.HISTORY_PAGE_SIZE_MAX)
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Непрозрачный курсор на позицию (created_at, id) последней отданной записи"""
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Keyset:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise ValueError("Некорректный курсор") from e
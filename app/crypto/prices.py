@@ -0,0 +1,44 @@
+"""
+Представление цен тика.
+
+В базе хранится исходная цена в USD и курс USD→RUB тика, а цена в рублях
+считается при чтении (CryptoDAO) или в памяти (SCryptoCreate.price) одним и тем
+же округлением. 16 знаков после запятой у цены в USD сохраняют значащие цифры
+токенов дешевле цента, 12 целых — любую реальную цену. Рублёвая цена отдаётся,
+как и прежде, с 6 знаками после запятой, но без прежнего предела в 9 целых —
+DECIMAL(38, 6); у произведения в DuckDB, где DECIMAL не шире 38 цифр, остаётся
+14 целых.
+
+У тиков, записанных до перехода на USD, курса нет: их рублёвая цена лежит
+в price_rub_legacy в прежнем типе, а price_usd и fx_rate_id пусты.
+"""
+from decimal import Context, Decimal, ROUND_HALF_UP
+
+from sqlalchemy import DECIMAL
+
+PRICE_USD = DECIMAL(28, 16)
+FX_RATE = DECIMAL(18, 8)
+PRICE_RUB = DECIMAL(38, 6)
+LEGACY_PRICE_RUB = DECIMAL(15, 6)
+
+PRICE_USD_QUANTUM = Decimal(1).scaleb(-PRICE_USD.scale)
+FX_RATE_QUANTUM = Decimal(1).scaleb(-FX_RATE.scale)
+PRICE_RUB_QUANTUM = Decimal(1).scaleb(-PRICE_RUB.scale)
+
+# Точности по умолчанию (28 знаков) не хватает на произведение двух столбцов;
+# округление — как у CAST в MySQL
+_CONTEXT = Context(prec=80, rounding=ROUND_HALF_UP)
+
+
+def quantize_price_usd(value: Decimal) -> Decimal:
+    """Цена в USD в масштабе столбца: 1 / rate из пакетного источника иначе тянет 28 знаков"""
+    return value.quantize(PRICE_USD_QUANTUM, context=_CONTEXT)
+
+
+def quantize_fx_rate(value: Decimal) -> Decimal:
+    return value.quantize(FX_RATE_QUANTUM, context=_CONTEXT)
+
+
+def to_rub(price_usd: Decimal, fx_rate: Decimal) -> Decimal:
+    """Цена в рублях так же, как её считает CryptoDAO при чтении"""
+    return _CONTEXT.multiply(price_usd, fx_rate).quantize(PRICE_RUB_QUANTUM, context=_CONTEXT)
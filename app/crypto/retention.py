@@ -0,0 +1,199 @@
+"""
+Секции cryptos по времени и политика хранения тиков.
+
+В MySQL таблица разбита RANGE-секциями по UNIX_TIMESTAMP(created_at) — по дню
+или месяцу (CRYPTOS_PARTITION_INTERVAL) — и секцией p_future для всего, что
+позже последней границы. Запросы CryptoDAO фильтруют created_at диапазоном без
+функций над столбцом, поэтому MySQL читает только секции периода.
+
+Обслуживание раз в сутки:
+- нарезает секции на CRYPTOS_PARTITIONS_AHEAD периодов вперёд, отделяя их от
+  пустой p_future (REORGANIZE пустой секции ничего не копирует);
+- периоды старше CRYPTOS_RETENTION_DAYS выгружает в Parquet (режим archive)
+  и удаляет: в MySQL — DROP PARTITION, без построчного DELETE; на встроенном
+  SQLite секций нет, там — DELETE по диапазону.
+
+Архивные периоды остаются доступны эндпоинтам истории через ParquetArchive.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
+from typing import Literal
+
+from loguru import logger
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.crypto.dao import CryptoDAO, CryptoRollupStaleDAO
+from app.crypto.models import Crypto
+from app.dao.archive import ParquetArchive, cryptos_archive
+from app.dao.database import write_session_maker
+
+type Interval = Literal["day", "month"]
+
+FUTURE_PARTITION = "p_future"
+
+
+def period_start(moment: datetime, interval: Interval) -> datetime:
+    day = datetime(moment.year, moment.month, moment.day)
+    return day.replace(day=1) if interval == "month" else day
+
+
+def next_period(start: datetime, interval: Interval) -> datetime:
+    if interval == "month":
+        return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(start: datetime, interval: Interval) -> str:
+    return f"p{start:%Y%m}" if interval == "month" else f"p{start:%Y%m%d}"
+
+
+def partition_clause(start: datetime, interval: Interval) -> str:
+    """Секция периода, начинающегося в start; граница — в часовом поясе сессии, как и значения столбца"""
+    end = next_period(start, interval)
+    return f"PARTITION {partition_name(start, interval)} VALUES LESS THAN (UNIX_TIMESTAMP('{end:%Y-%m-%d %H:%M:%S}'))"
+
+
+def split_future_sql(starts: list[datetime], interval: Interval) -> str:
+    """REORGANIZE p_future: секции периодов с началами starts и снова p_future"""
+    clauses = [partition_clause(start, interval) for start in starts]
+    clauses.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+    return f"ALTER TABLE cryptos REORGANIZE PARTITION {FUTURE_PARTITION} INTO ({', '.join(clauses)})"
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    upper: datetime | None  # None — MAXVALUE
+
+
+async def list_partitions(session: AsyncSession) -> list[Partition]:
+    """Секции cryptos по порядку; пусто, если таблица не секционирована"""
+    res = await session.execute(text(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION, "
+        "IF(PARTITION_DESCRIPTION = 'MAXVALUE', NULL, FROM_UNIXTIME(PARTITION_DESCRIPTION)) "
+        "FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'cryptos' AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ))
+    return [Partition(name=name, upper=upper) for name, _, upper in res.all()]
+
+
+async def ensure_partitions(session: AsyncSession, now: datetime, interval: Interval, ahead: int) -> int:
+    """Нарезать секции вперёд; возвращает число новых секций"""
+    partitions = await list_partitions(session)
+    if not partitions:
+        logger.warning("Таблица cryptos не секционирована, обслуживание секций пропущено")
+        return 0
+    bounded = [p.upper for p in partitions if p.upper is not None]
+    start = max(bounded) if bounded else period_start(now, interval)
+    until = period_start(now, interval)
+    for _ in range(ahead + 1):
+        until = next_period(until, interval)
+
+    starts = []
+    while start < until:
+        starts.append(start)
+        start = next_period(start, interval)
+    if not starts:
+        return 0
+    await session.execute(text(split_future_sql(starts, interval)))
+    logger.info("Добавлено секций cryptos: {count}", count=len(starts))
+    return len(starts)
+
+
+async def _archive(
+        session_maker: async_sessionmaker[AsyncSession],
+        store: ParquetArchive,
+        start: datetime,
+        end: datetime
+) -> int:
+    async with session_maker() as session:
+        return await store.write(
+            start, end, CryptoDAO.stream_range(session=session, dt_from=start, dt_to=end)
+        )
+
+
+async def expire_partitions(
+        session_maker: async_sessionmaker[AsyncSession],
+        cutoff: datetime,
+        store: ParquetArchive | None
+) -> int:
+    """MySQL: выгрузить и удалить секции, целиком лежащие раньше cutoff"""
+    async with session_maker() as session:
+        partitions = await list_partitions(session)
+        oldest = (await session.execute(select(func.min(Crypto.created_at)))).scalar()
+
+    dropped, lower = 0, oldest
+    for partition in partitions:
+        if partition.upper is None or partition.upper > cutoff:
+            break
+        if store is not None and lower is not None and lower < partition.upper:
+            rows = await _archive(session_maker, store, lower, partition.upper)
+            logger.info("Секция {name} выгружена в архив: {rows} строк", name=partition.name, rows=rows)
+        async with session_maker() as session:
+            await session.execute(text(f"ALTER TABLE cryptos DROP PARTITION {partition.name}"))
+        dropped += 1
+        lower = partition.upper
+    return dropped
+
+
+async def expire_rows(
+        session_maker: async_sessionmaker[AsyncSession],
+        cutoff: datetime,
+        interval: Interval,
+        store: ParquetArchive | None
+) -> int:
+    """Без секций: выгрузить и удалить DELETE каждый период целиком раньше cutoff"""
+    async with session_maker() as session:
+        oldest = (await session.execute(select(func.min(Crypto.created_at)))).scalar()
+    if oldest is None:
+        return 0
+
+    expired, start = 0, period_start(oldest, interval)
+    while (end := next_period(start, interval)) <= cutoff:
+        if store is not None:
+            await _archive(session_maker, store, start, end)
+        async with session_maker() as session:
+            await session.execute(delete(Crypto).where(Crypto.created_at >= start, Crypto.created_at < end))
+            await session.commit()
+        expired += 1
+        start = end
+    return expired
+
+
+async def maintain_cryptos_storage(
+        now: datetime | None = None,
+        session_maker: async_sessionmaker[AsyncSession] = write_session_maker,
+        store: ParquetArchive = cryptos_archive,
+        interval: Interval | None = None,
+        retention_days: int | None = None
+) -> None:
+    """Суточное обслуживание: секции вперёд, затем выгрузка и удаление старых тиков"""
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    interval = interval or settings.CRYPTOS_PARTITION_INTERVAL
+    retention_days = settings.CRYPTOS_RETENTION_DAYS if retention_days is None else retention_days
+    partitioned = session_maker.kw["bind"].dialect.name == "mysql"
+
+    if partitioned:
+        async with session_maker() as session:
+            await ensure_partitions(session, now, interval, settings.CRYPTOS_PARTITIONS_AHEAD)
+
+    if not retention_days:
+        return
+    cutoff = period_start(now - timedelta(days=retention_days), "day")
+    archive = store if settings.CRYPTOS_RETENTION_MODE == "archive" else None
+    if partitioned:
+        expired = await expire_partitions(session_maker, cutoff, archive)
+    else:
+        expired = await expire_rows(session_maker, cutoff, interval, archive)
+    if expired:
+        logger.info("Тики раньше {cutoff} удалены из базы: {count} периодов", cutoff=cutoff, count=expired)
+        # Пересчитать удалённые дни уже не по чему: их агрегаты читаются как есть
+        async with session_maker() as session:
+            oldest = (await session.execute(select(func.min(Crypto.created_at)))).scalar()
+            await CryptoRollupStaleDAO.clear(
+                session=session, date_to=None if oldest is None else oldest.date() - timedelta(days=1)
+            )
+            await session.commit()
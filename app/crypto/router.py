@@ -1,61 +1,138 @@
 from datetime import date
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from loguru import logger
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Literal
 
+from app.crypto.pagination import Page
 from app.crypto.schemas import (
+    CryptoHistoryItem,
     CryptoHistoryResponse,
     CryptoDynamicResponse,
+    CryptoLatestResponse,
+    CryptoOhlcResponse,
+    OhlcResolution,
 )
 from app.crypto.services.CryptoQueryService import CryptoQueryService
+from app.crypto.snapshot import latest_prices
+from app.crypto.streaming import STREAM_MEDIA_TYPES, resolve_format
 from app.dao.session_maker import SessionDep
 
 router = APIRouter(prefix="/crypto", tags=["Crypto"])
 
+HistoryFormat = Literal["json", "ndjson", "csv"]
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+_history_adapter = TypeAdapter(list[CryptoHistoryItem])
+
+
+def history_json_response(page: Page[CryptoHistoryItem]) -> Response:
+    """
+    Страница истории в JSON одним вызовом сериализатора.
+
+    response_model остаётся для документации, но ответ возвращается готовым,
+    поэтому FastAPI не валидирует каждую строку повторно.
+    """
+    headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else None
+    return Response(content=_history_adapter.dump_json(page.items), media_type="application/json", headers=headers)
+
 
 @router.get("/", summary="Получение истории курса всех валют", response_model=List[CryptoHistoryResponse])
 async def get_all_crypto_history(
         dateFrom: date = Query(..., description="Дата забора данных от"),
         dateTo: date = Query(..., description="Дата забора данных до"),
+        output_format: HistoryFormat | None = Query(None, alias="format", description="json, ndjson или csv"),
+        cursor: str | None = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+        limit: int | None = Query(None, ge=1, description="Размер страницы, по умолчанию HISTORY_PAGE_SIZE_DEFAULT"),
+        accept: str | None = Header(None),
         session: AsyncSession = SessionDep
 ):
     """Получить историю курсов всех криптовалют за указанный период"""
     try:
-        return await CryptoQueryService.get_all_crypto_history(
+        output_format = resolve_format(output_format, accept)
+        if output_format in STREAM_MEDIA_TYPES:
+            return StreamingResponse(
+                CryptoQueryService.stream_history(
+                    session=session,
+                    date_from=dateFrom,
+                    date_to=dateTo,
+                    output_format=output_format
+                ),
+                media_type=STREAM_MEDIA_TYPES[output_format]
+            )
+        page = await CryptoQueryService.get_all_crypto_history(
             session=session,
             date_from=dateFrom,
-            date_to=dateTo
+            date_to=dateTo,
+            cursor=cursor,
+            limit=limit
         )
+        return history_json_response(page)
     except ValueError as e:
-        logger.warning(f"Некорректные параметры запроса: {e}")
+        logger.warning("Некорректные параметры запроса: {error}", error=e)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Ошибка при получении истории всех валют: {e}")
+        logger.error("Ошибка при получении истории всех валют: {error}", error=e)
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера") from e
 
 
+@router.get("/latest", summary="Последние цены всех валют",
+            response_model=List[CryptoLatestResponse])
+async def get_latest_prices(
+        if_none_match: str | None = Header(None),
+        if_modified_since: str | None = Header(None)
+):
+    """Цены последнего тика из памяти, без обращения к БД. Поддерживает ETag и 304"""
+    snapshot = latest_prices.snapshot
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Цены ещё не собраны")
+    if snapshot.not_modified(if_none_match, if_modified_since):
+        return Response(status_code=304, headers=snapshot.headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=snapshot.headers)
+
+
 @router.get("/{currency}", summary="Получение истории курса конкретной валюты",
             response_model=List[CryptoHistoryResponse])
 async def get_currency_history(
         currency: str,
         dateFrom: date = Query(..., description="Дата забора данных от"),
         dateTo: date = Query(..., description="Дата забора данных до"),
+        output_format: HistoryFormat | None = Query(None, alias="format", description="json, ndjson или csv"),
+        cursor: str | None = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+        limit: int | None = Query(None, ge=1, description="Размер страницы, по умолчанию HISTORY_PAGE_SIZE_DEFAULT"),
+        accept: str | None = Header(None),
         session: AsyncSession = SessionDep
 ):
     """Получить историю курса конкретной криптовалюты за указанный период"""
     try:
-        return await CryptoQueryService.get_currency_history(
+        output_format = resolve_format(output_format, accept)
+        if output_format in STREAM_MEDIA_TYPES:
+            return StreamingResponse(
+                CryptoQueryService.stream_history(
+                    session=session,
+                    date_from=dateFrom,
+                    date_to=dateTo,
+                    output_format=output_format,
+                    currency=currency.upper()
+                ),
+                media_type=STREAM_MEDIA_TYPES[output_format]
+            )
+        page = await CryptoQueryService.get_currency_history(
             session=session,
             currency=currency.upper(),
             date_from=dateFrom,
-            date_to=dateTo
+            date_to=dateTo,
+            cursor=cursor,
+            limit=limit
         )
+        return history_json_response(page)
     except ValueError as e:
-        logger.warning(f"Некорректные параметры запроса: {e}")
+        logger.warning("Некорректные параметры запроса: {error}", error=e)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Ошибка при получении истории валюты {currency}: {e}")
+        logger.error("Ошибка при получении истории валюты {currency}: {error}", currency=currency, error=e)
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера") from e
 
 
@@ -76,8 +153,34 @@ async def get_currency_dynamic_range(
             date_to=dateTo
         )
     except ValueError as e:
-        logger.warning(f"Некорректные параметры запроса: {e}")
+        logger.warning("Некорректные параметры запроса: {error}", error=e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Ошибка при получении динамики валюты {currency}: {error}", currency=currency, error=e)
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера") from e
+
+
+@router.get("/ohlc/{currency}", summary="Получение OHLC-свечей валюты",
+            response_model=CryptoOhlcResponse)
+async def get_currency_ohlc(
+        currency: str,
+        dateFrom: date = Query(..., description="Дата забора данных от"),
+        dateTo: date = Query(..., description="Дата забора данных до"),
+        resolution: OhlcResolution = Query("1h", description="Ширина свечи: 5m, 1h или 1d"),
+        session: AsyncSession = SessionDep
+):
+    """Получить свечи open/high/low/close и среднюю динамику за период"""
+    try:
+        return await CryptoQueryService.get_currency_ohlc(
+            session=session,
+            currency=currency.upper(),
+            date_from=dateFrom,
+            date_to=dateTo,
+            resolution=resolution
+        )
+    except ValueError as e:
+        logger.warning("Некорректные параметры запроса: {error}", error=e)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Ошибка при получении динамики валюты {currency}: {e}")
+        logger.error("Ошибка при получении свечей валюты {currency}: {error}", currency=currency, error=e)
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера") from e
@@ -1,52 +1,209 @@
+import time
+from datetime import datetime, UTC
+
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
 
-from app.crypto.dao import CryptoDAO
+from app.config import settings
+from app.crypto.cache import response_cache
+from app.crypto.dao import CryptoDAO, CryptoDailyDAO, CryptoHourlyDAO, CryptoRollupStaleDAO
+from app.crypto.retention import maintain_cryptos_storage
 from app.crypto.schemas import SCryptoCreate
-from app.crypto.services.CryptoDataController import CryptoServices
+from app.crypto.prices import quantize_fx_rate, quantize_price_usd
+from app.crypto.services.CryptoDataController import CryptoServices, day_change
+from app.crypto.services.FetchPipeline import FetchPipeline, fetch_pipeline
+from app.crypto.services.FxRates import FxRateCache, FxRateUnavailable, fx_rates
+from app.crypto.services.SymbolRegistry import symbol_registry
+from app.crypto.services.TickerStream import TickerStream, ticker_stream
+from app.crypto.snapshot import latest_prices
+from app.log import log_sampler
+from app.metrics import LAST_TICK, TICK_ROWS, TICK_SECONDS, TICK_SKIPPED
 from loguru import logger
 
-from app.dao.database import async_session_maker
+from app.dao.database import write_session_maker
+
+
+def build_tick_rows(prices: dict, tick_at: datetime) -> list[SCryptoCreate]:
+    """Собрать валидные строки тика с общим временем; невалидные отбрасываются по одной."""
+    rows = []
+    for symbol, crypto_data in prices.items():
+        if not crypto_data:
+            continue
+        try:
+            rows.append(
+                SCryptoCreate(
+                    name=crypto_data["name"],
+                    price_usd=crypto_data["price_usd"],
+                    fx_rate=crypto_data["fx_rate"],
+                    dynamic=crypto_data["dynamic"],
+                    created_at=tick_at
+                )
+            )
+        except (KeyError, ValidationError) as e:
+            log_sampler.log("ERROR", "tick.invalid_row", "Некорректные данные для {symbol}: {error}", symbol=symbol, error=e)
+    return rows
+
+
+async def save_tick(rows: list[SCryptoCreate], tick_at: datetime) -> list[SCryptoCreate]:
+    """
+    Записать весь тик и дополнить агрегаты одной транзакцией. Возвращает записанные строки.
+
+    Если агрегаты не обновлены, день тика в той же транзакции помечается
+    неполным: запросы пересчитают его по тикам до backfill.
+    """
+    async with write_session_maker() as session:
+        saved = await CryptoDAO.bulk_insert(session=session, values=rows)
+        rolled_up = False
+        if settings.ROLLUPS_ENABLED and saved:
+            try:
+                async with session.begin_nested():
+                    await CryptoHourlyDAO.apply_tick(session=session, rows=saved, tick_at=tick_at)
+                    await CryptoDailyDAO.apply_tick(session=session, rows=saved, tick_at=tick_at)
+                rolled_up = True
+            except SQLAlchemyError as e:
+                logger.error("Не удалось обновить агрегаты тика {tick_at}: {error}", tick_at=tick_at, error=e)
+        if saved and not rolled_up:
+            await CryptoRollupStaleDAO.mark(session=session, day=tick_at.date())
+        await session.commit()
+    return saved
 
 
 async def scheduled_price_collection():
     """Периодический сбор цен"""
-    symbols = CryptoServices.get_all_name_cryptos()
-    prices = await CryptoServices.get_prices_and_changes(symbols)
+    started = time.perf_counter()
     try:
-        async with async_session_maker() as session:
-            for symbol, crypto_data in prices.items():
-                if crypto_data:
-                    try:
-                        crypto_create = SCryptoCreate(
-                            name=crypto_data["name"],
-                            price=crypto_data["price"],
-                            dynamic=crypto_data["dynamic"]
-                        )
-                        await CryptoDAO.add(session=session, values=crypto_create)
-                        await session.commit()
-                    except Exception as e:
-                        print(e)
-        print(f"Saved {len(prices)} prices")
+        symbols = await symbol_registry.get_symbols(await fetch_pipeline.get_session())
     except Exception as e:
-        print(f"Error: {e}")
-    finally:
-        await session.close()
+        TICK_SKIPPED.inc("symbols_unavailable")
+        logger.error("Тик пропущен, список валют недоступен: {error}", error=e)
+        return
+    if not symbols:
+        TICK_SKIPPED.inc("symbols_unavailable")
+        logger.error("Тик пропущен: список валют пуст и не загрузился")
+        return
+    try:
+        prices = await CryptoServices.get_prices_and_changes(symbols)
+    except FxRateUnavailable as e:
+        TICK_SKIPPED.inc("fx_unavailable")
+        logger.error("Тик пропущен: {error}", error=e)
+        return
+    TICK_SECONDS.observe(time.perf_counter() - started, "fetch")
+    tick_at = datetime.now(UTC).replace(tzinfo=None, microsecond=0)
+    rows = build_tick_rows(prices, tick_at)
+    try:
+        started = time.perf_counter()
+        saved = await save_tick(rows, tick_at)
+        TICK_SECONDS.observe(time.perf_counter() - started, "insert")
+        _record_saved(saved, tick_at, "poll")
+        response_cache.bump_generation()
+        if saved:
+            latest_prices.publish(saved, tick_at)
+        logger.info("Сохранено {saved} из {total} цен", saved=len(saved), total=len(prices))
+    except Exception as e:
+        TICK_SKIPPED.inc("save_failed")
+        logger.error("Ошибка при сохранении тика: {error}", error=e)
+
+
+def _record_saved(saved: list[SCryptoCreate], tick_at: datetime, mode: str) -> None:
+    TICK_ROWS.inc(mode, amount=len(saved))
+    LAST_TICK.set(tick_at.replace(tzinfo=UTC).timestamp())
+
+
+async def run_ticker_stream(stream: TickerStream = ticker_stream):
+    """Подписка на ticker на всё время работы планировщика"""
+    session = await fetch_pipeline.get_session()
+    await stream.run(session, lambda: symbol_registry.get_symbols(session))
+
+
+async def flush_ticker_stream(
+        stream: TickerStream = ticker_stream,
+        fx: FxRateCache = fx_rates,
+        pipeline: FetchPipeline = fetch_pipeline
+):
+    """Записать изменившиеся с прошлого сброса цены потока одним тиком"""
+    pending = stream.pending()
+    if not pending:
+        return
+    try:
+        quote = await fx.get_rate(pipeline)
+    except FxRateUnavailable as e:
+        TICK_SKIPPED.inc("fx_unavailable")
+        logger.error("Сброс цен отложен: {error}", error=e)
+        return
+    tick_at = datetime.now(UTC).replace(tzinfo=None, microsecond=0)
+    fx_rate = quantize_fx_rate(quote.rate)
+    prices = {
+        symbol: {
+            "name": symbol,
+            "price_usd": quantize_price_usd(ticker.price),
+            "fx_rate": fx_rate,
+            "dynamic": day_change(ticker.open_24h, ticker.price) if ticker.open_24h is not None else None,
+        }
+        for symbol, ticker in pending.items()
+    }
+    rows = build_tick_rows(prices, tick_at)
+    try:
+        started = time.perf_counter()
+        saved = await save_tick(rows, tick_at)
+        TICK_SECONDS.observe(time.perf_counter() - started, "insert")
+    except Exception as e:
+        TICK_SKIPPED.inc("save_failed")
+        logger.error("Ошибка при сохранении цен потока: {error}", error=e)
+        return
+    _record_saved(saved, tick_at, "stream")
+    stream.mark_flushed(pending)
+    response_cache.bump_generation()
+    if saved:
+        latest_prices.publish(saved, tick_at, merge=True)
+    logger.info("Сохранено {saved} изменившихся цен из {total}", saved=len(saved), total=len(stream.latest))
+
+
+async def scheduled_storage_maintenance():
+    """Секции вперёд и политика хранения тиков, раз в сутки"""
+    try:
+        await maintain_cryptos_storage()
+    except (SQLAlchemyError, OSError, ImportError) as e:
+        logger.error("Ошибка обслуживания хранения тиков: {error}", error=e)
 
 
 def start_scheduler():
-    """Запуск планировщика"""
+    """Запуск планировщика: опрос REST или поток ticker в зависимости от INGEST_MODE"""
     try:
         scheduler = AsyncIOScheduler()
+        if settings.INGEST_MODE == "stream":
+            # Без триггера задача запускается сразу и живёт, пока работает планировщик
+            scheduler.add_job(run_ticker_stream, id='crypto_ticker_stream')
+            scheduler.add_job(
+                flush_ticker_stream,
+                'interval',
+                seconds=settings.INGEST_FLUSH_SECONDS,
+                coalesce=True,
+                max_instances=1,
+                id='crypto_ticker_flush'
+            )
+        else:
+            scheduler.add_job(
+                scheduled_price_collection,
+                'interval',
+                hours=0,
+                minutes=1,
+                coalesce=True,
+                id='crypto_price_collection'
+            )
         scheduler.add_job(
-            scheduled_price_collection,
-            'interval',
-            hours=0,
-            minutes=1,
+            scheduled_storage_maintenance,
+            'cron',
+            hour=0,
+            minute=10,
+            timezone=UTC,
+            next_run_time=datetime.now(UTC),
             coalesce=True,
-            id='crypto_price_collection'
+            max_instances=1,
+            id='crypto_storage_maintenance'
         )
         scheduler.start()
         return scheduler
     except Exception as e:
-        logger.error(f"Ошибка при запуске планировщика: {e}")
+        logger.error("Ошибка при запуске планировщика: {error}", error=e)
         raise
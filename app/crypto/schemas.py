@@ -1,30 +1,79 @@
 from datetime import date, datetime
 from decimal import Decimal
+from typing import Annotated, Any, Literal, TypedDict
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PlainSerializer
+
+from app.config import settings
+from app.crypto.prices import FX_RATE, PRICE_USD, to_rub
+
+
+def json_decimal(mode: Literal["string", "float"]) -> Any:
+    """
+    Decimal для схем ответа: в JSON строкой без потери точности ("1.5")
+    или числом (1.5). Политика выбирается при старте, чтобы сериализация
+    оставалась целиком в pydantic-core без вызова Python на каждое значение.
+    """
+    if mode == "float":
+        return Annotated[Decimal, PlainSerializer(float, return_type=float, when_used="json")]
+    return Decimal
+
+
+JsonDecimal = json_decimal(settings.JSON_DECIMAL_MODE)
 
 
 class SCryptoBase(BaseModel):
     name: str = Field(description="Cryptocurrency name")
-    price: Decimal = Field(description="Cryptocurrency price")
+    # Значения, не помещающиеся в столбцы, отсекаются здесь, а не ошибкой INSERT
+    price_usd: Decimal = Field(
+        description="Cryptocurrency price usd",
+        max_digits=PRICE_USD.precision,
+        decimal_places=PRICE_USD.scale
+    )
+    fx_rate: Decimal = Field(
+        description="USD to RUB rate of the tick",
+        max_digits=FX_RATE.precision,
+        decimal_places=FX_RATE.scale
+    )
     dynamic: Decimal | None = Field(None, description="Cryptocurrency dynamic")
 
+    @property
+    def price(self) -> Decimal:
+        """Цена в рублях"""
+        return to_rub(self.price_usd, self.fx_rate)
+
 
 class SCryptoCreate(SCryptoBase):
-    pass
+    created_at: datetime | None = Field(None, description="Tick time, server time if not set")
 
 
 class CryptoHistoryResponse(BaseModel):
     id: int = Field(description="Cryptocurrency id")
     name: str = Field(description="Cryptocurrency symbol")
-    price: Decimal = Field(description="Cryptocurrency price rub")
-    dynamic: Decimal | None = Field(None, description="Cryptocurrency change_24h")
+    price: JsonDecimal = Field(description="Cryptocurrency price rub")
+    dynamic: JsonDecimal | None = Field(None, description="Cryptocurrency change_24h")
     created_at: datetime = Field(description="Cryptocurrency creation date")
 
 
+class CryptoHistoryItem(TypedDict):
+    """Строка истории без модели: сериализуется так же, как CryptoHistoryResponse"""
+    id: int
+    name: str
+    price: JsonDecimal
+    dynamic: JsonDecimal | None
+    created_at: datetime
+
+
+class CryptoLatestResponse(BaseModel):
+    name: str = Field(description="Cryptocurrency symbol")
+    price: JsonDecimal = Field(description="Cryptocurrency price rub")
+    dynamic: JsonDecimal | None = Field(None, description="Cryptocurrency change_24h")
+    created_at: datetime = Field(description="Tick time")
+
+
 class CryptoDynamicPoint(BaseModel):
-    dynamic: Decimal | None = Field(None, description="Cryptocurrency dynamic")
-    price: Decimal | None = Field(None, description="Cryptocurrency price rub")
+    dynamic: JsonDecimal | None = Field(None, description="Cryptocurrency dynamic")
+    price: JsonDecimal | None = Field(None, description="Cryptocurrency price rub")
 
 
 class CryptoDynamicResponse(BaseModel):
@@ -33,3 +82,25 @@ class CryptoDynamicResponse(BaseModel):
     min_dynamic: CryptoDynamicPoint | None = Field(None, description="Cryptocurrency min dynamic")
     date_from: date = Field(description="Cryptocurrency date from")
     date_to: date = Field(description="Cryptocurrency date to")
+
+
+OhlcResolution = Literal["5m", "1h", "1d"]
+
+
+class CryptoCandle(BaseModel):
+    bucket: datetime = Field(description="Candle start time")
+    open: JsonDecimal = Field(description="First price rub in the candle")
+    high: JsonDecimal = Field(description="Highest price rub in the candle")
+    low: JsonDecimal = Field(description="Lowest price rub in the candle")
+    close: JsonDecimal = Field(description="Last price rub in the candle")
+    avg_dynamic: JsonDecimal | None = Field(None, description="Average change_24h in the candle")
+    count: int = Field(description="Number of ticks in the candle")
+
+
+class CryptoOhlcResponse(BaseModel):
+    currency: str = Field(description="Cryptocurrency currency")
+    resolution: OhlcResolution = Field(description="Candle width")
+    date_from: date = Field(description="Cryptocurrency date from")
+    date_to: date = Field(description="Cryptocurrency date to")
+    candles: list[CryptoCandle] = Field(description="Candles in ascending time order")
+
@@ -1,93 +1,198 @@
 import asyncio
+import time
 from decimal import Decimal
-import aiohttp
-import requests
 from loguru import logger
 
-MAX_CONCURRENT = 4
+from app.config import settings
+from app.crypto.prices import quantize_fx_rate, quantize_price_usd
+from app.crypto.services.FetchPipeline import CircuitOpenError, FetchError, FetchPipeline, fetch_pipeline
+from app.crypto.services.FxRates import FxRateCache, fx_rates
+from app.log import log_sampler
+
+
+def day_change(open_price, last_price) -> Decimal | None:
+    """Изменение за сутки в % по цене открытия и последней цене"""
+    open_price, last_price = Decimal(open_price), Decimal(last_price)
+    if open_price == 0:
+        return None
+    return (last_price - open_price) / open_price * 100
 
 
 class CryptoServices:
 
     @staticmethod
-    def get_all_name_cryptos() -> list[str]:
-        """Получить список всех доступных криптовалют"""
-        r = requests.get("https://api.exchange.coinbase.com/products")
-        products = r.json()
-        cryptos = sorted({p["base_currency"] for p in products if p["status"] == "online"})
-        return cryptos
+    async def fetch_bulk_prices(pipeline: FetchPipeline) -> dict[str, Decimal]:
+        """
+        Спотовые цены всех валют в USD одним запросом /v2/exchange-rates.
+
+        Курс дан как «сколько единиц валюты за 1 USD», поэтому цена — 1 / rate.
+        При ошибке — пустой словарь, и цены добираются поштучно.
+        """
+        url = f"{settings.COINBASE_API_URL}/v2/exchange-rates?currency=USD"
+        try:
+            data = await pipeline.fetch_json(url, endpoint="coinbase.exchange_rates")
+            rates = data["data"]["rates"]
+        except CircuitOpenError:
+            return {}
+        except FetchError as e:
+            logger.warning("Не удалось получить курсы всех валют: {error}", error=e)
+            return {}
+        except (KeyError, TypeError) as e:
+            logger.error("Некорректный ответ exchange-rates: {error!r}", error=e)
+            return {}
+
+        prices = {}
+        for symbol, rate in rates.items():
+            try:
+                rate = Decimal(rate)
+            except (TypeError, ArithmeticError):
+                continue
+            if rate.is_finite() and rate > 0:
+                prices[symbol.upper()] = 1 / rate
+        return prices
 
     @staticmethod
-    async def fetch_single_price(session, crypto: str, usd_to_rub: Decimal) -> Decimal | None:
-        """Получение цены криптовалюты в RUB"""
+    async def fetch_bulk_changes(pipeline: FetchPipeline) -> dict[str, Decimal | None]:
+        """
+        Суточная динамика всех пар к USD одним запросом /products/stats.
+
+        При ошибке — пустой словарь, и динамика добирается поштучно.
+        """
+        url = f"{settings.COINBASE_EXCHANGE_URL}/products/stats"
         try:
-            async with session.get(f"https://api.coinbase.com/v2/prices/{crypto}-USD/spot") as response:
-                if response.status == 200:
-                    data = await response.json()
-                    price_usd = Decimal(data["data"]["amount"])
-                    return price_usd * usd_to_rub
-        except Exception as e:
-            print(f"Ошибка при получении цены для {crypto}: {e}")
+            data = await pipeline.fetch_json(url, endpoint="coinbase.products_stats")
+            products = data.items()
+        except CircuitOpenError:
+            return {}
+        except FetchError as e:
+            logger.warning("Не удалось получить суточную статистику всех пар: {error}", error=e)
+            return {}
+        except AttributeError as e:
+            logger.error("Некорректный ответ products/stats: {error!r}", error=e)
+            return {}
+
+        changes = {}
+        for product_id, product_stats in products:
+            base, _, quote = product_id.upper().partition("-")
+            if quote != "USD":
+                continue
+            try:
+                day = product_stats["stats_24hour"]
+                changes[base] = day_change(day["open"], day["last"])
+            except (KeyError, TypeError, ArithmeticError):
+                continue
+        return changes
+
+    @staticmethod
+    async def fetch_single_price(pipeline: FetchPipeline, crypto: str) -> Decimal | None:
+        """Получение спотовой цены криптовалюты в USD"""
+        url = f"{settings.COINBASE_API_URL}/v2/prices/{crypto}-USD/spot"
+        try:
+            data = await pipeline.fetch_json(url, endpoint="coinbase.spot")
+            return Decimal(data["data"]["amount"])
+        except CircuitOpenError:
+            return None
+        except FetchError as e:
+            log_sampler.log("WARNING", "coinbase.spot", "Не удалось получить цену для {symbol}: {error}", symbol=crypto, error=e)
+            return None
+        except (KeyError, TypeError, ArithmeticError) as e:
+            log_sampler.log("ERROR", "coinbase.spot.invalid", "Некорректный ответ с ценой для {symbol}: {error!r}", symbol=crypto, error=e)
             return None
 
     @staticmethod
-    async def fetch_day_change(session, symbol: str, sem: asyncio.Semaphore) -> Decimal | None:
+    async def fetch_day_change(pipeline: FetchPipeline, symbol: str) -> Decimal | None:
         """Изменение цены за сутки (в %)"""
         symbol = symbol.strip().upper()
-        url = f"https://api.exchange.coinbase.com/products/{symbol}-USD/stats"
+        url = f"{settings.COINBASE_EXCHANGE_URL}/products/{symbol}-USD/stats"
 
         try:
-            async with sem:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        return None
-                    data = await response.json()
-                    if not data or "open" not in data or "last" not in data:
-                        return None
-                    open_price = Decimal(data["open"])
-                    last_price = Decimal(data["last"])
-                    if open_price == 0:
-                        return None
-                    return (last_price - open_price) / open_price * 100
-        except Exception as e:
-            logger.error(f"Неожиданная ошибка для {symbol}-USD: {e}", exc_info=True)
+            data = await pipeline.fetch_json(url, endpoint="coinbase.stats")
+            if not data or "open" not in data or "last" not in data:
+                return None
+            return day_change(data["open"], data["last"])
+        except CircuitOpenError:
+            return None
+        except FetchError as e:
+            log_sampler.log("WARNING", "coinbase.stats", "Не удалось получить суточную статистику {symbol}-USD: {error}", symbol=symbol, error=e)
+            return None
+        except (TypeError, ArithmeticError) as e:
+            log_sampler.log("ERROR", "coinbase.stats.invalid", "Некорректная суточная статистика {symbol}-USD: {error!r}", symbol=symbol, error=e)
             return None
 
     @staticmethod
-    async def _get_usd_to_rub_rate(session) -> Decimal:
-        """Получить курс USD к RUB"""
+    async def get_prices_and_changes(
+            cryptos: list[str],
+            pipeline: FetchPipeline | None = None,
+            fx: FxRateCache | None = None
+    ) -> dict:
+        """
+        Цены в USD с курсом USD→RUB тика и суточная динамика по всем валютам.
+
+        Курс RUB, спотовые цены и суточная статистика запрашиваются одновременно
+        в рамках общего бюджета конвейера. Цены и статистика сначала берутся
+        двумя пакетными запросами (FETCH_BULK_ENABLED), поштучно запрашиваются
+        только валюты, которых в них не оказалось. Без актуального курса RUB
+        поднимается FxRateUnavailable, и тик не записывается.
+        """
+        pipeline = pipeline or fetch_pipeline
+        fx = fx or fx_rates
+        stats = pipeline.start_tick(len(cryptos))
+        started = time.perf_counter()
+
+        async def timed_fx_rate():
+            try:
+                return await fx.get_rate(pipeline)
+            finally:
+                stats.fx_seconds = time.perf_counter() - started
+
+        async def prices_and_changes() -> tuple[list, list]:
+            bulk_prices: dict[str, Decimal] = {}
+            bulk_changes: dict[str, Decimal | None] = {}
+            if settings.FETCH_BULK_ENABLED:
+                bulk_prices, bulk_changes = await asyncio.gather(
+                    CryptoServices.fetch_bulk_prices(pipeline),
+                    CryptoServices.fetch_bulk_changes(pipeline),
+                )
+            missing_prices = [c for c in cryptos if c.upper() not in bulk_prices]
+            missing_changes = [c for c in cryptos if c.upper() not in bulk_changes]
+            if bulk_prices or bulk_changes:
+                logger.debug("Поштучно: {prices} цен, {changes} статистик", prices=len(missing_prices), changes=len(missing_changes))
+
+            single_prices, single_changes = await asyncio.gather(
+                asyncio.gather(*(CryptoServices.fetch_single_price(pipeline, c) for c in missing_prices)),
+                asyncio.gather(*(CryptoServices.fetch_day_change(pipeline, c) for c in missing_changes)),
+            )
+            bulk_prices.update((c.upper(), p) for c, p in zip(missing_prices, single_prices))
+            bulk_changes.update((c.upper(), d) for c, d in zip(missing_changes, single_changes))
+            return (
+                [bulk_prices.get(c.upper()) for c in cryptos],
+                [bulk_changes.get(c.upper()) for c in cryptos],
+            )
+
         try:
-            async with session.get("https://api.exchangerate-api.com/v4/latest/USD") as response:
-                data = await response.json()
-                return Decimal(str(data["rates"]["RUB"]))
-        except Exception as e:
-            logger.error(f"Не удалось получить курс RUB: {e}", exc_info=True)
-            return Decimal("90.0")
+            quote, prices_changes = await asyncio.gather(
+                timed_fx_rate(),
+                prices_and_changes(),
+                return_exceptions=True,
+            )
+        finally:
+            stats.fetch_seconds = time.perf_counter() - started
+            pipeline.finish_tick()
 
-    @staticmethod
-    async def get_prices_and_changes(cryptos: list[str]) -> dict:
-        async with aiohttp.ClientSession() as session:
-            sem = asyncio.Semaphore(MAX_CONCURRENT)
-            usd_to_rub = await CryptoServices._get_usd_to_rub_rate(session)
-            price_tasks = [
-                CryptoServices.fetch_single_price(session, crypto, usd_to_rub)
-                for crypto in cryptos
-            ]
-            change_tasks = [
-                CryptoServices.fetch_day_change(session, crypto, sem)
-                for crypto in cryptos
-            ]
-
-            prices = await asyncio.gather(*price_tasks)
-            changes = await asyncio.gather(*change_tasks)
-
-            result = {}
-            for crypto, price, change in zip(cryptos, prices, changes):
-                if price is not None:
-                    result[crypto] = {
-                        "name": crypto,
-                        "price": price,
-                        "dynamic": change
-                    }
-
-            return result
+        for outcome in (quote, prices_changes):
+            if isinstance(outcome, BaseException):
+                raise outcome
+        prices, changes = prices_changes
+
+        fx_rate = quantize_fx_rate(quote.rate)
+        result = {}
+        for crypto, price, change in zip(cryptos, prices, changes):
+            if price is not None:
+                result[crypto] = {
+                    "name": crypto,
+                    "price_usd": quantize_price_usd(price),
+                    "fx_rate": fx_rate,
+                    "dynamic": change
+                }
+
+        return result
@@ -1,68 +1,139 @@
-from datetime import date
+from collections.abc import AsyncIterator, Sequence
+from datetime import date, datetime, timedelta
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
-from app.crypto.dao import CryptoDAO
-from app.crypto.schemas import CryptoHistoryResponse, CryptoDynamicResponse, CryptoDynamicPoint
+from app.config import settings
+from app.crypto.cache import response_cache
+from app.crypto.dao import EPOCH, CryptoDAO, CryptoDailyDAO, CryptoHourlyDAO, CryptoRollupDAO, CryptoRollupStaleDAO
+from app.crypto.pagination import Page, decode_cursor, encode_cursor, page_size
+from app.crypto.schemas import (
+    CryptoCandle,
+    CryptoDynamicPoint,
+    CryptoDynamicResponse,
+    CryptoHistoryItem,
+    CryptoOhlcResponse,
+    OhlcResolution,
+)
+from app.crypto.streaming import encode_csv, encode_ndjson, to_decimal
+
+OHLC_RESOLUTIONS: dict[str, int] = {"5m": 5 * 60, "1h": 60 * 60, "1d": 24 * 60 * 60}
+# Свечи этих шагов совпадают с периодами агрегатов и читаются из них
+OHLC_ROLLUPS: dict[str, type[CryptoRollupDAO]] = {"1h": CryptoHourlyDAO, "1d": CryptoDailyDAO}
+
+
+def _day_runs(days: list[date]) -> list[tuple[date, date]]:
+    """Отсортированные дни — отрезками подряд идущих дней"""
+    runs: list[tuple[date, date]] = []
+    for day in days:
+        if runs and runs[-1][1] + timedelta(days=1) == day:
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
 
 
 class CryptoQueryService:
 
     @staticmethod
+    def _history_page(rows: Sequence[Row], limit: int) -> Page[CryptoHistoryItem]:
+        """
+        Строки DAO (limit + 1) в страницу ответа.
+
+        Типы столбцов уже известны, поэтому строки не валидируются и не
+        оборачиваются в модели: на 100 тыс. строк это главная статья расходов.
+        """
+        items: list[CryptoHistoryItem] = [
+            {
+                "id": row_id,
+                "name": name,
+                "price": price,
+                "dynamic": to_decimal(dynamic),
+                "created_at": created_at,
+            }
+            for row_id, name, price, dynamic, created_at in rows[:limit]
+        ]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["id"])
+        return Page(items=items, next_cursor=next_cursor)
+
+    @staticmethod
+    @response_cache.cached
     async def get_all_crypto_history(
             session: AsyncSession,
             date_from: date,
-            date_to: date
-    ) -> list[CryptoHistoryResponse]:
+            date_to: date,
+            cursor: str | None = None,
+            limit: int | None = None
+    ) -> Page[CryptoHistoryItem]:
+        """История всех валют постранично; без `limit` — страница по умолчанию."""
+        after = decode_cursor(cursor) if cursor else None
+        limit = page_size(limit)
 
-        prices = await CryptoDAO.get_history(
+        rows = await CryptoDAO.get_history(
             session=session,
             date_from=date_from,
-            date_to=date_to
+            date_to=date_to,
+            after=after,
+            limit=limit + 1
         )
 
-        return [
-            CryptoHistoryResponse(
-                id=p.id,
-                name=p.name,
-                price=p.price,
-                dynamic=p.dynamic,
-                created_at=p.created_at,
-            )
-            for p in prices
-        ]
+        return CryptoQueryService._history_page(rows, limit)
 
     @staticmethod
+    def stream_history(
+            session: AsyncSession,
+            date_from: date,
+            date_to: date,
+            output_format: str,
+            currency: str | None = None
+    ) -> AsyncIterator[bytes]:
+        """История в NDJSON или CSV пачками, без загрузки всего периода в память."""
+        chunks = CryptoDAO.stream_history(
+            session=session,
+            date_from=date_from,
+            date_to=date_to,
+            currency=currency,
+            chunk_size=settings.HISTORY_STREAM_CHUNK_SIZE
+        )
+        if output_format == "csv":
+            return encode_csv(chunks)
+        return encode_ndjson(chunks)
+
+    @staticmethod
+    @response_cache.cached
     async def get_currency_history(
             session: AsyncSession,
             currency: str,
             date_from: date,
-            date_to: date
-    ) -> list[CryptoHistoryResponse]:
+            date_to: date,
+            cursor: str | None = None,
+            limit: int | None = None
+    ) -> Page[CryptoHistoryItem]:
+        """История конкретной валюты постранично; без `limit` — страница по умолчанию."""
         try:
-            prices = await CryptoDAO.get_currency_history(
+            after = decode_cursor(cursor) if cursor else None
+            limit = page_size(limit)
+
+            rows = await CryptoDAO.get_currency_history(
                 session=session,
                 currency=currency,
                 date_from=date_from,
-                date_to=date_to
+                date_to=date_to,
+                after=after,
+                limit=limit + 1
             )
 
-            return [
-                CryptoHistoryResponse(
-                    id=p.id,
-                    name=p.name,
-                    price=p.price,
-                    dynamic=p.dynamic,
-                    created_at=p.created_at
-                )
-                for p in prices
-            ]
+            return CryptoQueryService._history_page(rows, limit)
 
         except Exception as e:
-            logger.error(f"Ошибка при получении истории валюты {currency}: {e}")
+            logger.error("Ошибка при получении истории валюты {currency}: {error}", currency=currency, error=e)
             raise
 
     @staticmethod
+    @response_cache.cached
     async def get_currency_dynamic_range(
             session: AsyncSession,
             currency: str,
@@ -73,19 +144,20 @@ class CryptoQueryService:
         try:
             currency = currency.upper()
 
-            max_dyn = await CryptoDAO.get_max_dynamic(
-                session=session,
-                currency=currency,
-                date_from=date_from,
-                date_to=date_to
-            )
-
-            min_dyn = await CryptoDAO.get_min_dynamic(
-                session=session,
-                currency=currency,
-                date_from=date_from,
-                date_to=date_to
-            )
+            if settings.ROLLUPS_ENABLED:
+                max_dyn, min_dyn = await CryptoQueryService._dynamic_extremes_from_rollups(
+                    session=session,
+                    currency=currency,
+                    date_from=date_from,
+                    date_to=date_to
+                )
+            else:
+                max_dyn, min_dyn = await CryptoDAO.get_dynamic_extremes(
+                    session=session,
+                    currency=currency,
+                    date_from=date_from,
+                    date_to=date_to
+                )
 
             if not max_dyn or not min_dyn:
                 raise ValueError(
@@ -109,7 +181,122 @@ class CryptoQueryService:
             )
 
         except Exception as e:
-            logger.error(
-                f"Ошибка при получении динамики валюты {currency}: {e}"
+            logger.error("Ошибка при получении динамики валюты {currency}: {error}", currency=currency, error=e)
+            raise
+
+    @staticmethod
+    async def _dynamic_extremes_from_rollups(
+            session: AsyncSession,
+            currency: str,
+            date_from: date,
+            date_to: date
+    ) -> tuple[Row | None, Row | None]:
+        """
+        Экстремумы по дневным агрегатам; помеченные неполными дни
+        (CryptoRollupStaleDAO) считаются по тикам. Если таких дней нет, тики
+        не читаются вовсе.
+        """
+        stale = await CryptoRollupStaleDAO.get_days(session=session, date_from=date_from, date_to=date_to)
+
+        candidates = [
+            await CryptoDailyDAO.get_dynamic_extremes(
+                session=session,
+                currency=currency,
+                date_from=date_from,
+                date_to=date_to,
+                skip=[datetime.combine(day, datetime.min.time()) for day in stale]
             )
+        ]
+        for run_from, run_to in _day_runs(stale):
+            candidates.append(await CryptoDAO.get_dynamic_extremes(
+                session=session, currency=currency, date_from=run_from, date_to=run_to
+            ))
+
+        maxima = [max_row for max_row, _ in candidates if max_row is not None]
+        minima = [min_row for _, min_row in candidates if min_row is not None]
+        return (
+            max(maxima, key=lambda row: row.dynamic, default=None),
+            min(minima, key=lambda row: row.dynamic, default=None),
+        )
+
+    @staticmethod
+    async def _ohlc_from_rollups(
+            session: AsyncSession,
+            currency: str,
+            date_from: date,
+            date_to: date,
+            resolution: OhlcResolution
+    ) -> list[Row]:
+        """Свечи из агрегатов; помеченные неполными дни строятся по тикам, как в _dynamic_extremes_from_rollups"""
+        stale = await CryptoRollupStaleDAO.get_days(session=session, date_from=date_from, date_to=date_to)
+        skip = set(stale)
+        rows = [
+            row
+            for row in await OHLC_ROLLUPS[resolution].get_ohlc(
+                session=session, currency=currency, date_from=date_from, date_to=date_to
+            )
+            if (EPOCH + timedelta(seconds=row.bucket)).date() not in skip
+        ]
+        for run_from, run_to in _day_runs(stale):
+            rows.extend(await CryptoDAO.get_ohlc(
+                session=session,
+                currency=currency,
+                date_from=run_from,
+                date_to=run_to,
+                step_seconds=OHLC_RESOLUTIONS[resolution]
+            ))
+        return sorted(rows, key=lambda row: row.bucket)
+
+    @staticmethod
+    @response_cache.cached
+    async def get_currency_ohlc(
+            session: AsyncSession,
+            currency: str,
+            date_from: date,
+            date_to: date,
+            resolution: OhlcResolution
+    ) -> CryptoOhlcResponse:
+        """OHLC-свечи валюты с заданным шагом: часовые и дневные — из агрегатов, остальные — по тикам на стороне БД."""
+        try:
+            currency = currency.upper()
+
+            if settings.ROLLUPS_ENABLED and resolution in OHLC_ROLLUPS:
+                rows = await CryptoQueryService._ohlc_from_rollups(
+                    session=session,
+                    currency=currency,
+                    date_from=date_from,
+                    date_to=date_to,
+                    resolution=resolution
+                )
+            else:
+                rows = await CryptoDAO.get_ohlc(
+                    session=session,
+                    currency=currency,
+                    date_from=date_from,
+                    date_to=date_to,
+                    step_seconds=OHLC_RESOLUTIONS[resolution]
+                )
+
+            return CryptoOhlcResponse(
+                currency=currency,
+                resolution=resolution,
+                date_from=date_from,
+                date_to=date_to,
+                candles=[
+                    CryptoCandle(
+                        bucket=EPOCH + timedelta(seconds=row.bucket),
+                        open=row.open,
+                        high=row.high,
+                        low=row.low,
+                        close=row.close,
+                        avg_dynamic=row.avg_dynamic,
+                        count=row.count,
+                    )
+                    for row in rows
+                ],
+            )
+
+        except Exception as e:
+            logger.error("Ошибка при получении свечей валюты {currency}: {error}", currency=currency, error=e)
             raise
+
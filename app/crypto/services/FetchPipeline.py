@@ -0,0 +1,357 @@
+import asyncio
+import random
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import aiohttp
+from loguru import logger
+from yarl import URL
+
+from app.config import settings
+from app.metrics import FETCH_EVENTS, FETCH_RESPONSES, FETCH_SECONDS
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class FetchError(Exception):
+    """Запрос не удался: исчерпаны попытки или ответ не подлежит повтору"""
+
+    def __init__(self, url: str, message: str, status: int | None = None):
+        super().__init__(f"{url}: {message}")
+        self.url = url
+        self.status = status
+
+
+class CircuitOpenError(FetchError):
+    """Предохранитель эндпоинта разомкнут, запрос не отправлялся"""
+
+
+class CircuitBreaker:
+    """
+    Предохранитель одного эндпоинта.
+
+    После `threshold` неудачных запросов подряд эндпоинт считается лежащим:
+    `reset_timeout` секунд запросы отклоняются сразу, затем пропускается одна
+    пробная попытка. Удача замыкает предохранитель, неудача размыкает снова.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open" or self._trial:
+            return False
+        self._trial = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def release(self) -> None:
+        """Пробный запрос завершился без исхода (отменён): следующий может стать пробным"""
+        self._trial = False
+
+    def record_failure(self) -> bool:
+        """Учесть неудачу; True, если предохранитель только что разомкнулся"""
+        self.failures += 1
+        self._trial = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+
+class RateLimiter:
+    """Token bucket: не больше `rate` запросов в секунду, всплеск до `burst`."""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class TickStats:
+    """Тайминги одного тика сбора"""
+    started_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    symbols: int = 0
+    requests: int = 0
+    failures: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    circuit_rejections: int = 0
+    fx_seconds: float = 0.0
+    fetch_seconds: float = 0.0
+    slowest_request_seconds: float = 0.0
+    request_seconds_total: float = 0.0
+
+    @property
+    def avg_request_seconds(self) -> float:
+        return self.request_seconds_total / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "symbols": self.symbols,
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "circuit_rejections": self.circuit_rejections,
+            "fx_seconds": round(self.fx_seconds, 4),
+            "fetch_seconds": round(self.fetch_seconds, 4),
+            "avg_request_seconds": round(self.avg_request_seconds, 4),
+            "slowest_request_seconds": round(self.slowest_request_seconds, 4),
+        }
+
+
+class FetchPipeline:
+    """
+    Общий HTTP-конвейер сборщика.
+
+    Держит одну долгоживущую ClientSession на все тики, общий лимит
+    одновременных запросов и token bucket на каждый хост (плюс глобальный).
+    fetch_json добавляет повторы с задержкой, учёт 429/Retry-After и
+    предохранитель на каждый эндпоинт.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int,
+            limit_per_host: int,
+            rate_limit: float = 0,
+            host_rate_limits: dict[str, float] | None = None,
+            timeout: float = 10,
+            retries: int = 3,
+            backoff_base: float = 0.25,
+            backoff_max: float = 5,
+            retry_after_max: float = 60,
+            breaker_threshold: int = 5,
+            breaker_reset: float = 30,
+    ):
+        self.max_concurrency = max_concurrency
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._host_paused_until: dict[str, float] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._rate_limiter = RateLimiter(rate_limit)
+        self._host_rate_limits = host_rate_limits or {}
+        self._host_limiters: dict[str, RateLimiter] = {}
+        self._session: aiohttp.ClientSession | None = None
+        self._tick: TickStats | None = None
+        self.last_tick: TickStats | None = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Долгоживущая сессия; пересоздаётся, только если была закрыта"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300,
+                keepalive_timeout=75,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _host_limiter(self, host: str | None) -> RateLimiter | None:
+        rate = self._host_rate_limits.get(host or "")
+        if not rate:
+            return None
+        if host not in self._host_limiters:
+            self._host_limiters[host] = RateLimiter(rate)
+        return self._host_limiters[host]
+
+    @asynccontextmanager
+    async def get(self, url: str, **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """GET в рамках общего бюджета; тайминг попадает в статистику текущего тика"""
+        session = await self.get_session()
+        host = URL(url).host
+        host_limiter = self._host_limiter(host)
+        # Хост ответил 429 с Retry-After: ждут все запросы к нему, а не только повтор
+        pause = self._host_paused_until.get(host, 0) - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        async with self._semaphore:
+            await self._rate_limiter.acquire()
+            if host_limiter:
+                await host_limiter.acquire()
+            started = time.perf_counter()
+            status = "error"
+            try:
+                async with session.get(url, **kwargs) as response:
+                    status = str(response.status)
+                    yield response
+            finally:
+                elapsed = time.perf_counter() - started
+                self._record(elapsed, status != "200")
+                FETCH_RESPONSES.inc(host or "", status)
+                FETCH_SECONDS.observe(elapsed, host or "")
+
+    async def fetch_json(self, url: str, endpoint: str | None = None, timeout: float | None = None, **kwargs) -> Any:
+        """
+        GET с разбором JSON.
+
+        Сетевые ошибки, таймауты, 429 и 5xx повторяются до `retries` раз с
+        экспоненциальной задержкой и случайным джиттером; при 429 задержку
+        задаёт Retry-After. Прочие статусы не повторяются. `endpoint` — ключ
+        предохранителя (по умолчанию хост). При неудаче — FetchError.
+        """
+        endpoint = endpoint or URL(url).host or url
+        breaker = self._breaker(endpoint)
+        trial = breaker.state == "half_open"
+        if not breaker.allow():
+            self._count("circuit_rejections")
+            raise CircuitOpenError(url, f"предохранитель {endpoint} разомкнут")
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        try:
+            return await self._fetch_json(url, endpoint, breaker, **kwargs)
+        finally:
+            if trial:
+                # Отмена или непредвиденное исключение не должны навсегда занять пробный запрос
+                breaker.release()
+
+    async def _fetch_json(self, url: str, endpoint: str, breaker: CircuitBreaker, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            delay = None
+            try:
+                async with self.get(url, **kwargs) as response:
+                    if response.status == 200:
+                        data = await response.json(content_type=None)
+                        breaker.record_success()
+                        return data
+                    error = FetchError(url, f"HTTP {response.status}", status=response.status)
+                    if response.status not in RETRY_STATUSES:
+                        # Эндпоинт ответил, значит жив: ошибка относится к самому запросу
+                        breaker.record_success()
+                        raise error
+                    if response.status == 429:
+                        self._count("rate_limited")
+                        delay = self._retry_after(response.headers.get("Retry-After"))
+                        if delay is not None:
+                            self._host_paused_until[URL(url).host] = time.monotonic() + delay
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                error = FetchError(url, repr(e))
+
+            if attempt >= self.retries:
+                if breaker.record_failure():
+                    logger.warning("Предохранитель {endpoint} разомкнут на {seconds} с: {error}", endpoint=endpoint, seconds=self.breaker_reset, error=error)
+                raise error
+            attempt += 1
+            self._count("retries")
+            await asyncio.sleep(delay if delay is not None else self._backoff(attempt))
+
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        if endpoint not in self._breakers:
+            self._breakers[endpoint] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+        return self._breakers[endpoint]
+
+    def _backoff(self, attempt: int) -> float:
+        """Полный джиттер: случайная задержка до base * 2^(attempt-1), не больше backoff_max"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _retry_after(self, value: str | None) -> float | None:
+        """Retry-After в секундах или HTTP-датой; None, если заголовка нет или он не разобран"""
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = (parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds()
+            except (TypeError, ValueError):
+                return None
+        return min(max(seconds, 0.0), self.retry_after_max)
+
+    def breaker_states(self) -> dict[str, str]:
+        return {endpoint: breaker.state for endpoint, breaker in self._breakers.items()}
+
+    def _count(self, counter: str) -> None:
+        FETCH_EVENTS.inc(counter)
+        if self._tick is not None:
+            setattr(self._tick, counter, getattr(self._tick, counter) + 1)
+
+    def _record(self, elapsed: float, failed: bool) -> None:
+        tick = self._tick
+        if tick is None:
+            return
+        tick.requests += 1
+        tick.failures += failed
+        tick.request_seconds_total += elapsed
+        tick.slowest_request_seconds = max(tick.slowest_request_seconds, elapsed)
+
+    def start_tick(self, symbols: int) -> TickStats:
+        self._tick = TickStats(symbols=symbols)
+        return self._tick
+
+    def finish_tick(self) -> TickStats | None:
+        tick, self._tick = self._tick, None
+        if tick is not None:
+            self.last_tick = tick
+            logger.info("Статистика тика: {tick}", tick=tick.as_dict())
+        return tick
+
+
+fetch_pipeline = FetchPipeline(
+    max_concurrency=settings.FETCH_MAX_CONCURRENCY,
+    limit_per_host=settings.FETCH_LIMIT_PER_HOST,
+    rate_limit=settings.FETCH_RATE_LIMIT,
+    host_rate_limits=settings.FETCH_HOST_RATE_LIMITS,
+    timeout=settings.FETCH_TIMEOUT_SECONDS,
+    retries=settings.FETCH_RETRIES,
+    backoff_base=settings.FETCH_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.FETCH_BACKOFF_MAX_SECONDS,
+    retry_after_max=settings.FETCH_RETRY_AFTER_MAX_SECONDS,
+    breaker_threshold=settings.FETCH_BREAKER_THRESHOLD,
+    breaker_reset=settings.FETCH_BREAKER_RESET_SECONDS,
+)
@@ -0,0 +1,77 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from decimal import Decimal
+
+from loguru import logger
+
+from app.config import settings
+from app.crypto.services.FetchPipeline import FetchError, FetchPipeline
+
+
+class FxRateUnavailable(Exception):
+    """Нет ни свежего курса, ни последнего удачного в пределах допустимого возраста"""
+
+
+@dataclass(frozen=True)
+class FxQuote:
+    rate: Decimal
+    fetched_at: datetime
+
+    @property
+    def age_seconds(self) -> float:
+        return (datetime.now(UTC) - self.fetched_at).total_seconds()
+
+
+class FxRateCache:
+    """
+    Курс USD→RUB с временем последнего удачного получения.
+
+    Курс меняется медленнее тиков, поэтому в пределах `ttl` он не запрашивается
+    повторно. Если источник недоступен, используется последний удачный курс не
+    старше `max_age`; старше — FxRateUnavailable: лучше пропустить тик, чем
+    записать цены по выдуманному курсу.
+    """
+
+    def __init__(self, ttl: float, max_age: float, url: str | None = None):
+        self.ttl = ttl
+        self.max_age = max_age
+        self._url = url
+        self.last_good: FxQuote | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def url(self) -> str:
+        return self._url or settings.FX_RATE_URL
+
+    def clear(self) -> None:
+        self.last_good = None
+
+    async def get_rate(self, pipeline: FetchPipeline) -> FxQuote:
+        quote = self.last_good
+        if quote is not None and quote.age_seconds < self.ttl:
+            return quote
+
+        async with self._lock:
+            quote = self.last_good
+            if quote is not None and quote.age_seconds < self.ttl:
+                return quote
+            try:
+                data = await pipeline.fetch_json(self.url, endpoint="fx")
+                rate = Decimal(str(data["rates"]["RUB"]))
+                if not rate.is_finite() or rate <= 0:
+                    raise ValueError(f"некорректный курс {rate}")
+            except (FetchError, KeyError, TypeError, ValueError, ArithmeticError) as e:
+                if quote is not None and quote.age_seconds <= self.max_age:
+                    logger.warning(
+                        "Курс RUB не обновлён ({error}), используется курс {rate} от {fetched_at:%Y-%m-%d %H:%M:%S} UTC",
+                        error=e, rate=quote.rate, fetched_at=quote.fetched_at
+                    )
+                    return quote
+                raise FxRateUnavailable(f"Нет актуального курса RUB: {e}") from e
+
+            self.last_good = FxQuote(rate=rate, fetched_at=datetime.now(UTC))
+            return self.last_good
+
+
+fx_rates = FxRateCache(ttl=settings.FX_RATE_TTL_SECONDS, max_age=settings.FX_RATE_MAX_AGE_SECONDS)
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+from loguru import logger
+
+from app.config import settings
+
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+
+class SymbolRegistry:
+    """
+    Кэш списка торгуемых на Coinbase валют.
+
+    Список живёт в памяти и обновляется не чаще раза в `ttl` секунд условным
+    запросом (If-None-Match). Последний удачный список сохраняется в файл и
+    подхватывается после рестарта, поэтому сбой Coinbase не оставляет сбор без валют.
+    """
+
+    def __init__(self, products_url: str, ttl: float, cache_file: str | None = None):
+        self.products_url = products_url
+        self.ttl = ttl
+        self.cache_file = cache_file
+        self._symbols: list[str] = []
+        self._etag: str | None = None
+        self._fetched_at: float | None = None
+        self._lock = asyncio.Lock()
+        self._load()
+
+    @property
+    def symbols(self) -> list[str]:
+        """Текущий список валют без обращения к сети"""
+        return self._symbols
+
+    def is_stale(self) -> bool:
+        return self._fetched_at is None or time.monotonic() - self._fetched_at >= self.ttl
+
+    async def get_symbols(self, session: aiohttp.ClientSession | None = None) -> list[str]:
+        """Список валют из памяти; при истёкшем TTL сначала обновляется"""
+        if self.is_stale():
+            async with self._lock:
+                if self.is_stale():
+                    await self.refresh(session)
+        return self._symbols
+
+    async def refresh(self, session: aiohttp.ClientSession | None = None) -> list[str]:
+        """Обновить список; при ошибке остаётся последний известный"""
+        try:
+            if session is None:
+                async with aiohttp.ClientSession() as own_session:
+                    await self._fetch(own_session)
+            else:
+                await self._fetch(session)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError, TypeError) as e:
+            logger.error(
+                "Не удалось обновить список валют, используется последний известный ({count} шт.): {error}",
+                count=len(self._symbols), error=e
+            )
+        return self._symbols
+
+    async def _fetch(self, session: aiohttp.ClientSession) -> None:
+        headers = {"If-None-Match": self._etag} if self._etag and self._symbols else {}
+        async with session.get(self.products_url, headers=headers, timeout=REQUEST_TIMEOUT) as response:
+            if response.status == 304:
+                self._fetched_at = time.monotonic()
+                return
+            response.raise_for_status()
+            products = await response.json()
+
+        self._symbols = sorted({p["base_currency"] for p in products if p["status"] == "online"})
+        self._etag = response.headers.get("ETag")
+        self._fetched_at = time.monotonic()
+        logger.info("Список валют обновлён: {count} шт.", count=len(self._symbols))
+        self._persist()
+
+    def _load(self) -> None:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, encoding="utf-8") as f:
+                data = json.load(f)
+            self._symbols = list(data["symbols"])
+            self._etag = data.get("etag")
+            logger.info("Загружен сохранённый список валют: {count} шт.", count=len(self._symbols))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error("Не удалось прочитать {path}: {error}", path=self.cache_file, error=e)
+
+    def _persist(self) -> None:
+        if not self.cache_file:
+            return
+        tmp_file = f"{self.cache_file}.tmp"
+        try:
+            # Имя файла без каталога — файл в текущем каталоге, создавать нечего
+            if directory := os.path.dirname(self.cache_file):
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"symbols": self._symbols, "etag": self._etag, "saved_at": time.time()}, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logger.error("Не удалось сохранить список валют в {path}: {error}", path=self.cache_file, error=e)
+
+
+symbol_registry = SymbolRegistry(
+    products_url=f"{settings.COINBASE_EXCHANGE_URL}/products",
+    ttl=settings.SYMBOLS_TTL_SECONDS,
+    cache_file=settings.SYMBOLS_CACHE_FILE,
+)
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import random
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from decimal import Decimal
+
+import aiohttp
+from loguru import logger
+
+from app.config import settings
+from app.log import log_sampler
+
+
+@dataclass(frozen=True)
+class TickerPrice:
+    price: Decimal
+    open_24h: Decimal | None
+    sequence: int | None = None
+
+
+class TickerStream:
+    """
+    Поток цен из канала ticker Coinbase Exchange по WebSocket.
+
+    Каждое сообщение перезаписывает цену своей валюты в таблице `latest`, в
+    базу ничего не пишется. Раз в интервал сброса планировщик забирает
+    pending() — только валюты, цена которых отличается от последней
+    записанной, — и после записи отмечает их mark_flushed(). При обрыве
+    соединения поток переподключается с экспоненциальной задержкой и заново
+    подписывается на актуальный список валют.
+    """
+
+    def __init__(self, url: str, reconnect_delay: float = 1, max_reconnect_delay: float = 30, heartbeat: float = 30):
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.heartbeat = heartbeat
+        self.latest: dict[str, TickerPrice] = {}
+        self.connected = False
+        self.messages = 0
+        self.reconnects = 0
+        self._flushed: dict[str, Decimal] = {}
+        self._dirty: set[str] = set()
+
+    def clear(self) -> None:
+        self.latest.clear()
+        self._flushed.clear()
+        self._dirty.clear()
+
+    def handle_message(self, message: dict) -> None:
+        """Учесть одно сообщение канала; всё, кроме ticker по паре к USD, пропускается"""
+        kind = message.get("type")
+        if kind == "error":
+            log_sampler.log(
+                "ERROR", "coinbase.ws", "Coinbase WebSocket: {message} {reason}",
+                message=message.get("message"), reason=message.get("reason", "")
+            )
+            return
+        if kind != "ticker":
+            return
+
+        symbol, _, quote = str(message.get("product_id", "")).partition("-")
+        if quote != "USD" or not symbol:
+            return
+        try:
+            price = Decimal(message["price"])
+            open_24h = Decimal(message["open_24h"]) if message.get("open_24h") is not None else None
+        except (KeyError, TypeError, ArithmeticError):
+            return
+        if not price.is_finite() or price <= 0:
+            return
+
+        sequence = message.get("sequence")
+        previous = self.latest.get(symbol)
+        # После переподключения биржа может повторить уже полученные сообщения
+        if previous is not None and previous.sequence is not None and sequence is not None and sequence <= previous.sequence:
+            return
+
+        self.messages += 1
+        self.latest[symbol] = TickerPrice(price=price, open_24h=open_24h, sequence=sequence)
+        if price != self._flushed.get(symbol):
+            self._dirty.add(symbol)
+        else:
+            self._dirty.discard(symbol)
+
+    def pending(self) -> dict[str, TickerPrice]:
+        """Валюты, цена которых изменилась с прошлого сброса"""
+        return {symbol: self.latest[symbol] for symbol in self._dirty}
+
+    def mark_flushed(self, flushed: dict[str, TickerPrice]) -> None:
+        for symbol, ticker in flushed.items():
+            self._flushed[symbol] = ticker.price
+            # Пока шла запись, могла прийти новая цена — её запишет следующий сброс
+            if self.latest.get(symbol) == ticker:
+                self._dirty.discard(symbol)
+
+    async def run(
+            self,
+            session: aiohttp.ClientSession,
+            symbols: Callable[[], Awaitable[list[str]]]
+    ) -> None:
+        """Держать подписку, пока задачу не отменят"""
+        delay = self.reconnect_delay
+        while True:
+            try:
+                product_ids = [f"{symbol}-USD" for symbol in await symbols()]
+                async with session.ws_connect(self.url, heartbeat=self.heartbeat) as ws:
+                    await ws.send_json({"type": "subscribe", "product_ids": product_ids, "channels": ["ticker"]})
+                    self.connected = True
+                    logger.info("Подписка на ticker: {count} пар", count=len(product_ids))
+                    delay = self.reconnect_delay
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            try:
+                                self.handle_message(json.loads(msg.data))
+                            except ValueError:
+                                continue
+                        elif msg.type == aiohttp.WSMsgType.ERROR:
+                            raise ws.exception() or aiohttp.ClientError("ошибка WebSocket")
+                logger.warning("Соединение ticker закрыто биржей")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Соединение ticker прервано: {error!r}", error=e)
+            finally:
+                self.connected = False
+
+            self.reconnects += 1
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+
+ticker_stream = TickerStream(settings.COINBASE_WS_URL)
@@ -0,0 +1,93 @@
+import hashlib
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from email.utils import format_datetime, parsedate_to_datetime
+
+from pydantic import TypeAdapter
+from sqlalchemy import Row
+
+from app.crypto.schemas import CryptoLatestResponse, SCryptoCreate
+
+_latest_adapter = TypeAdapter(list[CryptoLatestResponse])
+
+
+@dataclass(frozen=True)
+class LatestSnapshot:
+    """Готовый к отдаче ответ /crypto/latest: тело и заголовки считаются один раз на тик"""
+    tick_at: datetime
+    count: int
+    body: bytes
+    etag: str
+    headers: dict[str, str] = field(default_factory=dict)
+
+    def not_modified(self, if_none_match: str | None, if_modified_since: str | None) -> bool:
+        """Можно ли ответить клиенту 304"""
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag in tags
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).astimezone(UTC).replace(tzinfo=None)
+            except (TypeError, ValueError):
+                return False
+            return self.tick_at.replace(microsecond=0) <= since
+        return False
+
+
+class LatestPrices:
+    """
+    Последние цены всех валют в памяти процесса.
+
+    Планировщик публикует новый снимок после каждого успешного тика; замена —
+    одно присваивание ссылки, поэтому читатели видят либо старый, либо новый снимок целиком.
+    """
+
+    def __init__(self):
+        self._snapshot: LatestSnapshot | None = None
+        self._rows: dict[str, SCryptoCreate | Row] = {}
+
+    @property
+    def snapshot(self) -> LatestSnapshot | None:
+        return self._snapshot
+
+    def clear(self) -> None:
+        self._snapshot = None
+        self._rows = {}
+
+    def publish(self, rows: Sequence[SCryptoCreate | Row], tick_at: datetime, merge: bool = False) -> LatestSnapshot:
+        """
+        Опубликовать снимок из записанных тиков или строк CryptoDAO.get_latest_ticks.
+        С merge=True строки дополняют предыдущий снимок: потоковый сбор пишет
+        только изменившиеся валюты, остальные остаются с ценой и временем своей
+        последней записи.
+        """
+        latest = {**self._rows, **{row.name: row for row in rows}} if merge else {row.name: row for row in rows}
+        items = [
+            CryptoLatestResponse.model_construct(
+                name=row.name,
+                price=row.price,
+                dynamic=row.dynamic,
+                created_at=row.created_at or tick_at,
+            )
+            for row in sorted(latest.values(), key=lambda row: row.name)
+        ]
+        body = _latest_adapter.dump_json(items)
+        etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        snapshot = LatestSnapshot(
+            tick_at=tick_at,
+            count=len(items),
+            body=body,
+            etag=etag,
+            headers={
+                "ETag": etag,
+                "Last-Modified": format_datetime(tick_at.replace(tzinfo=UTC), usegmt=True),
+                "Cache-Control": "no-cache",
+            },
+        )
+        self._rows = latest
+        self._snapshot = snapshot
+        return snapshot
+
+
+latest_prices = LatestPrices()
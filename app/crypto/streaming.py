@@ -0,0 +1,76 @@
+import csv
+import io
+from collections.abc import AsyncIterator, Sequence
+from decimal import Decimal
+
+import orjson
+from sqlalchemy import Row
+
+from app.responses import encode_decimal
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+STREAM_MEDIA_TYPES = {"ndjson": NDJSON_MEDIA_TYPE, "csv": CSV_MEDIA_TYPE}
+HISTORY_COLUMNS = ("id", "name", "price", "dynamic", "created_at")
+
+
+def resolve_format(output_format: str | None, accept: str | None) -> str:
+    """Формат ответа: явный параметр `format`, иначе по заголовку Accept, иначе json"""
+    if output_format:
+        return output_format
+    if accept:
+        if NDJSON_MEDIA_TYPE in accept:
+            return "ndjson"
+        if CSV_MEDIA_TYPE in accept:
+            return "csv"
+    return "json"
+
+
+def to_decimal(value) -> Decimal | None:
+    """Float из БД в Decimal так же, как это делает валидация Decimal-полей схем ответа"""
+    if value is None or isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def _decimal(value) -> str | None:
+    # Так же, как Decimal-поля CryptoHistoryResponse сериализуются в JSON
+    value = to_decimal(value)
+    return None if value is None else str(value)
+
+
+def _row_values(row: Row) -> tuple:
+    row_id, name, price, dynamic, created_at = row
+    return row_id, name, _decimal(price), _decimal(dynamic), created_at.isoformat()
+
+
+def _ndjson_line(row: Row) -> bytes:
+    row_id, name, price, dynamic, created_at = row
+    dynamic = to_decimal(dynamic)
+    return orjson.dumps({
+        "id": row_id,
+        "name": name,
+        "price": encode_decimal(to_decimal(price)),
+        "dynamic": None if dynamic is None else encode_decimal(dynamic),
+        "created_at": created_at,
+    }, option=orjson.OPT_APPEND_NEWLINE)
+
+
+async def encode_ndjson(chunks: AsyncIterator[Sequence[Row]]) -> AsyncIterator[bytes]:
+    """Одна JSON-строка на запись, один кусок ответа на пачку; Decimal — по политике JSON_DECIMAL_MODE"""
+    async for rows in chunks:
+        yield b"".join(_ndjson_line(row) for row in rows)
+
+
+async def encode_csv(chunks: AsyncIterator[Sequence[Row]]) -> AsyncIterator[bytes]:
+    """CSV с заголовком, один кусок ответа на пачку"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HISTORY_COLUMNS)
+    async for rows in chunks:
+        writer.writerows(_row_values(row) for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
@@ -0,0 +1,74 @@
+"""
+Снимок /crypto/latest и кэш ответов в процессах API.
+
+Тики пишет коллектор — отдельный процесс или один из воркеров uvicorn, — а
+снимок и кэш живут в памяти каждого процесса API. Поэтому каждый процесс раз
+в TICK_WATCH_INTERVAL_SECONDS спрашивает у базы время последнего тика (MAX по
+индексу ix_cryptos_created_at) и, если оно сдвинулось, дочитывает новые тики
+в снимок и сбрасывает кэш ответов.
+"""
+import asyncio
+from datetime import datetime
+
+from loguru import logger
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.crypto.cache import TickCache, response_cache
+from app.crypto.dao import CryptoDAO
+from app.crypto.snapshot import LatestPrices, latest_prices
+from app.dao.database import async_session_maker
+
+
+class TickWatcher:
+    def __init__(
+            self,
+            session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+            prices: LatestPrices = latest_prices,
+            cache: TickCache = response_cache,
+            interval: float = settings.TICK_WATCH_INTERVAL_SECONDS
+    ):
+        self.session_maker = session_maker
+        self.prices = prices
+        self.cache = cache
+        self.interval = interval
+        self._seen: datetime | None = None
+
+    def _seen_until(self) -> datetime | None:
+        """Время последнего учтённого тика; коллектор в том же процессе публикует снимок сам"""
+        snapshot = self.prices.snapshot
+        if snapshot is None:
+            return self._seen
+        if self._seen is None:
+            return snapshot.tick_at
+        return max(self._seen, snapshot.tick_at)
+
+    async def poll(self) -> bool:
+        """Проверить базу; True, если появились новые тики"""
+        seen = self._seen_until()
+        async with self.session_maker() as session:
+            newest = await CryptoDAO.get_newest_created_at(session)
+            if newest is None or (seen is not None and newest <= seen):
+                return False
+            rows = await CryptoDAO.get_latest_ticks(session, since=seen)
+
+        self.cache.bump_generation()
+        self.prices.publish(rows, newest, merge=seen is not None)
+        self._seen = newest
+        return True
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Опрашивать базу до сигнала stop"""
+        while not stop.is_set():
+            try:
+                await self.poll()
+            except SQLAlchemyError as e:
+                logger.error("Не удалось проверить новые тики: {error}", error=e)
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except TimeoutError:
+                pass
+
+
+tick_watcher = TickWatcher()
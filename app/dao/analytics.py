@@ -0,0 +1,93 @@
+"""
+Колоночный движок DuckDB для агрегатов по диапазонам.
+
+DuckDB подключает основное хранилище (файл SQLite или MySQL) только на чтение
+через свои расширения sqlite/mysql и считает по нему свечи векторно, не нагружая
+основную базу сканированием. Асинхронного драйвера у DuckDB нет, поэтому
+запросы выполняются в отдельном потоке.
+
+Включается настройкой ANALYTICS_ENGINE=duckdb; нужны пакеты duckdb и duckdb-engine.
+"""
+import asyncio
+import threading
+from collections.abc import Sequence
+
+from sqlalchemy import Engine, Row, create_engine, event, make_url
+from sqlalchemy.sql import Select
+
+from app.config import settings
+
+
+class DuckDBAnalytics:
+    def __init__(self, init_sql: Sequence[str] = (), database: str = ":memory:"):
+        self.init_sql = list(init_sql)
+        self.database = database
+        self._engine: Engine | None = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def attach(cls, source_url: str, database: str = ":memory:") -> "DuckDBAnalytics":
+        """Движок поверх основного хранилища: его таблицы видны без префикса схемы"""
+        return cls(init_sql=attach_statements(source_url), database=database)
+
+    @property
+    def engine(self) -> Engine:
+        with self._lock:
+            if self._engine is None:
+                self._engine = create_engine(f"duckdb:///{self.database}")
+                event.listen(self._engine, "connect", self._on_connect)
+        return self._engine
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        for sql in self.init_sql:
+            dbapi_connection.execute(sql)
+
+    def _fetch_all(self, stmt: Select) -> Sequence[Row]:
+        with self.engine.connect() as conn:
+            return conn.execute(stmt).all()
+
+    async def fetch_all(self, stmt: Select) -> Sequence[Row]:
+        return await asyncio.to_thread(self._fetch_all, stmt)
+
+    def dispose(self) -> None:
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
+
+
+def _sql_string(value: str) -> str:
+    """Строковый литерал SQL"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _dsn_value(value: object) -> str:
+    """Значение key=value строки подключения mysql-расширения DuckDB: в двойных кавычках, \\ и " экранированы"""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def attach_statements(source_url: str) -> list[str]:
+    """SQL для подключения основного хранилища к DuckDB под именем src"""
+    url = make_url(source_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        target = f"{_sql_string(url.database)} AS src (TYPE sqlite, READ_ONLY)"
+    elif backend == "mysql":
+        params = {
+            "host": url.host,
+            "port": url.port or 3306,
+            "user": url.username,
+            "password": url.password,
+            "database": url.database,
+        }
+        dsn = " ".join(f"{key}={_dsn_value(value)}" for key, value in params.items() if value is not None)
+        target = f"{_sql_string(dsn)} AS src (TYPE mysql, READ_ONLY)"
+    else:
+        raise ValueError(f"DuckDB не умеет подключать хранилище {backend}")
+    return [f"INSTALL {backend}", f"LOAD {backend}", f"ATTACH {target}", "USE src"]
+
+
+analytics_engine: DuckDBAnalytics | None = (
+    DuckDBAnalytics.attach(settings.DB_URL, database=settings.DUCKDB_PATH)
+    if settings.ANALYTICS_ENGINE == "duckdb"
+    else None
+)
@@ -0,0 +1,210 @@
+"""
+Архив тиков cryptos в Parquet.
+
+Политика хранения выгружает старые периоды сюда, прежде чем удалить их из
+базы. Файл — один период [start, end), имя хранит границы, поэтому список
+архива не требует ни базы, ни метаданных. Строки — как у истории:
+(id, name, price, dynamic, created_at), где price — цена в рублях, посчитанная
+базой при выгрузке, плюс исходные price_usd и fx_rate. Внутри файла строки
+отсортированы по (name, created_at), и фильтр по валюте пропускает лишние
+группы строк.
+
+Файлы из разных версий схемы читаются вместе (union_by_name): в ранних нет
+price_usd и fx_rate, а price в них уже в рублях. У тиков, записанных до
+перехода на USD, price_usd и fx_rate пусты, а price — их сохранённая рублёвая
+цена.
+
+Читает и пишет DuckDB (пакет duckdb из extras analytics) в отдельном потоке:
+асинхронного драйвера у него нет.
+"""
+import asyncio
+import csv
+import os
+import tempfile
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+
+from app.config import settings
+from app.crypto.prices import FX_RATE, PRICE_RUB, PRICE_USD
+
+FILE_PREFIX = "cryptos_"
+FILE_TIME_FORMAT = "%Y%m%dT%H%M%S"
+CSV_COLUMNS = (
+    f"{{'id': 'BIGINT', 'name': 'VARCHAR', 'price': '{PRICE_RUB}', 'dynamic': 'DOUBLE', "
+    f"'created_at': 'TIMESTAMP', 'price_usd': '{PRICE_USD}', 'fx_rate': '{FX_RATE}'}}"
+)
+
+type Keyset = tuple[datetime, int]
+
+
+@dataclass(frozen=True)
+class ArchivedRange:
+    start: datetime
+    end: datetime
+    path: str
+
+    def overlaps(self, dt_from: datetime, dt_to: datetime) -> bool:
+        return self.start <= dt_to and dt_from < self.end
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class ParquetArchive:
+    def __init__(self, directory: str, compression: str = "zstd"):
+        self.directory = directory
+        self.compression = compression
+        self._ranges: list[ArchivedRange] = []
+        self._listed_mtime: int | None = None
+
+    def ranges(self) -> list[ArchivedRange]:
+        """Архивные периоды по возрастанию; каталог перечитывается, только если он менялся"""
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            self._ranges, self._listed_mtime = [], None
+            return self._ranges
+        if mtime != self._listed_mtime:
+            ranges = []
+            for filename in os.listdir(self.directory):
+                parsed = self._parse(filename)
+                if parsed is not None:
+                    ranges.append(ArchivedRange(*parsed, path=os.path.join(self.directory, filename)))
+            self._ranges = sorted(ranges, key=lambda item: item.start)
+            self._listed_mtime = mtime
+        return self._ranges
+
+    @property
+    def archived_until(self) -> datetime | None:
+        """Конец последнего архивного периода: всё раньше него читается из Parquet"""
+        ranges = self.ranges()
+        return max(item.end for item in ranges) if ranges else None
+
+    @staticmethod
+    def _parse(filename: str) -> tuple[datetime, datetime] | None:
+        if not filename.startswith(FILE_PREFIX) or not filename.endswith(".parquet"):
+            return None
+        start, _, end = filename.removeprefix(FILE_PREFIX).removesuffix(".parquet").partition("_")
+        try:
+            return datetime.strptime(start, FILE_TIME_FORMAT), datetime.strptime(end, FILE_TIME_FORMAT)
+        except ValueError:
+            return None
+
+    def path_for(self, start: datetime, end: datetime) -> str:
+        return os.path.join(
+            self.directory,
+            f"{FILE_PREFIX}{start:{FILE_TIME_FORMAT}}_{end:{FILE_TIME_FORMAT}}.parquet"
+        )
+
+    async def write(self, start: datetime, end: datetime, chunks: AsyncIterator[Sequence[tuple]]) -> int:
+        """
+        Выгрузить период [start, end) в Parquet. Возвращает число строк.
+
+        Строки сначала пишутся во временный CSV (память не зависит от длины
+        периода), затем DuckDB сортирует их и сжимает в Parquet. Файл
+        появляется под своим именем только целиком.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, staging = tempfile.mkstemp(suffix=".csv", dir=self.directory)
+        count = 0
+        try:
+            with os.fdopen(fd, "w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                async for rows in chunks:
+                    writer.writerows(
+                        (
+                            row_id, name, price, "" if dynamic is None else dynamic,
+                            created_at.isoformat(sep=" "), price_usd, fx_rate
+                        )
+                        for row_id, name, price, dynamic, created_at, price_usd, fx_rate in rows
+                    )
+                    count += len(rows)
+            if count:
+                await asyncio.to_thread(self._copy_to_parquet, staging, self.path_for(start, end))
+        finally:
+            os.remove(staging)
+        return count
+
+    def _copy_to_parquet(self, staging: str, path: str) -> None:
+        partial = f"{path}.partial"
+        with self._connect() as conn:
+            conn.execute(
+                f"COPY (SELECT * FROM read_csv({_quote(staging)}, header = false, nullstr = '', "
+                f"columns = {CSV_COLUMNS}) ORDER BY name, created_at, id) "
+                f"TO {_quote(partial)} (FORMAT parquet, COMPRESSION {self.compression})"
+            )
+        os.replace(partial, path)
+
+    async def fetch(
+            self,
+            dt_from: datetime,
+            dt_to: datetime,
+            currency: str | None = None,
+            after: Keyset | None = None,
+            limit: int | None = None
+    ) -> list[tuple]:
+        """Строки истории из архива по убыванию (created_at, id) — как у CryptoDAO.get_history"""
+        query = self._query(dt_from, dt_to, currency, after, limit)
+        if query is None:
+            return []
+        return await asyncio.to_thread(self._fetch_all, *query)
+
+    async def stream(
+            self,
+            dt_from: datetime,
+            dt_to: datetime,
+            currency: str | None = None,
+            chunk_size: int = 5000
+    ) -> AsyncIterator[list[tuple]]:
+        """Строки истории из архива пачками по `chunk_size`"""
+        query = self._query(dt_from, dt_to, currency)
+        if query is None:
+            return
+        conn = self._connect()
+        try:
+            await asyncio.to_thread(conn.execute, *query)
+            while rows := await asyncio.to_thread(conn.fetchmany, chunk_size):
+                yield rows
+        finally:
+            conn.close()
+
+    def _query(
+            self,
+            dt_from: datetime,
+            dt_to: datetime,
+            currency: str | None = None,
+            after: Keyset | None = None,
+            limit: int | None = None
+    ) -> tuple[str, list] | None:
+        files = [item.path for item in self.ranges() if item.overlaps(dt_from, dt_to)]
+        if not files:
+            return None
+        conditions, params = ["created_at >= ?", "created_at <= ?"], [dt_from, dt_to]
+        if currency is not None:
+            conditions.append("name = ?")
+            params.append(currency.upper())
+        if after is not None:
+            conditions.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params.extend([after[0], after[0], after[1]])
+        sql = (
+            f"SELECT id, name, price, dynamic, created_at "
+            f"FROM read_parquet([{', '.join(map(_quote, files))}], union_by_name = true) "
+            f"WHERE {' AND '.join(conditions)} ORDER BY created_at DESC, id DESC"
+        )
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return sql, params
+
+    def _fetch_all(self, sql: str, params: list) -> list[tuple]:
+        with self._connect() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _connect():
+        import duckdb
+        return duckdb.connect()
+
+
+cryptos_archive = ParquetArchive(settings.CRYPTOS_ARCHIVE_DIR)
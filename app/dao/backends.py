@@ -0,0 +1,98 @@
+import os
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import AsyncAdaptedQueuePool, Select, event, make_url
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+
+@dataclass
+class PoolWaitStats:
+    """Сколько запросы ждали свободного соединения"""
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Очередь соединений, которая замеряет время получения соединения"""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            self.wait_stats.timeouts += 1
+            raise
+        finally:
+            self.wait_stats.observe(time.perf_counter() - started)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "checkouts": self.wait_stats.checkouts,
+            "timeouts": self.wait_stats.timeouts,
+            "wait_seconds_total": self.wait_stats.wait_seconds_total,
+            "wait_seconds_max": self.wait_stats.wait_seconds_max,
+        }
+
+
+def create_storage_engine(url: str, statement_timeout_ms: int = 0, **kwargs: Any) -> AsyncEngine:
+    """
+    Асинхронный движок для выбранного хранилища.
+
+    Если класс пула не задан явно, используется TimedQueuePool. statement_timeout_ms
+    ограничивает время SELECT на стороне MySQL (max_execution_time); SQLite такого
+    ограничения не поддерживает. Встроенный SQLite переводится в режим WAL,
+    чтобы API мог читать, пока планировщик пишет тик.
+    """
+    parsed = make_url(url)
+    kwargs.setdefault("poolclass", TimedQueuePool)
+
+    if parsed.get_backend_name() != "sqlite":
+        engine = create_async_engine(url=url, **kwargs)
+        if statement_timeout_ms:
+            event.listen(engine.sync_engine, "connect", _mysql_statement_timeout(statement_timeout_ms))
+        return engine
+
+    if parsed.database and parsed.database != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(parsed.database)), exist_ok=True)
+    kwargs.setdefault("connect_args", {"timeout": 30})
+    engine = create_async_engine(url=url, **kwargs)
+    event.listen(engine.sync_engine, "connect", _sqlite_pragmas)
+    return engine
+
+
+def statement_timeout[S: Select](stmt: S, timeout_ms: int) -> S:
+    """Своё ограничение времени для одного запроса; 0 — без ограничения (например, для выгрузок)"""
+    return stmt.prefix_with(f"/*+ MAX_EXECUTION_TIME({timeout_ms}) */", dialect="mysql")
+
+
+def _mysql_statement_timeout(timeout_ms: int):
+    def set_timeout(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET SESSION max_execution_time = {int(timeout_ms)}")
+        cursor.close()
+
+    return set_timeout
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
@@ -1,56 +1,67 @@
+from collections.abc import Hashable, Iterable
 from typing import ClassVar, List
 from uuid import UUID
 
 from loguru import logger
 from pydantic import BaseModel
-from sqlalchemy import delete as sqlalchemy_delete, func
+from sqlalchemy import delete as sqlalchemy_delete, func, insert
 from sqlalchemy import update as sqlalchemy_update
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.dao.database import Base
+from app.log import log_sampler
+from app.metrics import timed_query
 
 
 class BaseDAO[T: Base]:
     model: ClassVar[type[T]]
 
     @classmethod
+    async def _prepare_rows(cls, session: AsyncSession, values: list[BaseModel]) -> list[dict]:
+        """Значения столбцов для записи; наследники заменяют здесь поля схемы ключами справочников"""
+        return [val.model_dump(exclude_unset=True) for val in values]
+
+    @classmethod
+    @timed_query
     async def find_one_or_none_by_id(cls, data_id: int | UUID, session: AsyncSession):
         # Найти запись по ID
-        logger.info(f"Поиск {cls.model.__name__} с ID: {data_id}")
+        logger.debug("Поиск {model} с ID: {data_id}", model=cls.model.__name__, data_id=data_id)
         try:
             query = select(cls.model).filter_by(id=data_id)
             result = await session.execute(query)
             record = result.unique().scalar_one_or_none()
             if record:
-                logger.info(f"Запись с ID {data_id} найдена.")
+                logger.debug("Запись с ID {data_id} найдена.", data_id=data_id)
             else:
-                logger.info(f"Запись с ID {data_id} не найдена.")
+                logger.debug("Запись с ID {data_id} не найдена.", data_id=data_id)
             return record
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при поиске записи с ID {data_id}: {e}")
+            logger.error("Ошибка при поиске записи с ID {data_id}: {error}", data_id=data_id, error=e)
             raise
 
     @classmethod
+    @timed_query
     async def find_one_or_none(cls, session: AsyncSession, filters: BaseModel):
         # Найти одну запись по фильтрам
         filter_dict = filters.model_dump(exclude_unset=True)
-        logger.info(f"Поиск одной записи {cls.model.__name__} по фильтрам: {filter_dict}")
+        logger.debug("Поиск одной записи {model} по фильтрам: {filters}", model=cls.model.__name__, filters=filter_dict)
         try:
             query = select(cls.model).filter_by(**filter_dict)
             result = await session.execute(query)
             record = result.unique().scalar_one_or_none()
             if record:
-                logger.info(f"Запись найдена по фильтрам: {filter_dict}")
+                logger.debug("Запись найдена по фильтрам: {filters}", filters=filter_dict)
             else:
-                logger.info(f"Запись не найдена по фильтрам: {filter_dict}")
+                logger.debug("Запись не найдена по фильтрам: {filters}", filters=filter_dict)
             return record
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при поиске записи по фильтрам {filter_dict}: {e}")
+            logger.error("Ошибка при поиске записи по фильтрам {filters}: {error}", filters=filter_dict, error=e)
             raise
 
     @classmethod
+    @timed_query
     async def find_all(cls, session: AsyncSession, filters: BaseModel | None, skip: int | None = None, limit: int | None = None):
         if filters:
             filter_dict = {
@@ -58,7 +69,7 @@ class BaseDAO[T: Base]:
             }
         else:
             filter_dict = {}
-        logger.info(f"Поиск всех записей {cls.model.__name__} по фильтрам: {filter_dict}")
+        logger.debug("Поиск всех записей {model} по фильтрам: {filters}", model=cls.model.__name__, filters=filter_dict)
         try:
             query = select(cls.model).filter_by(**filter_dict)
             if skip is not None:
@@ -67,43 +78,80 @@ class BaseDAO[T: Base]:
                 query = query.limit(limit)
             result = await session.execute(query)
             records = result.scalars().unique().all()
-            logger.info(f"Найдено {len(records)} записей.")
+            logger.debug("Найдено {count} записей.", count=len(records))
             return records
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при поиске всех записей по фильтрам {filter_dict}: {e}")
+            logger.error("Ошибка при поиске всех записей по фильтрам {filters}: {error}", filters=filter_dict, error=e)
             raise
 
     @classmethod
+    @timed_query
     async def add(cls, session: AsyncSession, values: BaseModel):
         # Добавить одну запись
-        values_dict = values.model_dump(exclude_unset=True)
-        logger.info(f"Добавление записи {cls.model.__name__} с параметрами: {values_dict}")
+        [values_dict] = await cls._prepare_rows(session, [values])
+        logger.debug("Добавление записи {model} с параметрами: {values}", model=cls.model.__name__, values=values_dict)
         new_instance = cls.model(**values_dict)
         session.add(new_instance)
         try:
             await session.flush()
-            logger.info(f"Запись {cls.model.__name__} успешно добавлена.")
+            logger.debug("Запись {model} успешно добавлена.", model=cls.model.__name__)
         except SQLAlchemyError as e:
             await session.rollback()
-            logger.error(f"Ошибка при добавлении записи: {e}")
+            logger.error("Ошибка при добавлении записи: {error}", error=e)
             raise e
         return new_instance
 
     @classmethod
+    @timed_query
     async def add_many(cls, session: AsyncSession, values: list[BaseModel]):
         # Добавить сразу несколько записей
-        objs = [cls.model(**val.model_dump(exclude_unset=True)) for val in values]
+        objs = [cls.model(**row) for row in await cls._prepare_rows(session, values)]
         session.add_all(objs)
         try:
             await session.flush()
-            logger.info(f"Добавлено {len(objs)} записей {cls.model.__name__}.")
+            logger.debug("Добавлено {count} записей {model}.", count=len(objs), model=cls.model.__name__)
         except SQLAlchemyError as e:
             await session.rollback()
-            logger.error(f"Ошибка при batch-добавлении записей: {e}")
+            logger.error("Ошибка при batch-добавлении записей: {error}", error=e)
             raise
         return objs
 
     @classmethod
+    @timed_query
+    async def bulk_insert[V: BaseModel](cls, session: AsyncSession, values: list[V]) -> list[V]:
+        """
+        Вставить пачку записей одним многострочным INSERT (Core, без ORM-объектов).
+
+        Пачка пишется в SAVEPOINT. Если она падает целиком, записи повторяются
+        по одной, каждая в своём SAVEPOINT: битая строка отбрасывается,
+        остальные остаются в текущей транзакции. Коммит — на вызывающей стороне.
+        Возвращает записи, которые удалось вставить.
+        """
+        if not values:
+            return []
+        rows = await cls._prepare_rows(session, values)
+
+        try:
+            async with session.begin_nested():
+                await session.execute(insert(cls.model), rows)
+            logger.debug("Вставлено {count} записей {model} одним запросом.", count=len(rows), model=cls.model.__name__)
+            return list(values)
+        except SQLAlchemyError as e:
+            logger.warning("Batch-вставка {model} не удалась, вставляем построчно: {error}", model=cls.model.__name__, error=e)
+
+        inserted = []
+        for value, row in zip(values, rows):
+            try:
+                async with session.begin_nested():
+                    await session.execute(insert(cls.model), [row])
+                inserted.append(value)
+            except SQLAlchemyError as e:
+                log_sampler.log("ERROR", ("bulk_insert", cls.model.__name__), "Ошибка при вставке записи {row}: {error}", row=row, error=e)
+        logger.info("Вставлено {inserted} из {total} записей {model}.", inserted=len(inserted), total=len(rows), model=cls.model.__name__)
+        return inserted
+
+    @classmethod
+    @timed_query
     async def delete_many(cls, session: AsyncSession, filters: BaseModel):
         # Удалить несколько записей
         filter_dict = filters.model_dump(exclude_unset=True)
@@ -114,20 +162,22 @@ class BaseDAO[T: Base]:
         try:
             result = await session.execute(query)
             await session.flush()
-            logger.info(f"Удалено {result.rowcount} записей {cls.model.__name__}.")
+            logger.debug("Удалено {count} записей {model}.", count=result.rowcount, model=cls.model.__name__)
             return result.rowcount
         except SQLAlchemyError as e:
             await session.rollback()
-            logger.error(f"Ошибка при batch-удалении записей: {e}")
+            logger.error("Ошибка при batch-удалении записей: {error}", error=e)
             raise
 
     @classmethod
+    @timed_query
     async def update(cls, session: AsyncSession, filters: BaseModel, values: BaseModel):
         # Обновить записи по фильтрам
         filter_dict = filters.model_dump(exclude_unset=True)
         values_dict = values.model_dump(exclude_unset=True)
-        logger.info(
-            f"Обновление записей {cls.model.__name__} по фильтру: {filter_dict} с параметрами: {values_dict}"
+        logger.debug(
+            "Обновление записей {model} по фильтру: {filters} с параметрами: {values}",
+            model=cls.model.__name__, filters=filter_dict, values=values_dict
         )
         query = (
             sqlalchemy_update(cls.model)
@@ -138,18 +188,19 @@ class BaseDAO[T: Base]:
         try:
             result = await session.execute(query)
             await session.flush()
-            logger.info(f"Обновлено {result.rowcount} записей.")
+            logger.debug("Обновлено {count} записей.", count=result.rowcount)
             return result.rowcount
         except SQLAlchemyError as e:
             await session.rollback()
-            logger.error(f"Ошибка при обновлении записей: {e}")
+            logger.error("Ошибка при обновлении записей: {error}", error=e)
             raise e
 
     @classmethod
+    @timed_query
     async def delete(cls, session: AsyncSession, filters: BaseModel):
         # Удалить записи по фильтру
         filter_dict = filters.model_dump(exclude_unset=True)
-        logger.info(f"Удаление записей {cls.model.__name__} по фильтру: {filter_dict}")
+        logger.debug("Удаление записей {model} по фильтру: {filters}", model=cls.model.__name__, filters=filter_dict)
         if not filter_dict:
             logger.error("Нужен хотя бы один фильтр для удаления.")
             raise ValueError("Нужен хотя бы один фильтр для удаления.")
@@ -158,30 +209,32 @@ class BaseDAO[T: Base]:
         try:
             result = await session.execute(query)
             await session.flush()
-            logger.info(f"Удалено {result.rowcount} записей.")
+            logger.debug("Удалено {count} записей.", count=result.rowcount)
             return result.rowcount
         except SQLAlchemyError as e:
             await session.rollback()
-            logger.error(f"Ошибка при удалении записей: {e}")
+            logger.error("Ошибка при удалении записей: {error}", error=e)
             raise e
 
     @classmethod
+    @timed_query
     async def count(cls, session: AsyncSession, filters: BaseModel | None = None):
         filter_dict = filters.model_dump(exclude_unset=True) if filters else {}
-        logger.info(f"Подсчет количества записей {cls.model.__name__} по фильтру: {filter_dict}")
+        logger.debug("Подсчет количества записей {model} по фильтру: {filters}", model=cls.model.__name__, filters=filter_dict)
         try:
             query = select(func.count(cls.model.id)).filter_by(**filter_dict)
             result = await session.execute(query)
             count = result.scalar()
-            logger.info(f"Найдено {count} записей.")
+            logger.debug("Найдено {count} записей.", count=count)
             return count
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при подсчете записей: {e}")
+            logger.error("Ошибка при подсчете записей: {error}", error=e)
             raise
 
     @classmethod
+    @timed_query
     async def bulk_update(cls, session: AsyncSession, records: List[BaseModel]):
-        logger.info(f"Массовое обновление записей {cls.model.__name__}")
+        logger.debug("Массовое обновление записей {model}", model=cls.model.__name__)
         try:
             updated_count = 0
             for record in records:
@@ -198,9 +251,38 @@ class BaseDAO[T: Base]:
                 result = await session.execute(stmt)
                 updated_count += result.rowcount
 
-            logger.info(f"Обновлено {updated_count} записей")
+            logger.debug("Обновлено {count} записей", count=updated_count)
             await session.flush()
             return updated_count
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при массовом обновлении: {e}")
+            logger.error("Ошибка при массовом обновлении: {error}", error=e)
             raise
+
+
+class LookupDAO[T: Base](BaseDAO[T]):
+    """Справочник с уникальным столбцом `key`: другие таблицы ссылаются на его id"""
+    key: ClassVar[str]
+
+    @classmethod
+    @timed_query
+    async def get_ids[K: Hashable](cls, session: AsyncSession, keys: Iterable[K]) -> dict[K, int]:
+        """id записей по значениям ключа; недостающие записи добавляются"""
+        keys = set(keys)
+        if not keys:
+            return {}
+        column = getattr(cls.model, cls.key)
+        stmt = select(column, cls.model.id).where(column.in_(keys))
+        ids = dict((await session.execute(stmt)).all())
+
+        missing = keys - ids.keys()
+        if missing:
+            try:
+                async with session.begin_nested():
+                    await session.execute(insert(cls.model), [{cls.key: key} for key in sorted(missing)])
+                logger.debug("В справочник {model} добавлено записей: {count}", model=cls.model.__name__, count=len(missing))
+            except IntegrityError as e:
+                # Те же значения успел добавить другой процесс
+                logger.debug("Записи {model} уже в справочнике: {error}", model=cls.model.__name__, error=e)
+            stmt = select(column, cls.model.id).where(column.in_(missing))
+            ids.update((await session.execute(stmt)).all())
+        return ids
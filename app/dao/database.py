@@ -2,13 +2,34 @@ from datetime import datetime
 from typing import Annotated, Any
 from sqlalchemy import func, TIMESTAMP
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase, declared_attr
-from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine, AsyncSession
-from app.config import database_url
+from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, AsyncSession
+from app.config import database_url, settings
+from app.dao.backends import create_storage_engine, TimedQueuePool
 
 
 
-engine = create_async_engine(url=database_url)
+# Чтение API и запись тиков идут через разные пулы, чтобы всплеск запросов
+# не задерживал запись планировщика
+engine = create_storage_engine(
+    url=database_url,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS,
+)
+write_engine = create_storage_engine(
+    url=database_url,
+    pool_size=settings.DB_WRITE_POOL_SIZE,
+    max_overflow=settings.DB_WRITE_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    statement_timeout_ms=settings.DB_WRITE_STATEMENT_TIMEOUT_MS,
+)
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+write_session_maker = async_sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
 str_uniq = Annotated[str, mapped_column(unique=True, nullable=False)]
 
 
@@ -29,3 +50,23 @@ class Base(AsyncAttrs, DeclarativeBase):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
 
 
+async def create_embedded_schema() -> None:
+    """Схема встроенной базы SQLite: миграции Alembic написаны под MySQL"""
+    if settings.DB_BACKEND == "sqlite":
+        async with write_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+
+async def dispose_engines() -> None:
+    """Закрыть соединения пулов: у aiosqlite каждое держит свой поток до закрытия"""
+    await engine.dispose()
+    await write_engine.dispose()
+
+
+def pool_stats() -> dict[str, dict[str, float]]:
+    """Заполненность пулов и время ожидания соединения"""
+    return {
+        name: eng.pool.stats()
+        for name, eng in (("read", engine), ("write", write_engine))
+        if isinstance(eng.pool, TimedQueuePool)
+    }
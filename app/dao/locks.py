@@ -0,0 +1,142 @@
+import os
+from typing import IO, Protocol
+
+from loguru import logger
+from sqlalchemy import NullPool, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.config import database_url, settings
+from app.dao.backends import create_storage_engine
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class LeaderLock(Protocol):
+    """Блокировка, которую в кластере держит не больше одного процесса"""
+
+    async def acquire(self) -> bool: ...
+
+    async def is_held(self) -> bool: ...
+
+    async def release(self) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class MySQLAdvisoryLock:
+    """
+    Именованная блокировка MySQL (GET_LOCK).
+
+    Блокировка принадлежит соединению, поэтому оно держится отдельно от пулов
+    всё время лидерства; если процесс упадёт или связь оборвётся, сервер снимет
+    блокировку сам и её заберёт другой коллектор.
+    """
+
+    def __init__(self, engine: AsyncEngine, name: str):
+        self.engine = engine
+        self.name = name
+        self._conn: AsyncConnection | None = None
+
+    async def acquire(self) -> bool:
+        if self._conn is not None:
+            return await self.is_held()
+        conn = await self.engine.connect()
+        try:
+            acquired = await conn.scalar(text("SELECT GET_LOCK(:name, 0)"), {"name": self.name})
+        except Exception:
+            await conn.close()
+            raise
+        if acquired != 1:
+            await conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    async def is_held(self) -> bool:
+        if self._conn is None:
+            return False
+        try:
+            owner = await self._conn.scalar(text("SELECT IS_USED_LOCK(:name) = CONNECTION_ID()"), {"name": self.name})
+        except Exception as e:
+            logger.error("Не удалось проверить блокировку {name}: {error}", name=self.name, error=e)
+            await self._drop()
+            return False
+        return owner == 1
+
+    async def release(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            await self._conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": self.name})
+        except Exception as e:
+            logger.warning("Не удалось снять блокировку {name}: {error}", name=self.name, error=e)
+        await self._drop()
+
+    async def close(self) -> None:
+        """Снять блокировку и закрыть собственный движок"""
+        await self.release()
+        await self.engine.dispose()
+
+    async def _drop(self) -> None:
+        conn, self._conn = self._conn, None
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+
+class FileLock:
+    """
+    Эксклюзивная блокировка файла для встроенной базы SQLite.
+
+    Работает в пределах одной машины — как и сама база SQLite. Блокировку
+    снимает ОС при завершении процесса.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: IO | None = None
+
+    async def acquire(self) -> bool:
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        file = open(self.path, "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            file.close()
+            return False
+        self._file = file
+        return True
+
+    async def is_held(self) -> bool:
+        return self._file is not None
+
+    async def release(self) -> None:
+        file, self._file = self._file, None
+        if file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        file.close()
+
+    async def close(self) -> None:
+        await self.release()
+
+
+def leader_lock() -> LeaderLock:
+    """Блокировка коллектора для текущего хранилища"""
+    if settings.DB_BACKEND == "sqlite":
+        return FileLock(f"{settings.SQLITE_PATH}.collector.lock")
+    return MySQLAdvisoryLock(create_storage_engine(database_url, poolclass=NullPool), settings.COLLECTOR_LOCK_NAME)
@@ -0,0 +1,191 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from typing import Literal
+
+from loguru import logger
+from sqlalchemy import make_url, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.dao.backends import TimedQueuePool, create_storage_engine
+from app.log import log_sampler
+
+type LagProbe = Callable[[AsyncSession], Awaitable[float | None]]
+
+
+async def mysql_replica_lag(session: AsyncSession) -> float | None:
+    """Отставание реплики MySQL в секундах; None — сервер не реплика или не MySQL"""
+    if session.bind.dialect.name != "mysql":
+        return None
+    row = (await session.execute(text("SHOW REPLICA STATUS"))).mappings().first()
+    if row is None:
+        return None
+    lag = row.get("Seconds_Behind_Source")
+    # NULL — репликация остановлена, данные могут быть сколь угодно старыми
+    return float("inf") if lag is None else float(lag)
+
+
+@dataclass
+class Replica:
+    name: str
+    session_maker: async_sessionmaker[AsyncSession]
+    healthy: bool = True
+    latency: float = 0.0
+    lag: float | None = None
+
+
+class ReplicaSet:
+    """
+    Реплики для чтения.
+
+    Перед выбором реплики раз в check_interval секунд все реплики проверяются
+    запросом SELECT 1, а при заданном max_lag — ещё и отставанием через
+    lag_probe (SHOW REPLICA STATUS требует привилегии REPLICATION CLIENT,
+    поэтому без порога не выполняется). Выбор — по кругу
+    или по наименьшей задержке проверки. Если здоровых реплик с допустимым
+    отставанием нет, choose() возвращает None и чтение идёт в основную базу.
+    """
+
+    def __init__(
+            self,
+            replicas: Sequence[Replica],
+            strategy: Literal["round_robin", "least_latency"] = "round_robin",
+            max_lag: float = 0,
+            check_interval: float = 10,
+            check_timeout: float = 2,
+            lag_probe: LagProbe | None = mysql_replica_lag
+    ):
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.lag_probe = lag_probe
+        self._next = 0
+        self._checked_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    def available(self) -> list[Replica]:
+        return [
+            replica for replica in self.replicas
+            if replica.healthy and not (self.max_lag and replica.lag is not None and replica.lag > self.max_lag)
+        ]
+
+    def choose(self) -> Replica | None:
+        candidates = self.available()
+        if not candidates:
+            return None
+        if self.strategy == "least_latency":
+            return min(candidates, key=lambda replica: replica.latency)
+        replica = candidates[self._next % len(candidates)]
+        self._next += 1
+        return replica
+
+    async def acquire(self) -> Replica | None:
+        """Проверить реплики, если пора, и выбрать одну для чтения"""
+        await self.refresh()
+        return self.choose()
+
+    async def refresh(self, force: bool = False) -> None:
+        if not force and not self._stale():
+            return
+        async with self._lock:
+            if not force and not self._stale():
+                return
+            await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+            self._checked_at = time.monotonic()
+
+    def _stale(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    async def check(self, replica: Replica) -> None:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._probe(replica), self.check_timeout)
+        except Exception as e:
+            if replica.healthy:
+                logger.warning("Реплика {replica} исключена из чтения: {error}", replica=replica.name, error=e)
+            replica.healthy = False
+            return
+
+        latency = time.perf_counter() - started
+        # Сглаживаем, чтобы одна медленная проверка не перебрасывала всё чтение на другую реплику
+        replica.latency = latency if replica.latency == 0 else 0.7 * replica.latency + 0.3 * latency
+        if not replica.healthy:
+            logger.info("Реплика {replica} снова доступна", replica=replica.name)
+        replica.healthy = True
+
+    async def _probe(self, replica: Replica) -> None:
+        async with replica.session_maker() as session:
+            await session.execute(text("SELECT 1"))
+            if self.max_lag and self.lag_probe is not None:
+                replica.lag = await self._probe_lag(replica, session)
+
+    async def _probe_lag(self, replica: Replica, session: AsyncSession) -> float | None:
+        """Отставание реплики; ошибка проверки — отставание неизвестно, а не недоступная реплика"""
+        try:
+            return await self.lag_probe(session)
+        except Exception as e:
+            log_sampler.log(
+                "WARNING", "replica.lag_probe", "Не удалось узнать отставание реплики {replica}: {error}",
+                replica=replica.name, error=e
+            )
+            return None
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.session_maker.kw["bind"].dispose()
+
+    def mark_failed(self, replica: Replica, error: Exception) -> None:
+        """Ошибка соединения во время запроса: не ждём следующей проверки"""
+        if replica.healthy:
+            logger.warning("Реплика {replica} исключена из чтения: {error}", replica=replica.name, error=error)
+        replica.healthy = False
+
+    def stats(self) -> dict[str, dict[str, float | bool | None]]:
+        stats = {}
+        for replica in self.replicas:
+            pool = replica.session_maker.kw["bind"].pool
+            stats[replica.name] = {
+                "healthy": replica.healthy,
+                "latency_seconds": replica.latency,
+                "lag_seconds": replica.lag,
+                **(pool.stats() if isinstance(pool, TimedQueuePool) else {}),
+            }
+        return stats
+
+
+def build_replica_set() -> ReplicaSet | None:
+    """Реплики из настроек DB_REPLICA_URLS; None, если они не заданы"""
+    if not settings.DB_REPLICA_URLS:
+        return None
+    replicas = [
+        Replica(
+            name=make_url(url).render_as_string(hide_password=True),
+            session_maker=async_sessionmaker(
+                create_storage_engine(
+                    url=url,
+                    pool_size=settings.DB_POOL_SIZE,
+                    max_overflow=settings.DB_MAX_OVERFLOW,
+                    pool_timeout=settings.DB_POOL_TIMEOUT,
+                    pool_recycle=settings.DB_POOL_RECYCLE,
+                    pool_pre_ping=settings.DB_POOL_PRE_PING,
+                    statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS,
+                ),
+                class_=AsyncSession,
+                expire_on_commit=False,
+            ),
+        )
+        for url in settings.DB_REPLICA_URLS
+    ]
+    return ReplicaSet(
+        replicas,
+        strategy=settings.DB_REPLICA_STRATEGY,
+        max_lag=settings.DB_REPLICA_MAX_LAG_SECONDS,
+        check_interval=settings.DB_REPLICA_CHECK_INTERVAL_SECONDS,
+    )
+
+
+replica_set = build_replica_set()
@@ -5,28 +5,47 @@ from functools import wraps
 from fastapi import Depends
 from loguru import logger
 from sqlalchemy import text
+from sqlalchemy.exc import InterfaceError, OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from app.dao.database import async_session_maker
+from app.dao.replicas import ReplicaSet, replica_set
 
 
 class DatabaseSessionManager:
-    """Менеджер асинхронных сессий"""
+    """
+    Менеджер асинхронных сессий.
 
-    def __init__(self, session_maker: async_sessionmaker[AsyncSession]):
+    Запись и транзакции всегда идут в основную базу, чтение без транзакции —
+    на реплики, если они заданы и доступны.
+    """
+
+    def __init__(self, session_maker: async_sessionmaker[AsyncSession], replicas: ReplicaSet | None = None):
         self.session_maker = session_maker
+        self.replicas = replicas
 
     @asynccontextmanager
-    async def create_session(self) -> AsyncGenerator[AsyncSession, None]:
+    async def create_session(self, read_only: bool = False) -> AsyncGenerator[AsyncSession, None]:
         """
         Создаёт и предоставляет новую сессию базы данных.
         Гарантирует закрытие сессии по завершении работы.
+
+        При `read_only=True` сессия открывается на реплике; если подходящей
+        реплики нет, — на основной базе.
         """
-        async with self.session_maker() as session:
+        session_maker, replica = self.session_maker, None
+        if read_only and self.replicas is not None:
+            replica = await self.replicas.acquire()
+            if replica is not None:
+                session_maker = replica.session_maker
+
+        async with session_maker() as session:
             try:
                 yield session
             except Exception as e:
-                logger.error(f"Ошибка при создании сессии базы данных: {e}")
+                logger.error("Ошибка при создании сессии базы данных: {error}", error=e)
+                if replica is not None and isinstance(e, (OperationalError, InterfaceError)):
+                    self.replicas.mark_failed(replica, e)
                 raise
             finally:
                 await session.close()
@@ -35,8 +54,9 @@ class DatabaseSessionManager:
     async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
         """
         Зависимость для FastAPI, возвращающая сессию без управления транзакцией.
+        Такие сессии только читают, поэтому могут идти на реплику.
         """
-        async with self.create_session() as session:
+        async with self.create_session(read_only=True) as session:
             yield session
 
     @asynccontextmanager
@@ -49,7 +69,7 @@ class DatabaseSessionManager:
             await session.commit()
         except Exception as e:
             await session.rollback()
-            logger.exception(f"Ошибка транзакции: {e}")
+            logger.exception("Ошибка транзакции: {error}", error=e)
             raise
 
 
@@ -89,7 +109,7 @@ class DatabaseSessionManager:
                         return result
                     except Exception as e:
                         await session.rollback()
-                        logger.error(f"Ошибка при выполнении транзакции: {e}")
+                        logger.error("Ошибка при выполнении транзакции: {error}", error=e)
                         raise
                     finally:
                         await session.close()
@@ -110,7 +130,7 @@ class DatabaseSessionManager:
 
 
 # Инициализация менеджера сессий базы данных
-session_manager = DatabaseSessionManager(async_session_maker)
+session_manager = DatabaseSessionManager(async_session_maker, replicas=replica_set)
 
 # Зависимости FastAPI для использования сессий
 SessionDep = session_manager.session_dependency
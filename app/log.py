@@ -0,0 +1,81 @@
+"""
+Настройка loguru для API и коллектора.
+
+Сообщения DAO и сервисов пишутся шаблонами loguru ("... {}", value), а не
+f-строками: loguru отбрасывает вызов ниже минимального уровня обработчиков до
+форматирования, поэтому отладочные сообщения при LOG_LEVEL=INFO почти ничего
+не стоят. Именованные аргументы шаблона попадают в record["extra"] и при
+LOG_JSON=true пишутся отдельными полями.
+"""
+import sys
+import time
+from collections.abc import Hashable
+from typing import Any, TextIO
+
+from loguru import logger
+
+from app.config import settings
+
+LOG_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}"
+
+
+def setup_logging(
+        level: str | None = None,
+        serialize: bool | None = None,
+        enqueue: bool | None = None,
+        sink: TextIO | Any = sys.stderr
+) -> int:
+    """
+    Заменить стандартный обработчик loguru (уровень DEBUG, запись в stderr из
+    вызывающего потока) на обработчик из настроек. С enqueue запись идёт через
+    очередь в фоновом потоке и не блокирует event loop.
+    """
+    logger.remove()
+    return logger.add(
+        sink,
+        level=level or settings.LOG_LEVEL,
+        format=LOG_FORMAT,
+        serialize=settings.LOG_JSON if serialize is None else serialize,
+        enqueue=settings.LOG_ENQUEUE if enqueue is None else enqueue,
+        backtrace=False,
+        diagnose=False,
+    )
+
+
+class LogSampler:
+    """
+    Ограничитель повторяющихся сообщений.
+
+    По каждому ключу за `interval` секунд выводится только первое сообщение;
+    остальные считаются, и их число дописывается к следующему выведенному.
+    Ключ — вид события (например, "coinbase.spot"), а не конкретное значение,
+    иначе 300 одинаковых ошибок по валютам дали бы 300 строк.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._state: dict[Hashable, tuple[float, int]] = {}
+
+    def allow(self, key: Hashable) -> int | None:
+        """Число пропущенных с прошлого вывода сообщений или None, если выводить не нужно"""
+        now = time.monotonic()
+        last, suppressed = self._state.get(key, (None, 0))
+        if last is not None and now - last < self.interval:
+            self._state[key] = (last, suppressed + 1)
+            return None
+        self._state[key] = (now, 0)
+        return suppressed
+
+    def log(self, level: str, key: Hashable, message: str, *args: Any, **kwargs: Any) -> None:
+        suppressed = self.allow(key)
+        if suppressed is None:
+            return
+        if suppressed:
+            message += f" (ещё {suppressed} таких же за {self.interval:g} с пропущено)"
+        logger.opt(depth=1).log(level, message, *args, **kwargs)
+
+    def clear(self) -> None:
+        self._state.clear()
+
+
+log_sampler = LogSampler(settings.LOG_SAMPLE_INTERVAL_SECONDS)
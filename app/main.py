@@ -1,17 +1,48 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from app.crypto.router import router
-from app.crypto.scheduler import start_scheduler
 from loguru import logger
+from app.config import settings
+from app.crypto.collector import run_collector
+from app.crypto.router import router
+from app.crypto.watcher import tick_watcher
+from app.crypto.services.FetchPipeline import fetch_pipeline
+from app.dao.analytics import analytics_engine
+from app.dao.database import create_embedded_schema, dispose_engines
+from app.dao.locks import leader_lock
+from app.dao.replicas import replica_set
+from app.log import setup_logging
+from app.metrics import MetricsMiddleware
+from app.monitoring import router as monitoring_router
+from app.responses import DecimalORJSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    await create_embedded_schema()
+    stop = asyncio.Event()
+    # Даже внутри API сбор ведёт только один воркер — тот, кто взял блокировку
+    collector = asyncio.create_task(run_collector(leader_lock(), stop)) if settings.RUN_SCHEDULER else None
+    # Тики может писать другой процесс: снимок /latest и кэш каждый воркер обновляет сам
+    watcher = asyncio.create_task(tick_watcher.run(stop)) if tick_watcher.interval > 0 else None
+    yield
+    stop.set()
+    for task in (collector, watcher):
+        if task is not None:
+            await task
+    await fetch_pipeline.close()
+    if analytics_engine is not None:
+        analytics_engine.dispose()
+    if replica_set is not None:
+        await replica_set.dispose()
+    await dispose_engines()
+    await logger.complete()
 
-app = FastAPI()
 
-try:
-    scheduler = start_scheduler()
-    if scheduler and scheduler.running:
-        logger.info("Scheduler успешно запущен")
-    else:
-        logger.error("Scheduler не запустился")
-except Exception as e:
-    logger.error(f"Ошибка при запуске scheduler: {e}")
+app = FastAPI(lifespan=lifespan, default_response_class=DecimalORJSONResponse)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(router)
+app.include_router(monitoring_router)
@@ -0,0 +1,302 @@
+"""
+Метрики процесса в текстовом формате Prometheus.
+
+Счётчики и гистограммы обновляются на горячем пути, поэтому устроены как
+можно проще: словарь по кортежу меток и бинарный поиск корзины, без блокировок
+(всё обновляется из одного event loop). Состояние пулов, кэша и реплик не
+дублируется в метриках, а читается в момент запроса /metrics через сборщики.
+Каждый воркер uvicorn отдаёт свои значения.
+"""
+import functools
+import inspect
+import math
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Sequence
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Any
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TICK_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+type Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    @abstractmethod
+    def render(self) -> list[str]:
+        """Строки значений метрики без заголовков HELP/TYPE"""
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[Labels, float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Счётчики по корзинам без накопления (последняя — +Inf), сумма и число наблюдений
+        self._values: dict[Labels, list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._values.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> list[str]:
+        lines = []
+        for labels, series in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), series[:-1]):
+                cumulative += count
+                le = _format_labels((*self.labelnames, "le"), (*labels, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+@dataclass
+class MetricFamily:
+    """Метрика, значения которой читаются в момент запроса /metrics"""
+    name: str
+    documentation: str
+    kind: str = "gauge"
+    labelnames: tuple[str, ...] = ()
+    samples: list[tuple[Labels, float]] = field(default_factory=list)
+
+    def add(self, value: float | None, *labels: str) -> None:
+        if value is not None:
+            self.samples.append((labels, float(value)))
+
+    def lines(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in self.samples),
+        ]
+
+
+type Collector = Callable[[], Iterable[MetricFamily]]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._collectors: list[Collector] = []
+
+    def register[M: Metric](self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Collector) -> Collector:
+        self._collectors.append(collector)
+        return collector
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for family in collector():
+                lines.extend(family.lines())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Время обработки запроса API", ("method", "route", "status")
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_duration_seconds", "Время метода DAO", ("dao", "method", "outcome")
+)
+TICK_SECONDS = registry.histogram(
+    "collector_tick_duration_seconds", "Длительность этапов тика сбора", ("stage",), buckets=TICK_BUCKETS
+)
+TICK_ROWS = registry.counter("collector_rows_saved_total", "Записанные строки цен", ("mode",))
+TICK_SKIPPED = registry.counter("collector_ticks_skipped_total", "Пропущенные или неудачные тики", ("reason",))
+LAST_TICK = registry.gauge("collector_last_tick_timestamp_seconds", "Время последнего записанного тика (unix)")
+FETCH_RESPONSES = registry.counter(
+    "fetch_responses_total", "Ответы внешних API по статусу; error — сетевая ошибка или таймаут", ("host", "status")
+)
+FETCH_SECONDS = registry.histogram("fetch_request_duration_seconds", "Время запроса к внешнему API", ("host",))
+FETCH_EVENTS = registry.counter(
+    "fetch_events_total", "Повторы, ответы 429 и отказы предохранителя", ("event",)
+)
+
+
+def timed_query[F: Callable[..., Any]](func: F) -> F:
+    """
+    Время метода DAO в db_query_duration_seconds.
+
+    Ставится под @classmethod: метка dao — класс, у которого метод вызван.
+    Для асинхронных генераторов замеряется вся выборка до последней строки.
+    """
+    method = func.__name__
+
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def stream_wrapper(cls, *args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                # aclosing: если потребитель бросил выборку, серверный курсор закрывается сразу
+                async with aclosing(func(cls, *args, **kwargs)) as stream:
+                    async for item in stream:
+                        yield item
+                outcome = "ok"
+            except GeneratorExit:
+                outcome = "closed"
+                raise
+            finally:
+                DB_QUERY_SECONDS.observe(time.perf_counter() - started, cls.__name__, method, outcome)
+
+        return stream_wrapper
+
+    @functools.wraps(func)
+    async def wrapper(cls, *args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await func(cls, *args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, cls.__name__, method, outcome)
+
+    return wrapper
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: время запроса по шаблону маршрута, методу и статусу.
+
+    Метка route — шаблон пути (/crypto/{currency}), а не сам путь, иначе число
+    рядов росло бы с каждой валютой; запросы мимо маршрутов идут под «unmatched».
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            )
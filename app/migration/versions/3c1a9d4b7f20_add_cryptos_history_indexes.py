@@ -0,0 +1,35 @@
+"""Add cryptos history indexes
+
+Revision ID: 3c1a9d4b7f20
+Revises: 8edce5e18f9b
+Create Date: 2026-10-18 10:12:03.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1a9d4b7f20'
+down_revision: Union[str, Sequence[str], None] = '8edce5e18f9b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # name + диапазон created_at; dynamic и price покрывают поиск экстремумов
+    op.create_index(
+        'ix_cryptos_name_created_at',
+        'cryptos',
+        ['name', 'created_at', 'dynamic', 'price'],
+        unique=False,
+    )
+    op.create_index('ix_cryptos_created_at', 'cryptos', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_cryptos_created_at', table_name='cryptos')
+    op.drop_index('ix_cryptos_name_created_at', table_name='cryptos')
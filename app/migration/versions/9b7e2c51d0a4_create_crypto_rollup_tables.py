@@ -0,0 +1,53 @@
+"""Create crypto rollup tables
+
+Revision ID: 9b7e2c51d0a4
+Revises: 3c1a9d4b7f20
+Create Date: 2026-10-18 12:41:55.306912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b7e2c51d0a4'
+down_revision: Union[str, Sequence[str], None] = '3c1a9d4b7f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_rollup_table(table_name: str) -> None:
+    op.create_table(table_name,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('open', sa.DECIMAL(precision=15, scale=6), nullable=False),
+    sa.Column('high', sa.DECIMAL(precision=15, scale=6), nullable=False),
+    sa.Column('low', sa.DECIMAL(precision=15, scale=6), nullable=False),
+    sa.Column('close', sa.DECIMAL(precision=15, scale=6), nullable=False),
+    sa.Column('min_dynamic', sa.Float(), nullable=True),
+    sa.Column('min_dynamic_price', sa.DECIMAL(precision=15, scale=6), nullable=True),
+    sa.Column('min_dynamic_at', sa.DateTime(), nullable=True),
+    sa.Column('max_dynamic', sa.Float(), nullable=True),
+    sa.Column('max_dynamic_price', sa.DECIMAL(precision=15, scale=6), nullable=True),
+    sa.Column('max_dynamic_at', sa.DateTime(), nullable=True),
+    sa.Column('ticks', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name', 'bucket', name=f'uq_{table_name}_name_bucket')
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _create_rollup_table('crypto_rollups_hourly')
+    _create_rollup_table('crypto_rollups_daily')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('crypto_rollups_daily')
+    op.drop_table('crypto_rollups_hourly')
@@ -0,0 +1,44 @@
+"""Mark days whose rollups miss ticks
+
+Revision ID: a6d2f8c3e419
+Revises: e2b9c4d61f07
+Create Date: 2026-10-18 21:14:37.602318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d2f8c3e419'
+down_revision: Union[str, Sequence[str], None] = 'e2b9c4d61f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('crypto_rollups_stale_days',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    # Единственный полный проход по тикам: дни, где тиков больше, чем учли
+    # дневные агрегаты (данные до агрегатов без backfill или неудачные
+    # обновления). Дальше дни помечает планировщик, а снимает backfill
+    op.execute(
+        'INSERT INTO crypto_rollups_stale_days (day) '
+        'SELECT t.day FROM ('
+        '  SELECT DATE(created_at) AS day, COUNT(*) AS ticks FROM cryptos GROUP BY DATE(created_at)'
+        ') t LEFT JOIN ('
+        '  SELECT DATE(bucket) AS day, SUM(ticks) AS ticks FROM crypto_rollups_daily GROUP BY DATE(bucket)'
+        ') r ON r.day = t.day '
+        'WHERE t.ticks > COALESCE(r.ticks, 0)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('crypto_rollups_stale_days')
@@ -0,0 +1,41 @@
+"""Add dynamic sums to rollups for candle average dynamic
+
+Revision ID: b3f7e1d92a58
+Revises: a6d2f8c3e419
+Create Date: 2026-10-18 22:03:11.845207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f7e1d92a58'
+down_revision: Union[str, Sequence[str], None] = 'a6d2f8c3e419'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUP_TABLES = ('crypto_rollups_hourly', 'crypto_rollups_daily')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ROLLUP_TABLES:
+        op.add_column(table, sa.Column('dynamic_sum', sa.Float(), nullable=True))
+        op.add_column(table, sa.Column('dynamic_ticks', sa.Integer(), nullable=True))
+    # У существующих агрегатов сумм нет: дни, тики которых ещё в базе, свечи
+    # и экстремумы берут из тиков, пока backfill не пересчитает агрегаты.
+    # Архивные дни пересчитать не по чему, их свечи остаются без средней динамики
+    op.execute(
+        'INSERT IGNORE INTO crypto_rollups_stale_days (day) '
+        'SELECT DISTINCT DATE(created_at) FROM cryptos'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ROLLUP_TABLES:
+        op.drop_column(table, 'dynamic_ticks')
+        op.drop_column(table, 'dynamic_sum')
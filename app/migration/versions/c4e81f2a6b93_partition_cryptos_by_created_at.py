@@ -0,0 +1,58 @@
+"""Partition cryptos by created_at
+
+Revision ID: c4e81f2a6b93
+Revises: 9b7e2c51d0a4
+Create Date: 2026-10-18 15:02:37.418260
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e81f2a6b93'
+down_revision: Union[str, Sequence[str], None] = '9b7e2c51d0a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _next_month(start: datetime) -> datetime:
+    return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # Секции есть только в MySQL; на SQLite хранение ограничивается DELETE по периодам
+    if bind.dialect.name != 'mysql':
+        return
+
+    # Столбец секционирования обязан входить в каждый уникальный ключ
+    op.execute('ALTER TABLE cryptos DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)')
+
+    # Существующие строки — по месяцам; дальше секции нарежет обслуживание
+    # (app.crypto.retention) с шагом CRYPTOS_PARTITION_INTERVAL
+    oldest = bind.execute(sa.text('SELECT MIN(created_at) FROM cryptos')).scalar()
+    now = datetime.now()
+    start = datetime(*(oldest or now).timetuple()[:2], 1)
+    until = _next_month(datetime(now.year, now.month, 1))
+    clauses = []
+    while start < until:
+        end = _next_month(start)
+        clauses.append(
+            f"PARTITION p{start:%Y%m} VALUES LESS THAN (UNIX_TIMESTAMP('{end:%Y-%m-%d %H:%M:%S}'))"
+        )
+        start = end
+    clauses.append('PARTITION p_future VALUES LESS THAN MAXVALUE')
+    op.execute(f"ALTER TABLE cryptos PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) ({', '.join(clauses)})")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    op.execute('ALTER TABLE cryptos REMOVE PARTITIONING')
+    op.execute('ALTER TABLE cryptos DROP PRIMARY KEY, ADD PRIMARY KEY (id)')
@@ -0,0 +1,85 @@
+"""Compact cryptos: symbols lookup table, no updated_at
+
+Revision ID: d7a3f5e20c18
+Revises: c4e81f2a6b93
+Create Date: 2026-10-18 17:26:09.118734
+
+"""
+from typing import Iterator, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3f5e20c18'
+down_revision: Union[str, Sequence[str], None] = 'c4e81f2a6b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHUNK_SIZE = 50_000
+
+
+def _id_chunks() -> Iterator[dict]:
+    low, high = op.get_bind().execute(sa.text('SELECT MIN(id), MAX(id) FROM cryptos')).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, CHUNK_SIZE):
+        yield {'start': start, 'end': start + CHUNK_SIZE}
+
+
+def _update_in_chunks(sql: str) -> None:
+    """UPDATE пачками по диапазону id, каждая пачка — своя транзакция: без долгих блокировок и огромного undo"""
+    chunks = list(_id_chunks())
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        for chunk in chunks:
+            bind.execute(sa.text(f'{sql} WHERE c.id >= :start AND c.id < :end'), chunk)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('symbols',
+    sa.Column('id', sa.SmallInteger(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.execute('INSERT INTO symbols (name) SELECT DISTINCT name FROM cryptos ORDER BY name')
+
+    # Пустой столбец в конце таблицы добавляется без её перестройки
+    op.add_column('cryptos', sa.Column('symbol_id', sa.SmallInteger(), nullable=True))
+    _update_in_chunks('UPDATE cryptos c JOIN symbols s ON s.name = c.name SET c.symbol_id = s.id')
+
+    # Всё остальное — одной перестройкой таблицы. Внешнего ключа нет:
+    # секционированные таблицы InnoDB их не поддерживают. ix_cryptos_id
+    # повторял первичный ключ (id, created_at)
+    op.execute(
+        'ALTER TABLE cryptos '
+        'MODIFY symbol_id SMALLINT NOT NULL, '
+        'DROP INDEX ix_cryptos_id, '
+        'DROP INDEX ix_cryptos_name_created_at, '
+        'ADD INDEX ix_cryptos_symbol_created_at (symbol_id, created_at, dynamic, price), '
+        'DROP COLUMN name, '
+        'DROP COLUMN updated_at'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        'ALTER TABLE cryptos '
+        'ADD COLUMN name VARCHAR(50) NULL, '
+        'ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP'
+    )
+    _update_in_chunks('UPDATE cryptos c JOIN symbols s ON s.id = c.symbol_id SET c.name = s.name')
+    op.execute(
+        'ALTER TABLE cryptos '
+        'MODIFY name VARCHAR(50) NOT NULL, '
+        'ADD INDEX ix_cryptos_id (id), '
+        'DROP INDEX ix_cryptos_symbol_created_at, '
+        'ADD INDEX ix_cryptos_name_created_at (name, created_at, dynamic, price), '
+        'DROP COLUMN symbol_id'
+    )
+    op.drop_table('symbols')
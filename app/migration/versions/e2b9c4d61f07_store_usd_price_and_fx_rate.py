@@ -0,0 +1,91 @@
+"""Store USD price and per-tick FX rate, RUB computed on read
+
+Revision ID: e2b9c4d61f07
+Revises: d7a3f5e20c18
+Create Date: 2026-10-18 19:02:41.530917
+
+"""
+from typing import Iterator, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b9c4d61f07'
+down_revision: Union[str, Sequence[str], None] = 'd7a3f5e20c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHUNK_SIZE = 50_000
+ROLLUP_TABLES = ('crypto_rollups_hourly', 'crypto_rollups_daily')
+ROLLUP_PRICES = ('open', 'high', 'low', 'close', 'min_dynamic_price', 'max_dynamic_price')
+ROLLUP_REQUIRED = ('open', 'high', 'low', 'close')
+
+
+def _id_chunks() -> Iterator[dict]:
+    low, high = op.get_bind().execute(sa.text('SELECT MIN(id), MAX(id) FROM cryptos')).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, CHUNK_SIZE):
+        yield {'start': start, 'end': start + CHUNK_SIZE}
+
+
+def _update_in_chunks(sql: str) -> None:
+    """UPDATE пачками по диапазону id, каждая пачка — своя транзакция: без долгих блокировок и огромного undo"""
+    chunks = list(_id_chunks())
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        for chunk in chunks:
+            bind.execute(sa.text(f'{sql} WHERE c.id >= :start AND c.id < :end'), chunk)
+
+
+def _alter_rollup_prices(column_type: str) -> None:
+    for table in ROLLUP_TABLES:
+        columns = ', '.join(
+            f'MODIFY {name} {column_type} {"NOT NULL" if name in ROLLUP_REQUIRED else "NULL"}'
+            for name in ROLLUP_PRICES
+        )
+        op.execute(f'ALTER TABLE {table} {columns}')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('fx_rates',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('rate', sa.DECIMAL(precision=18, scale=8), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('rate')
+    )
+    # Курс, по которому записаны старые тики, не сохранился, и цену в USD из их
+    # рублёвой не восстановить: price остаётся как есть под именем price_rub_legacy,
+    # а price_usd и fx_rate_id у этих строк пусты. Данные не переписываются
+    op.execute(
+        'ALTER TABLE cryptos '
+        'ADD COLUMN price_usd DECIMAL(28, 16) NULL, '
+        'ADD COLUMN fx_rate_id INT NULL, '
+        'CHANGE price price_rub_legacy DECIMAL(15, 6) NULL, '
+        'DROP INDEX ix_cryptos_symbol_created_at, '
+        'ADD INDEX ix_cryptos_symbol_created_at '
+        '(symbol_id, created_at, dynamic, price_usd, fx_rate_id, price_rub_legacy)'
+    )
+    _alter_rollup_prices('DECIMAL(38, 6)')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _alter_rollup_prices('DECIMAL(15, 6)')
+    _update_in_chunks(
+        'UPDATE cryptos c JOIN fx_rates f ON f.id = c.fx_rate_id '
+        'SET c.price_rub_legacy = ROUND(c.price_usd * f.rate, 6)'
+    )
+    op.execute(
+        'ALTER TABLE cryptos '
+        'CHANGE price_rub_legacy price DECIMAL(15, 6) NOT NULL, '
+        'DROP INDEX ix_cryptos_symbol_created_at, '
+        'ADD INDEX ix_cryptos_symbol_created_at (symbol_id, created_at, dynamic, price), '
+        'DROP COLUMN price_usd, '
+        'DROP COLUMN fx_rate_id'
+    )
+    op.drop_table('fx_rates')
@@ -0,0 +1,82 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.crypto.cache import response_cache
+from app.crypto.services.FetchPipeline import fetch_pipeline
+from app.crypto.services.TickerStream import ticker_stream
+from app.dao.database import pool_stats
+from app.dao.replicas import replica_set
+from app.metrics import MetricFamily, registry
+
+router = APIRouter(tags=["Monitoring"])
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Ключ TimedQueuePool.stats() -> (метрика, тип, описание)
+POOL_METRICS = {
+    "size": ("db_pool_size", "gauge", "Размер пула соединений"),
+    "checked_out": ("db_pool_checked_out", "gauge", "Выданные из пула соединения"),
+    "overflow": ("db_pool_overflow", "gauge", "Соединения сверх pool_size"),
+    "checkouts": ("db_pool_checkouts_total", "counter", "Получения соединения из пула"),
+    "timeouts": ("db_pool_timeouts_total", "counter", "Таймауты ожидания соединения"),
+    "wait_seconds_total": ("db_pool_wait_seconds_total", "counter", "Суммарное ожидание соединения"),
+    "wait_seconds_max": ("db_pool_wait_seconds_max", "gauge", "Самое долгое ожидание соединения"),
+}
+
+
+@registry.add_collector
+def pool_metrics() -> list[MetricFamily]:
+    pools = dict(pool_stats())
+    replicas = replica_set.stats() if replica_set is not None else {}
+    for name, stats in replicas.items():
+        pools[f"replica {name}"] = stats
+
+    families = {key: MetricFamily(name, doc, kind, ("pool",)) for key, (name, kind, doc) in POOL_METRICS.items()}
+    for pool, stats in pools.items():
+        for key, family in families.items():
+            family.add(stats.get(key), pool)
+
+    healthy = MetricFamily("db_replica_healthy", "Реплика доступна для чтения", labelnames=("replica",))
+    latency = MetricFamily("db_replica_latency_seconds", "Сглаженная задержка проверки реплики", labelnames=("replica",))
+    lag = MetricFamily("db_replica_lag_seconds", "Отставание реплики", labelnames=("replica",))
+    for name, stats in replicas.items():
+        healthy.add(stats["healthy"], name)
+        latency.add(stats["latency_seconds"], name)
+        lag.add(stats["lag_seconds"], name)
+    return [*families.values(), healthy, latency, lag]
+
+
+@registry.add_collector
+def cache_metrics() -> list[MetricFamily]:
+    stats = response_cache.stats()
+    families = [
+        MetricFamily("response_cache_hits_total", "Попадания в кэш ответов", "counter"),
+        MetricFamily("response_cache_misses_total", "Промахи кэша ответов", "counter"),
+        MetricFamily("response_cache_evictions_total", "Вытеснения из кэша ответов", "counter"),
+        MetricFamily("response_cache_entries", "Записей в кэше ответов"),
+        MetricFamily("response_cache_generation", "Поколение кэша (растёт с каждым тиком)"),
+    ]
+    for family, key in zip(families, ("hits", "misses", "evictions", "size", "generation")):
+        family.add(stats[key])
+    return families
+
+
+@registry.add_collector
+def collector_metrics() -> list[MetricFamily]:
+    breakers = MetricFamily("fetch_circuit_open", "Предохранитель эндпоинта разомкнут", labelnames=("endpoint",))
+    for endpoint, state in fetch_pipeline.breaker_states().items():
+        breakers.add(state != "closed", endpoint)
+
+    connected = MetricFamily("ticker_stream_connected", "Подписка на ticker активна")
+    messages = MetricFamily("ticker_stream_messages_total", "Принятые сообщения ticker", "counter")
+    reconnects = MetricFamily("ticker_stream_reconnects_total", "Переподключения к ticker", "counter")
+    connected.add(ticker_stream.connected)
+    messages.add(ticker_stream.messages)
+    reconnects.add(ticker_stream.reconnects)
+    return [breakers, connected, messages, reconnects]
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """Метрики процесса в текстовом формате Prometheus"""
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -0,0 +1,30 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+from app.config import settings
+
+
+def encode_decimal(value: Decimal) -> str | float:
+    """Decimal в JSON по политике JSON_DECIMAL_MODE: строкой ("1.5") или числом (1.5)"""
+    return float(value) if settings.JSON_DECIMAL_MODE == "float" else str(value)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return encode_decimal(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class DecimalORJSONResponse(ORJSONResponse):
+    """
+    JSON-ответ через orjson.
+
+    Ответы со схемой приходят сюда уже сериализованными pydantic по политике
+    JsonDecimal; Decimal из ответов без схемы кодируются по той же политике.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,137 @@
+"""
+Стоимость записи тика с логированием DAO: прежние f-строки на INFO через
+стандартный обработчик loguru (DEBUG, синхронная запись) против текущих
+шаблонов на DEBUG с обработчиком из setup_logging (INFO, очередь).
+
+Первый замер — только сообщения, которые add() пишет на каждую запись, без
+базы. Второй — тик целиком так, как его писали раньше: CryptoDAO.add на каждую
+валюту; здесь время в основном уходит на flush в базу. Логи пишутся во
+временный файл, а не в терминал.
+
+Запуск:
+    python -m benchmarks.bench_logging
+    python -m benchmarks.bench_logging --symbols 300 --ticks 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from loguru import logger
+from pydantic import BaseModel
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.crypto.dao import CryptoDAO
+from app.crypto.models import Base
+from app.crypto.schemas import SCryptoCreate
+from app.log import setup_logging
+
+
+class EagerLoggingCryptoDAO(CryptoDAO):
+    """CryptoDAO.add с прежним логированием: f-строки с model_dump на INFO"""
+
+    @classmethod
+    async def add(cls, session: AsyncSession, values: BaseModel):
+        [values_dict] = await cls._prepare_rows(session, [values])
+        logger.info(f"Добавление записи {cls.model.__name__} с параметрами: {values_dict}")
+        new_instance = cls.model(**values_dict)
+        session.add(new_instance)
+        try:
+            await session.flush()
+            logger.info(f"Запись {cls.model.__name__} успешно добавлена.")
+        except SQLAlchemyError as e:
+            await session.rollback()
+            logger.error(f"Ошибка при добавлении записи: {e}")
+            raise e
+        return new_instance
+
+
+def build_tick(symbols: int, tick: int) -> list[SCryptoCreate]:
+    created_at = datetime(2025, 1, 1, 0, tick % 60)
+    return [
+        SCryptoCreate(
+            name=f"SYM{i}",
+            price_usd=Decimal(1000 + i) + Decimal("0.123456"),
+            fx_rate=Decimal("90.5"),
+            dynamic=Decimal("1.25"),
+            created_at=created_at,
+        )
+        for i in range(symbols)
+    ]
+
+
+def eager_messages(model: str, values: dict) -> None:
+    logger.info(f"Добавление записи {model} с параметрами: {values}")
+    logger.info(f"Запись {model} успешно добавлена.")
+
+
+def lazy_messages(model: str, values: dict) -> None:
+    logger.debug("Добавление записи {model} с параметрами: {values}", model=model, values=values)
+    logger.debug("Запись {model} успешно добавлена.", model=model)
+
+
+def measure_messages(log, calls: int) -> float:
+    values = build_tick(1, 0)[0].model_dump(exclude_unset=True)
+    started = time.perf_counter()
+    for _ in range(calls):
+        log("Crypto", values)
+    return (time.perf_counter() - started) / calls
+
+
+async def measure(dao: type[CryptoDAO], session_maker, symbols: int, ticks: int) -> float:
+    timings = []
+    for tick in range(ticks):
+        rows = build_tick(symbols, tick)
+        async with session_maker() as session:
+            started = time.perf_counter()
+            for row in rows:
+                await dao.add(session=session, values=row)
+            timings.append(time.perf_counter() - started)
+            await session.rollback()
+    return statistics.median(timings)
+
+
+async def main(symbols: int, ticks: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    fd, log_path = tempfile.mkstemp(suffix=".log")
+    os.close(fd)
+    with open(log_path, "a", encoding="utf-8") as log_file:
+        cases = (
+            ("f-строки, DEBUG, синхронно", eager_messages, EagerLoggingCryptoDAO, dict(level="DEBUG", enqueue=False)),
+            ("шаблоны, DEBUG, синхронно", lazy_messages, CryptoDAO, dict(level="DEBUG", enqueue=False)),
+            ("шаблоны, INFO, очередь", lazy_messages, CryptoDAO, dict(level="INFO", enqueue=True)),
+        )
+        print("Сообщения add() на одну запись, без базы")
+        for title, log, _, options in cases:
+            setup_logging(sink=log_file, serialize=False, **options)
+            seconds = measure_messages(log, symbols * ticks)
+            await logger.complete()
+            print(f"  {title:<28} {seconds * 1e6:8.2f} мкс/запись")
+
+        print(f"Тик из {symbols} записей через add(), медиана из {ticks} тиков")
+        for title, _, dao, options in cases:
+            setup_logging(sink=log_file, serialize=False, **options)
+            seconds = await measure(dao, session_maker, symbols, ticks)
+            await logger.complete()
+            print(f"  {title:<28} {seconds * 1000:9.1f} ms   {seconds / symbols * 1e6:8.1f} мкс/запись")
+
+    logger.remove()
+    os.remove(log_path)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=300)
+    parser.add_argument("--ticks", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.symbols, args.ticks))
@@ -0,0 +1,90 @@
+"""
+Накладные расходы метрик на горячем пути: одно наблюдение гистограммы,
+обёртка timed_query вокруг метода DAO и MetricsMiddleware на запрос.
+
+База данных не нужна: метод DAO и эндпоинт ничего не делают, поэтому
+разница целиком приходится на инструментирование.
+
+Запуск:
+    python -m benchmarks.bench_metrics
+    python -m benchmarks.bench_metrics --calls 200000 --requests 5000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.metrics import Histogram, MetricsMiddleware, timed_query
+
+
+class PlainDAO:
+    @classmethod
+    async def find(cls, value: int) -> int:
+        return value
+
+
+class TimedDAO:
+    @classmethod
+    @timed_query
+    async def find(cls, value: int) -> int:
+        return value
+
+
+def bench_observe(calls: int) -> float:
+    histogram = Histogram("bench_seconds", "bench", ("dao", "method", "outcome"))
+    started = time.perf_counter()
+    for i in range(calls):
+        histogram.observe(i * 1e-6, "CryptoDAO", "get_history", "ok")
+    return (time.perf_counter() - started) / calls
+
+
+async def bench_dao(dao: type, calls: int) -> float:
+    started = time.perf_counter()
+    for i in range(calls):
+        await dao.find(i)
+    return (time.perf_counter() - started) / calls
+
+
+def build_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+
+    @app.get("/ping/{name}")
+    async def ping(name: str):
+        return {"name": name}
+
+    return app
+
+
+async def bench_requests(app: FastAPI, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(100):
+            await client.get("/ping/warmup")
+        started = time.perf_counter()
+        for _ in range(requests):
+            await client.get("/ping/BTC")
+        return (time.perf_counter() - started) / requests
+
+
+async def main(calls: int, requests: int) -> None:
+    print(f"Histogram.observe            {bench_observe(calls) * 1e9:9.0f} нс")
+
+    plain = await bench_dao(PlainDAO, calls)
+    timed = await bench_dao(TimedDAO, calls)
+    print(f"Метод DAO без / с timed_query {plain * 1e9:9.0f} / {timed * 1e9:.0f} нс (+{(timed - plain) * 1e9:.0f} нс)")
+
+    plain = await bench_requests(build_app(False), requests)
+    timed = await bench_requests(build_app(True), requests)
+    print(f"Запрос без / с middleware     {plain * 1e6:9.1f} / {timed * 1e6:.1f} мкс (+{(timed - plain) * 1e6:.1f} мкс)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.requests))
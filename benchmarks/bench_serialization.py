@@ -0,0 +1,109 @@
+"""
+Сериализация больших списков CryptoHistoryResponse: стандартный JSONResponse
+FastAPI против orjson и против готового сериализатора pydantic, для обеих
+политик Decimal (строка и число).
+
+База данных не нужна: замеряется только путь «объекты -> байты ответа».
+
+Запуск:
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --rows 100000 --repeat 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import TypeAdapter, create_model
+
+from app.config import settings
+from app.crypto.schemas import CryptoHistoryResponse, json_decimal
+from app.responses import DecimalORJSONResponse
+
+
+def build_items(rows: int) -> list[CryptoHistoryResponse]:
+    start = datetime(2025, 1, 1)
+    return [
+        CryptoHistoryResponse(
+            id=i,
+            name=f"SYM{i % 300}",
+            price=Decimal(1000 + i % 500) + Decimal("0.123456"),
+            dynamic=Decimal(str(((i * 7) % 2000 - 1000) / 100)),
+            created_at=start + timedelta(minutes=i // 300),
+        )
+        for i in range(rows)
+    ]
+
+
+def history_model(mode: str) -> type[CryptoHistoryResponse]:
+    """CryptoHistoryResponse с заданной политикой Decimal"""
+    decimal = json_decimal(mode)
+    return create_model(
+        f"CryptoHistoryResponse_{mode}",
+        __base__=CryptoHistoryResponse,
+        price=(decimal, ...),
+        dynamic=(decimal | None, None),
+    )
+
+
+def fastapi_path(model: type, response_class: type[JSONResponse]) -> Callable[[list], Awaitable[bytes]]:
+    """Как FastAPI отдаёт значение эндпоинта с response_model: валидация, сериализация, render"""
+    field = create_model_field(name="response", type_=list[model], mode="serialization")
+
+    async def run(items: list) -> bytes:
+        content = await serialize_response(field=field, response_content=items, is_coroutine=True)
+        return response_class(content).body
+
+    return run
+
+
+def adapter_path(model: type) -> Callable[[list], Awaitable[bytes]]:
+    """Готовый сериализатор, как у эндпоинтов истории"""
+    adapter = TypeAdapter(list[model])
+
+    async def run(items: list) -> bytes:
+        return adapter.dump_json(items)
+
+    return run
+
+
+async def measure(run: Callable[[list], Awaitable[bytes]], items: list, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await run(items)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+async def main(rows: int, repeat: int) -> None:
+    base_items = build_items(rows)
+    print(f"{rows} строк, медиана из {repeat} замеров")
+
+    for mode in ("string", "float"):
+        model = history_model(mode)
+        items = [model.model_construct(**item.__dict__) for item in base_items]
+        settings.JSON_DECIMAL_MODE = mode
+        cases = {
+            "FastAPI + JSONResponse": fastapi_path(model, JSONResponse),
+            "FastAPI + DecimalORJSONResponse": fastapi_path(model, DecimalORJSONResponse),
+            "TypeAdapter.dump_json": adapter_path(model),
+        }
+        print(f"Decimal как {mode}:")
+        for name, run in cases.items():
+            seconds = await measure(run, items, repeat)
+            print(f"  {name:<34} {seconds * 1000:9.1f} ms   {rows / seconds:12,.0f} строк/с")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
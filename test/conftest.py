@@ -1,21 +1,37 @@
+import asyncio
 import os
+import tempfile
 from datetime import datetime
 
 import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
 from sqlalchemy import NullPool
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.crypto.models import Base, Crypto
+# По умолчанию тесты идут на встроенном SQLite и не требуют внешних сервисов
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.gettempdir(), "coinbaseparse_test.db"))
+os.environ.setdefault("RUN_SCHEDULER", "false")
+os.environ.setdefault("TICK_WATCH_INTERVAL_SECONDS", "0")
+os.environ.setdefault("LOG_ENQUEUE", "false")
+
+from app.crypto.dao import CryptoDAO, CryptoDailyDAO, CryptoHourlyDAO
+from app.crypto.models import Base
+from app.crypto.schemas import SCryptoCreate
 from app.config import get_database_url
+from app.crypto.cache import response_cache
+from app.crypto.services.FxRates import fx_rates
+from app.dao.backends import create_storage_engine
+from app.dao.database import dispose_engines
+from app.dao.replicas import replica_set
 from app.dao.session_maker import DatabaseSessionManager, session_manager
 from app.main import app
 
 
 TEST_DB_URL = os.getenv("TEST_DB_URL", get_database_url(for_tests=True))
 
-test_engine = create_async_engine(
+test_engine = create_storage_engine(
     TEST_DB_URL,
     future=True,
     echo=False,
@@ -37,8 +53,24 @@ async def override_db():
         yield session
 
 
+async def dispose_all() -> None:
+    await test_engine.dispose()
+    if replica_set is not None:
+        await replica_set.dispose()
+    await dispose_engines()
+
+
+@pytest.fixture(autouse=True, scope="session")
+def dispose_test_engines():
+    """Без dispose потоки соединений aiosqlite не дают интерпретатору завершиться"""
+    yield
+    asyncio.run(dispose_all())
+
+
 @pytest_asyncio.fixture(autouse=True, scope="function")
 async def init_db():
+    response_cache.clear()
+    fx_rates.clear()
     async with test_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield
@@ -58,26 +90,33 @@ def client():
 async def crypto_data():
     async with TestingSessionLocal.create_session() as session:
         rows = [
-            Crypto(
+            SCryptoCreate(
                 name="BTC",
-                price=100,
+                price_usd=100,
+                fx_rate=1,
                 dynamic=1.5,
                 created_at=datetime(2025, 1, 2, 12, 0)
             ),
-            Crypto(
+            SCryptoCreate(
                 name="BTC",
-                price=80,
+                price_usd=80,
+                fx_rate=1,
                 dynamic=-3.0,
                 created_at=datetime(2025, 1, 3, 12, 0)
             ),
-            Crypto(
+            SCryptoCreate(
                 name="ETH",
-                price=10.0,
+                price_usd=10.0,
+                fx_rate=1,
                 dynamic=0.5,
                 created_at=datetime(2025, 1, 2, 14, 0)
             ),
         ]
 
-        session.add_all(rows)
+        await CryptoDAO.bulk_insert(session=session, values=rows)
+        # Как в планировщике: каждый тик сразу дополняет агрегаты
+        for row in rows:
+            await CryptoHourlyDAO.apply_tick(session=session, rows=[row], tick_at=row.created_at)
+            await CryptoDailyDAO.apply_tick(session=session, rows=[row], tick_at=row.created_at)
         await session.commit()
         return rows
\ No newline at end of file
@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import exc, select, text
+from sqlalchemy.dialects import mysql, sqlite
+
+from app.crypto.models import Crypto
+from app.dao.backends import TimedQueuePool, create_storage_engine, statement_timeout
+
+
+@pytest.mark.asyncio
+async def test_pool_wait_stats(tmp_path):
+    """Пул считает выдачи соединений и таймауты ожидания"""
+    engine = create_storage_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    assert isinstance(engine.pool, TimedQueuePool)
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+
+        stats = engine.pool.stats()
+        assert stats["checkouts"] == 2
+        assert stats["timeouts"] == 1
+        assert stats["wait_seconds_max"] >= 0.05
+        assert stats["checked_out"] == 0
+    finally:
+        await engine.dispose()
+
+
+def test_statement_timeout_hint_only_for_mysql():
+    """Подсказка MAX_EXECUTION_TIME попадает только в запросы к MySQL"""
+    stmt = statement_timeout(select(Crypto.id), 0)
+    assert "MAX_EXECUTION_TIME(0)" in str(stmt.compile(dialect=mysql.dialect()))
+    assert "MAX_EXECUTION_TIME" not in str(stmt.compile(dialect=sqlite.dialect()))
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+
+from app.crypto.cache import TickCache, response_cache
+from app.crypto.dao import CryptoDAO
+from app.crypto.schemas import SCryptoCreate
+from test.conftest import TestingSessionLocal
+
+
+def test_lru_eviction():
+    """Вытесняется давно не читанная запись"""
+    cache = TickCache(max_size=2, ttl=60, max_items=100)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.stats() == {
+        "generation": 0, "size": 2, "hits": 2, "misses": 1, "evictions": 1
+    }
+
+
+def test_generation_and_limits():
+    """Новое поколение сбрасывает кэш, большие и просроченные ответы не отдаются"""
+    cache = TickCache(max_size=10, ttl=60, max_items=2)
+    cache.set("a", 1)
+    cache.set("big", [1, 2, 3])
+    cache.bump_generation()
+
+    assert cache.get("a") == (False, None)
+    assert cache.get("big") == (False, None)
+
+    expired = TickCache(max_size=10, ttl=-1, max_items=2)
+    expired.set("a", 1)
+    assert expired.get("a") == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_router_served_from_cache_until_next_tick(client, crypto_data):
+    """Повторный запрос не идёт в БД, пока не записан новый тик"""
+    params = {"dateFrom": "2025-01-01", "dateTo": "2025-01-10"}
+    first = client.get("/crypto/ETH", params=params).json()
+    hits = response_cache.hits
+
+    async with TestingSessionLocal.create_session() as session:
+        await CryptoDAO.bulk_insert(
+            session=session,
+            values=[SCryptoCreate(name="ETH", price_usd=11, fx_rate=1, dynamic=0.7, created_at=datetime(2025, 1, 2, 15, 0))]
+        )
+        await session.commit()
+
+    assert client.get("/crypto/ETH", params=params).json() == first
+    assert response_cache.hits == hits + 1
+
+    response_cache.bump_generation()
+    assert len(client.get("/crypto/ETH", params=params).json()) == 2
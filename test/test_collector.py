@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from app.crypto.collector import run_collector
+from app.dao.locks import FileLock, MySQLAdvisoryLock
+
+
+class FakeEngine:
+    def __init__(self):
+        self.disposed = False
+
+    async def dispose(self):
+        self.disposed = True
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.running = True
+
+    def shutdown(self, wait: bool = True):
+        self.running = False
+
+
+@pytest.mark.asyncio
+async def test_file_lock_single_holder(tmp_path):
+    """Файловую блокировку держит только один владелец"""
+    path = str(tmp_path / "collector.lock")
+    first, second = FileLock(path), FileLock(path)
+
+    assert await first.acquire()
+    assert not await second.acquire()
+    await first.release()
+    assert await second.acquire()
+    assert await second.is_held()
+    await second.release()
+
+
+@pytest.mark.asyncio
+async def test_only_leader_runs_scheduler(tmp_path):
+    """Из двух коллекторов собирает один; после его остановки сбор подхватывает второй"""
+    path = str(tmp_path / "collector.lock")
+    started: dict[str, list[FakeScheduler]] = {"a": [], "b": []}
+
+    def starter(name):
+        def start():
+            scheduler = FakeScheduler()
+            started[name].append(scheduler)
+            return scheduler
+        return start
+
+    stop_a, stop_b = asyncio.Event(), asyncio.Event()
+    task_a = asyncio.create_task(run_collector(FileLock(path), stop_a, check_interval=0.01, start=starter("a")))
+    await asyncio.sleep(0.05)
+    task_b = asyncio.create_task(run_collector(FileLock(path), stop_b, check_interval=0.01, start=starter("b")))
+    await asyncio.sleep(0.05)
+
+    assert len(started["a"]) == 1 and started["a"][0].running
+    assert started["b"] == []
+
+    stop_a.set()
+    await task_a
+    async with asyncio.timeout(2):
+        while not started["b"]:
+            await asyncio.sleep(0.01)
+
+    assert not started["a"][0].running
+    stop_b.set()
+    await task_b
+    assert not started["b"][0].running
+
+
+@pytest.mark.asyncio
+async def test_collector_disposes_lock_engine():
+    """Собственный движок блокировки MySQL закрывается, когда коллектор останавливается, даже не став ведущим"""
+    class Lock(MySQLAdvisoryLock):
+        async def acquire(self) -> bool:
+            return False
+
+    engine = FakeEngine()
+    stop = asyncio.Event()
+    task = asyncio.create_task(run_collector(Lock(engine, "collector"), stop, check_interval=0.01))
+    await asyncio.sleep(0.03)
+    assert not engine.disposed
+
+    stop.set()
+    await task
+    assert engine.disposed
@@ -0,0 +1,166 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from app.crypto.dao import CryptoDAO
+from app.crypto.models import Crypto, FxRate, Symbol
+from app.crypto.schemas import SCryptoCreate
+from test.conftest import TestingSessionLocal
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_tick():
+    """Весь тик пишется одним INSERT"""
+    rows = [
+        SCryptoCreate(name=f"C{i}", price_usd=Decimal(i + 1), fx_rate=1, dynamic=Decimal("0.1"))
+        for i in range(300)
+    ]
+    async with TestingSessionLocal.create_session() as session:
+        saved = await CryptoDAO.bulk_insert(session=session, values=rows)
+        await session.commit()
+
+        assert len(saved) == 300
+        assert await CryptoDAO.count(session=session) == 300
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_skips_bad_row():
+    """Битая строка не роняет весь тик"""
+    rows = [
+        SCryptoCreate(name="BTC", price_usd=Decimal("100"), fx_rate=1, dynamic=None),
+        SCryptoCreate.model_construct(name=None, price=Decimal("1"), dynamic=None),
+        SCryptoCreate(name="ETH", price_usd=Decimal("10"), fx_rate=1, dynamic=Decimal("0.5")),
+    ]
+    async with TestingSessionLocal.create_session() as session:
+        saved = await CryptoDAO.bulk_insert(session=session, values=rows)
+        await session.commit()
+
+        names = (await session.execute(select(Symbol.name).join_from(Crypto, Symbol))).scalars().all()
+        assert [row.name for row in saved] == ["BTC", "ETH"]
+        assert sorted(names) == ["BTC", "ETH"]
+
+
+@pytest.mark.asyncio
+async def test_ticks_reference_symbols():
+    """Валюта пишется в справочник один раз, тики ссылаются на неё по symbol_id"""
+    async with TestingSessionLocal.create_session() as session:
+        for price in (Decimal("100"), Decimal("101")):
+            await CryptoDAO.bulk_insert(session=session, values=[
+                SCryptoCreate(name="BTC", price_usd=price, fx_rate=1),
+                SCryptoCreate(name="ETH", price_usd=price / 4, fx_rate=1),
+            ])
+        await session.commit()
+
+        symbols = dict((await session.execute(select(Symbol.name, Symbol.id))).all())
+        rows = (await session.execute(select(Crypto.symbol_id, Crypto.price_usd).order_by(Crypto.id))).all()
+
+    assert sorted(symbols) == ["BTC", "ETH"]
+    assert [tuple(row) for row in rows] == [
+        (symbols["BTC"], Decimal("100")), (symbols["ETH"], Decimal("25")),
+        (symbols["BTC"], Decimal("101")), (symbols["ETH"], Decimal("25.25")),
+    ]
+    assert "updated_at" not in Crypto.__table__.columns
+
+
+@pytest.mark.asyncio
+async def test_prices_keep_precision():
+    """Цена в USD хранится без округления, в рублях отдаётся с 6 знаками, курс хранится один раз"""
+    fx_rate, tick_at = Decimal("91.23456789"), datetime(2025, 1, 2, 12, 0)
+    rows = [
+        SCryptoCreate(name=name, price_usd=Decimal(price), fx_rate=fx_rate, created_at=tick_at)
+        for name, price in (
+            ("PEPE", "0.0000000123456789"), ("SHIB", "0.0000123456789012"), ("BTC", "98765.43210987")
+        )
+    ]
+    async with TestingSessionLocal.create_session() as session:
+        await CryptoDAO.bulk_insert(session=session, values=rows)
+        await session.commit()
+        history = await CryptoDAO.get_history(session=session, date_from=date(2025, 1, 2), date_to=date(2025, 1, 2))
+        fx_rates = (await session.execute(select(FxRate.rate))).scalars().all()
+        stored = dict((await session.execute(select(Symbol.name, Crypto.price_usd).join(Symbol))).all())
+
+    assert stored["PEPE"] == Decimal("0.0000000123456789")
+    assert stored["SHIB"] == Decimal("0.0000123456789012")
+    prices = {name: price for _, name, price, _, _ in history}
+    assert prices["PEPE"] == Decimal("0.000001")
+    assert prices["SHIB"] == rows[1].price == Decimal("0.001126")
+    # SQLite хранит DECIMAL как REAL: у крупных цен точны не все знаки
+    assert prices["BTC"].quantize(Decimal("0.01")) == rows[2].price.quantize(Decimal("0.01"))
+    assert fx_rates == [fx_rate]
+
+
+@pytest.mark.asyncio
+async def test_stream_history_orders_within_tick_like_pages():
+    """Строки одного тика в потоковой выгрузке идут в том же порядке (created_at, id), что и страницы"""
+    tick_at = datetime(2025, 1, 2, 12, 0)
+    async with TestingSessionLocal.create_session() as session:
+        await CryptoDAO.bulk_insert(session=session, values=[
+            SCryptoCreate(name=name, price_usd=Decimal(i + 1), fx_rate=1, created_at=tick_at)
+            for i, name in enumerate(("ETH", "BTC", "SOL", "ADA"))
+        ])
+        await session.commit()
+        page = await CryptoDAO.get_history(session=session, date_from=date(2025, 1, 2), date_to=date(2025, 1, 2))
+        streamed = [
+            row
+            async for chunk in CryptoDAO.stream_history(
+                session=session, date_from=date(2025, 1, 2), date_to=date(2025, 1, 2), chunk_size=2
+            )
+            for row in chunk
+        ]
+
+    assert [row[0] for row in streamed] == [row[0] for row in page] == sorted((row[0] for row in page), reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_legacy_ticks_keep_rub_price():
+    """Тики до перехода на USD без курса читаются по сохранённой рублёвой цене"""
+    async with TestingSessionLocal.create_session() as session:
+        await CryptoDAO.bulk_insert(session=session, values=[
+            SCryptoCreate(name="BTC", price_usd=Decimal("2"), fx_rate=90, created_at=datetime(2025, 1, 2, 12, 1))
+        ])
+        symbol_id = (await session.execute(select(Symbol.id).where(Symbol.name == "BTC"))).scalar_one()
+        await session.execute(Crypto.__table__.insert(), [{
+            "symbol_id": symbol_id, "price_rub_legacy": Decimal("80.5"),
+            "dynamic": 1.5, "created_at": datetime(2025, 1, 2, 12, 0)
+        }])
+        await session.commit()
+        history = await CryptoDAO.get_history(session=session, date_from=date(2025, 1, 2), date_to=date(2025, 1, 2))
+
+    assert {created_at.minute: price for _, _, price, _, created_at in history} == {
+        0: Decimal("80.5"), 1: Decimal("180")
+    }
+
+
+@pytest.mark.asyncio
+async def test_ohlc_candles():
+    """open/close — первая и последняя запись свечи, high/low — экстремумы"""
+    ticks = [
+        (datetime(2025, 1, 2, 12, 0), 10, 1.0),
+        (datetime(2025, 1, 2, 12, 1), 15, 3.0),
+        (datetime(2025, 1, 2, 12, 2), 8, -1.0),
+        (datetime(2025, 1, 2, 12, 4), 12, 1.0),
+        (datetime(2025, 1, 2, 12, 5), 20, 2.0),
+    ]
+    async with TestingSessionLocal.create_session() as session:
+        await CryptoDAO.bulk_insert(session=session, values=[
+            SCryptoCreate(name="BTC", price_usd=price, fx_rate=1, dynamic=dynamic, created_at=created_at)
+            for created_at, price, dynamic in ticks
+        ])
+        await session.commit()
+
+        candles = await CryptoDAO.get_ohlc(
+            session=session,
+            currency="btc",
+            date_from=date(2025, 1, 2),
+            date_to=date(2025, 1, 2),
+            step_seconds=300
+        )
+
+    assert [(c.open, c.high, c.low, c.close, c.count) for c in candles] == [
+        (Decimal(10), Decimal(15), Decimal(8), Decimal(12), 4),
+        (Decimal(20), Decimal(20), Decimal(20), Decimal(20), 1),
+    ]
+    assert candles[0].avg_dynamic == 1.0
+
@@ -0,0 +1,154 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.config import settings
+from app.crypto.services.CryptoDataController import CryptoServices
+from app.crypto.services.FetchPipeline import FetchPipeline
+
+
+@pytest_asyncio.fixture
+async def coinbase_server(monkeypatch):
+    """Локальная замена Coinbase: спот, суточная статистика и курс RUB (поштучные запросы)"""
+    state = {"in_flight": 0, "max_in_flight": 0}
+
+    async def track(handler_result):
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(0.02)
+        state["in_flight"] -= 1
+        return handler_result
+
+    async def spot(request):
+        product = request.match_info["product"]
+        if product == "BAD-USD":
+            return await track(web.Response(status=404))
+        return await track(web.json_response({"data": {"amount": "2"}}))
+
+    async def stats(request):
+        return await track(web.json_response({"open": "100", "last": "110"}))
+
+    async def fx(request):
+        return web.json_response({"rates": {"RUB": 90.5}})
+
+    app = web.Application()
+    app.router.add_get("/v2/prices/{product}/spot", spot)
+    app.router.add_get("/products/{product}/stats", stats)
+    app.router.add_get("/fx", fx)
+    server = TestServer(app)
+    await server.start_server()
+
+    base_url = str(server.make_url("")).rstrip("/")
+    monkeypatch.setattr(settings, "COINBASE_API_URL", base_url)
+    monkeypatch.setattr(settings, "COINBASE_EXCHANGE_URL", base_url)
+    monkeypatch.setattr(settings, "FX_RATE_URL", f"{base_url}/fx")
+    monkeypatch.setattr(settings, "FETCH_BULK_ENABLED", False)
+    yield state
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_prices_and_changes_share_pipeline(coinbase_server):
+    """Оба типа запросов идут одновременно в пределах общего лимита"""
+    pipeline = FetchPipeline(max_concurrency=8, limit_per_host=8)
+    symbols = [f"C{i}" for i in range(10)] + ["BAD"]
+    try:
+        result = await CryptoServices.get_prices_and_changes(symbols, pipeline=pipeline)
+        session = await pipeline.get_session()
+        await CryptoServices.get_prices_and_changes(["C0"], pipeline=pipeline)
+        assert await pipeline.get_session() is session
+    finally:
+        await pipeline.close()
+
+    assert "BAD" not in result
+    assert result["C0"]["price_usd"] == Decimal("2")
+    assert result["C0"]["fx_rate"] == Decimal("90.5")
+    assert result["C0"]["dynamic"] == Decimal("10")
+    assert 1 < coinbase_server["max_in_flight"] <= 8
+
+
+@pytest.mark.asyncio
+async def test_tick_stats(coinbase_server):
+    """Статистика тика считает запросы и ошибки"""
+    pipeline = FetchPipeline(max_concurrency=4, limit_per_host=4)
+    try:
+        await CryptoServices.get_prices_and_changes(["BTC", "BAD"], pipeline=pipeline)
+    finally:
+        await pipeline.close()
+
+    tick = pipeline.last_tick
+    assert tick.symbols == 2
+    assert tick.requests == 5
+    assert tick.failures == 1
+    assert tick.fetch_seconds >= tick.slowest_request_seconds > 0
+
+
+@pytest.mark.asyncio
+async def test_bulk_sources_with_per_symbol_gaps(monkeypatch):
+    """Цены и статистика берутся пакетно, поштучно — только недостающие валюты"""
+    hits = {}
+
+    async def count(request, response):
+        hits[request.path] = hits.get(request.path, 0) + 1
+        return response
+
+    async def exchange_rates(request):
+        assert request.query["currency"] == "USD"
+        return await count(request, web.json_response(
+            {"data": {"currency": "USD", "rates": {"BTC": "0.00001", "ETH": "0.0004", "BAD": "0"}}}
+        ))
+
+    async def products_stats(request):
+        return await count(request, web.json_response({
+            "BTC-USD": {"stats_24hour": {"open": "100", "last": "105"}},
+            "ETH-EUR": {"stats_24hour": {"open": "100", "last": "50"}},
+        }))
+
+    async def spot(request):
+        return await count(request, web.json_response({"data": {"amount": "20"}}))
+
+    async def stats(request):
+        return await count(request, web.json_response({"open": "10", "last": "9"}))
+
+    async def fx(request):
+        return web.json_response({"rates": {"RUB": 100}})
+
+    app = web.Application()
+    app.router.add_get("/v2/exchange-rates", exchange_rates)
+    app.router.add_get("/products/stats", products_stats)
+    app.router.add_get("/v2/prices/{product}/spot", spot)
+    app.router.add_get("/products/{product}/stats", stats)
+    app.router.add_get("/fx", fx)
+    server = TestServer(app)
+    await server.start_server()
+    base_url = str(server.make_url("")).rstrip("/")
+    monkeypatch.setattr(settings, "COINBASE_API_URL", base_url)
+    monkeypatch.setattr(settings, "COINBASE_EXCHANGE_URL", base_url)
+    monkeypatch.setattr(settings, "FX_RATE_URL", f"{base_url}/fx")
+
+    pipeline = FetchPipeline(max_concurrency=4, limit_per_host=4)
+    try:
+        result = await CryptoServices.get_prices_and_changes(["BTC", "ETH", "SOL"], pipeline=pipeline)
+    finally:
+        await pipeline.close()
+        await server.close()
+
+    assert result["BTC"] == {
+        "name": "BTC", "price_usd": Decimal("100000"), "fx_rate": Decimal("100"), "dynamic": Decimal("5")
+    }
+    assert str(result["BTC"]["price_usd"]) == "100000.0000000000000000"
+    assert str(result["BTC"]["fx_rate"]) == "100.00000000"
+    assert result["ETH"]["price_usd"] == Decimal("2500")
+    assert result["ETH"]["dynamic"] == Decimal("-10")
+    assert result["SOL"]["price_usd"] == Decimal("20")
+    assert hits == {
+        "/v2/exchange-rates": 1,
+        "/products/stats": 1,
+        "/v2/prices/SOL-USD/spot": 1,
+        "/products/ETH-USD/stats": 1,
+        "/products/SOL-USD/stats": 1,
+    }
@@ -0,0 +1,179 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, UTC
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.config import settings
+from app.crypto.services.CryptoDataController import CryptoServices
+from app.crypto.services.FetchPipeline import CircuitOpenError, FetchError, FetchPipeline
+from app.crypto.services.FxRates import FxQuote, FxRateCache, FxRateUnavailable
+
+
+@pytest_asyncio.fixture
+async def flaky_server(monkeypatch):
+    """
+    Локальный сервер, который отвечает по сценарию: очередь статусов на путь,
+    после неё — 200. Счётчик запросов — в state["hits"].
+    """
+    state = {"hits": {}, "script": {}, "fx": {"rates": {"RUB": 95}}}
+
+    async def handler(request):
+        path = request.path
+        state["hits"][path] = state["hits"].get(path, 0) + 1
+        script = state["script"].get(path, [])
+        step = script.pop(0) if script else 200
+        if step == "slow":
+            await asyncio.sleep(0.5)
+            step = 200
+        if step == 429:
+            return web.Response(status=429, headers={"Retry-After": "0.2"})
+        if step != 200:
+            return web.Response(status=step)
+        if path == "/fx":
+            return web.json_response(state["fx"])
+        return web.json_response({"data": {"amount": "2"}})
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", handler)
+    server = TestServer(app)
+    await server.start_server()
+
+    base_url = str(server.make_url("")).rstrip("/")
+    monkeypatch.setattr(settings, "COINBASE_API_URL", base_url)
+    monkeypatch.setattr(settings, "COINBASE_EXCHANGE_URL", base_url)
+    monkeypatch.setattr(settings, "FX_RATE_URL", f"{base_url}/fx")
+    state["url"] = base_url
+    yield state
+    await server.close()
+
+
+def make_pipeline(**kwargs) -> FetchPipeline:
+    options = dict(max_concurrency=4, limit_per_host=4, retries=3, backoff_base=0.01, backoff_max=0.05)
+    return FetchPipeline(**{**options, **kwargs})
+
+
+@pytest.mark.asyncio
+async def test_retries_5xx_with_backoff(flaky_server):
+    """5xx повторяются, итоговый ответ — удачный"""
+    flaky_server["script"]["/a"] = [503, 502]
+    pipeline = make_pipeline()
+    pipeline.start_tick(1)
+    try:
+        data = await pipeline.fetch_json(f"{flaky_server['url']}/a")
+    finally:
+        await pipeline.close()
+
+    assert data == {"data": {"amount": "2"}}
+    assert flaky_server["hits"]["/a"] == 3
+    assert pipeline.finish_tick().retries == 2
+
+
+@pytest.mark.asyncio
+async def test_client_error_is_not_retried(flaky_server):
+    """404 не повторяется"""
+    flaky_server["script"]["/missing"] = [404]
+    pipeline = make_pipeline()
+    try:
+        with pytest.raises(FetchError) as error:
+            await pipeline.fetch_json(f"{flaky_server['url']}/missing")
+    finally:
+        await pipeline.close()
+
+    assert error.value.status == 404
+    assert flaky_server["hits"]["/missing"] == 1
+
+
+@pytest.mark.asyncio
+async def test_429_waits_for_retry_after(flaky_server):
+    """После 429 повтор ждёт Retry-After, а не короткий backoff"""
+    flaky_server["script"]["/limited"] = [429]
+    pipeline = make_pipeline()
+    pipeline.start_tick(1)
+    started = time.perf_counter()
+    try:
+        await pipeline.fetch_json(f"{flaky_server['url']}/limited")
+    finally:
+        await pipeline.close()
+
+    assert time.perf_counter() - started >= 0.2
+    assert pipeline.finish_tick().rate_limited == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_opens_and_recovers(flaky_server):
+    """Предохранитель размыкается после серии неудач и замыкается после пробного успеха"""
+    flaky_server["script"]["/down"] = [503] * 4
+    pipeline = make_pipeline(retries=1, breaker_threshold=2, breaker_reset=0.2)
+    url = f"{flaky_server['url']}/down"
+    try:
+        for _ in range(2):
+            with pytest.raises(FetchError):
+                await pipeline.fetch_json(url, endpoint="down")
+        with pytest.raises(CircuitOpenError):
+            await pipeline.fetch_json(url, endpoint="down")
+        assert flaky_server["hits"]["/down"] == 4
+
+        await asyncio.sleep(0.25)
+        assert await pipeline.fetch_json(url, endpoint="down") == {"data": {"amount": "2"}}
+        assert pipeline._breaker("down").state == "closed"
+    finally:
+        await pipeline.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_releases_breaker(flaky_server):
+    """Отменённый пробный запрос не оставляет предохранитель разомкнутым навсегда"""
+    flaky_server["script"]["/down"] = [503, 503, "slow"]
+    pipeline = make_pipeline(retries=0, breaker_threshold=2, breaker_reset=0.1)
+    url = f"{flaky_server['url']}/down"
+    try:
+        for _ in range(2):
+            with pytest.raises(FetchError):
+                await pipeline.fetch_json(url, endpoint="down")
+        await asyncio.sleep(0.15)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pipeline.fetch_json(url, endpoint="down"), 0.05)
+        assert await pipeline.fetch_json(url, endpoint="down") == {"data": {"amount": "2"}}
+        assert pipeline._breaker("down").state == "closed"
+    finally:
+        await pipeline.close()
+
+
+@pytest.mark.asyncio
+async def test_per_request_timeout(flaky_server):
+    """Медленный ответ обрывается по таймауту запроса и повторяется"""
+    flaky_server["script"]["/slow"] = ["slow"]
+    pipeline = make_pipeline()
+    try:
+        assert await pipeline.fetch_json(f"{flaky_server['url']}/slow", timeout=0.1) == {"data": {"amount": "2"}}
+    finally:
+        await pipeline.close()
+
+    assert flaky_server["hits"]["/slow"] == 2
+
+
+@pytest.mark.asyncio
+async def test_fx_rate_last_known_good(flaky_server):
+    """Без источника курса используется последний удачный, пока он не слишком стар"""
+    fx = FxRateCache(ttl=0, max_age=60)
+    pipeline = make_pipeline(retries=0)
+    try:
+        result = await CryptoServices.get_prices_and_changes(["BTC"], pipeline=pipeline, fx=fx)
+        assert result["BTC"]["price_usd"] == Decimal("2")
+        assert result["BTC"]["fx_rate"] == Decimal("95")
+
+        flaky_server["script"]["/fx"] = [503, 503]
+        quote = await fx.get_rate(pipeline)
+        assert quote.rate == Decimal("95")
+
+        fx.last_good = FxQuote(rate=Decimal("95"), fetched_at=datetime.now(UTC) - timedelta(minutes=5))
+        with pytest.raises(FxRateUnavailable):
+            await CryptoServices.get_prices_and_changes(["BTC"], pipeline=pipeline, fx=fx)
+    finally:
+        await pipeline.close()
@@ -0,0 +1,47 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.crypto.schemas import SCryptoCreate
+from app.crypto.snapshot import latest_prices
+
+
+@pytest.fixture
+def snapshot():
+    tick_at = datetime(2025, 1, 2, 12, 0)
+    rows = [
+        SCryptoCreate(name="ETH", price_usd=Decimal("10.5"), fx_rate=1, dynamic=None, created_at=tick_at),
+        SCryptoCreate(name="BTC", price_usd=Decimal("100"), fx_rate=1, dynamic=Decimal("1.5"), created_at=tick_at),
+    ]
+    yield latest_prices.publish(rows, tick_at)
+    latest_prices.clear()
+
+
+def test_latest_prices(client, snapshot):
+    """Последний тик отдаётся из памяти с ETag и Last-Modified"""
+    resp = client.get("/crypto/latest")
+
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] == snapshot.etag
+    assert resp.headers["Last-Modified"] == "Thu, 02 Jan 2025 12:00:00 GMT"
+    assert resp.json() == [
+        {"name": "BTC", "price": "100.000000", "dynamic": "1.5", "created_at": "2025-01-02T12:00:00"},
+        {"name": "ETH", "price": "10.500000", "dynamic": None, "created_at": "2025-01-02T12:00:00"},
+    ]
+
+
+def test_latest_prices_not_modified(client, snapshot):
+    """Повторный опрос с ETag или датой получает 304"""
+    by_etag = client.get("/crypto/latest", headers={"If-None-Match": snapshot.etag})
+    by_date = client.get("/crypto/latest", headers={"If-Modified-Since": "Thu, 02 Jan 2025 12:00:00 GMT"})
+    changed = client.get("/crypto/latest", headers={"If-None-Match": '"stale"'})
+
+    assert by_etag.status_code == 304
+    assert by_date.status_code == 304
+    assert changed.status_code == 200
+
+
+def test_latest_prices_before_first_tick(client):
+    """До первого тика — 503"""
+    assert client.get("/crypto/latest").status_code == 503
@@ -0,0 +1,52 @@
+import pytest
+from loguru import logger
+
+from app.log import LogSampler
+
+
+@pytest.fixture
+def messages():
+    """Единственный обработчик уровня INFO: стандартный DEBUG-обработчик loguru убран"""
+    messages = []
+    logger.remove()
+    handler_id = logger.add(messages.append, level="INFO", format="{message}")
+    yield messages
+    logger.remove(handler_id)
+
+
+class Expensive:
+    formatted = 0
+
+    def __format__(self, spec: str) -> str:
+        Expensive.formatted += 1
+        return "expensive"
+
+
+def test_below_level_not_formatted(messages):
+    """Сообщение ниже уровня обработчиков не форматируется"""
+    value = Expensive()
+    logger.debug("Значение {value}", value=value)
+    assert Expensive.formatted == 0
+
+    logger.info("Значение {value}", value=value)
+    assert Expensive.formatted == 1
+    assert messages[-1].strip() == "Значение expensive"
+
+
+def test_sampler_reports_suppressed(messages, monkeypatch):
+    """За интервал выводится одно сообщение по ключу, пропущенные считаются"""
+    now = [100.0]
+    monkeypatch.setattr("app.log.time.monotonic", lambda: now[0])
+    sampler = LogSampler(interval=60)
+
+    for symbol in ("BTC", "ETH", "SOL"):
+        sampler.log("WARNING", "coinbase.spot", "Нет цены {symbol}", symbol=symbol)
+    sampler.log("WARNING", "coinbase.stats", "Нет статистики {symbol}", symbol="BTC")
+    now[0] += 61
+    sampler.log("WARNING", "coinbase.spot", "Нет цены {symbol}", symbol="ADA")
+
+    assert [message.strip() for message in messages] == [
+        "Нет цены BTC",
+        "Нет статистики BTC",
+        "Нет цены ADA (ещё 2 таких же за 60 с пропущено)",
+    ]
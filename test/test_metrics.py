@@ -0,0 +1,38 @@
+from app.metrics import DB_QUERY_SECONDS, HTTP_REQUEST_SECONDS, Counter, Histogram
+
+
+def test_histogram_render():
+    """Корзины накопительные, значение на границе попадает в её корзину"""
+    histogram = Histogram("latency_seconds", "Задержка", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+    counter = Counter("errors_total", "Ошибки", ("message",))
+    counter.inc('say "hi"\n')
+
+    assert histogram.render() == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 3.65',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+    assert counter.render() == ['errors_total{message="say \\"hi\\"\\n"} 1']
+
+
+def test_metrics_endpoint(client, crypto_data):
+    """Запрос к API попадает в метрики маршрута и метода DAO, пулы — в метрики пулов"""
+    requests_before = HTTP_REQUEST_SECONDS.count("GET", "/crypto/{currency}", "200")
+    queries_before = DB_QUERY_SECONDS.count("CryptoDAO", "get_currency_history", "ok")
+
+    client.get("/crypto/BTC", params={"dateFrom": "2025-01-01", "dateTo": "2025-01-10"})
+    client.get("/nowhere")
+    resp = client.get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert HTTP_REQUEST_SECONDS.count("GET", "/crypto/{currency}", "200") == requests_before + 1
+    assert DB_QUERY_SECONDS.count("CryptoDAO", "get_currency_history", "ok") == queries_before + 1
+    assert HTTP_REQUEST_SECONDS.count("GET", "unmatched", "404") >= 1
+    assert "# TYPE http_request_duration_seconds histogram" in resp.text
+    assert 'db_pool_size{pool="read"}' in resp.text
+    assert "response_cache_misses_total" in resp.text
@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import NullPool, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.crypto.dao import CryptoDAO
+from app.crypto.models import Base, Symbol
+from app.crypto.schemas import SCryptoCreate
+from app.dao.backends import create_storage_engine
+from app.dao.replicas import Replica, ReplicaSet
+from app.dao.session_maker import DatabaseSessionManager
+from test.conftest import TestingSessionLocal
+
+
+async def make_replica(path, name: str) -> Replica:
+    """Отдельная база-«реплика» с одной строкой, по которой её можно узнать"""
+    engine = create_storage_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        await CryptoDAO.bulk_insert(session=session, values=[SCryptoCreate(name=name, price_usd=1, fx_rate=1)])
+        await session.commit()
+    return Replica(name=name, session_maker=session_maker)
+
+
+async def read_names(manager: DatabaseSessionManager, read_only: bool = True) -> list[str]:
+    async with manager.create_session(read_only=read_only) as session:
+        return list((await session.execute(select(Symbol.name))).scalars())
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replicas_round_robin(tmp_path):
+    """Чтение идёт на реплики по кругу, транзакционные сессии — в основную базу"""
+    replicas = ReplicaSet(
+        [await make_replica(tmp_path / "r1.db", "R1"), await make_replica(tmp_path / "r2.db", "R2")],
+        lag_probe=None,
+    )
+    manager = DatabaseSessionManager(TestingSessionLocal.session_maker, replicas=replicas)
+
+    assert [await read_names(manager) for _ in range(3)] == [["R1"], ["R2"], ["R1"]]
+    assert await read_names(manager, read_only=False) == []
+
+
+@pytest.mark.asyncio
+async def test_lagging_replica_falls_back_to_primary(tmp_path):
+    """Реплика, отстающая сильнее порога, не получает чтение; ошибка проверки отставания её не исключает"""
+    lag = {"R1": 30.0}
+
+    async def probe(session):
+        if lag["R1"] is None:
+            raise PermissionError("нет привилегии REPLICATION CLIENT")
+        return lag["R1"]
+
+    replicas = ReplicaSet([await make_replica(tmp_path / "r1.db", "R1")], max_lag=5, check_interval=0, lag_probe=probe)
+    manager = DatabaseSessionManager(TestingSessionLocal.session_maker, replicas=replicas)
+
+    assert await read_names(manager) == []
+
+    lag["R1"] = 1.0
+    assert await read_names(manager) == ["R1"]
+
+    lag["R1"] = None
+    assert await read_names(manager) == ["R1"]
+    assert (replicas.replicas[0].healthy, replicas.replicas[0].lag) == (True, None)
+
+
+@pytest.mark.asyncio
+async def test_lag_not_probed_without_threshold(tmp_path):
+    """Без max_lag отставание не проверяется"""
+    calls = []
+
+    async def probe(session):
+        calls.append(session)
+        return 30.0
+
+    replicas = ReplicaSet([await make_replica(tmp_path / "r1.db", "R1")], check_interval=0, lag_probe=probe)
+    manager = DatabaseSessionManager(TestingSessionLocal.session_maker, replicas=replicas)
+
+    assert await read_names(manager) == ["R1"]
+    assert calls == []
+
+
+def test_least_latency_strategy():
+    """Стратегия least_latency выбирает самую быструю здоровую реплику"""
+    fast = Replica(name="fast", session_maker=None, latency=0.01)
+    slow = Replica(name="slow", session_maker=None, latency=0.2)
+    down = Replica(name="down", session_maker=None, latency=0.001, healthy=False)
+    replicas = ReplicaSet([slow, fast, down], strategy="least_latency")
+
+    assert replicas.choose() is fast
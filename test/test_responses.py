@@ -0,0 +1,27 @@
+from datetime import datetime
+from decimal import Decimal
+
+from pydantic import TypeAdapter
+
+from app.config import settings
+from app.crypto.schemas import json_decimal
+from app.responses import DecimalORJSONResponse
+
+
+def test_decimal_policy_string_by_default():
+    """По умолчанию Decimal отдаётся строкой без потери точности"""
+    body = DecimalORJSONResponse({"price": Decimal("80.000000"), "dynamic": Decimal("1.5")}).body
+
+    assert body == b'{"price":"80.000000","dynamic":"1.5"}'
+    assert TypeAdapter(json_decimal("string")).dump_json(Decimal("1.5")) == b'"1.5"'
+
+
+def test_decimal_policy_float(monkeypatch):
+    """В режиме float Decimal отдаётся числом и в схемах, и в ответах без схемы"""
+    monkeypatch.setattr(settings, "JSON_DECIMAL_MODE", "float")
+
+    body = DecimalORJSONResponse({"price": Decimal("1.5"), "at": datetime(2025, 1, 2, 12, 0)}).body
+
+    assert body == b'{"price":1.5,"at":"2025-01-02T12:00:00"}'
+    assert TypeAdapter(json_decimal("float")).dump_json(Decimal("1.5")) == b"1.5"
+    assert TypeAdapter(json_decimal("float")).dump_python(Decimal("1.5")) == Decimal("1.5")
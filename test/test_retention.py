@@ -0,0 +1,90 @@
+import json
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+
+from app.crypto.dao import CryptoDAO
+from app.crypto.models import Crypto
+from app.crypto.retention import maintain_cryptos_storage, next_period, period_start, split_future_sql
+from app.crypto.schemas import SCryptoCreate
+from app.dao import archive
+from test.conftest import TestingSessionLocal
+
+pytest.importorskip("duckdb")
+
+
+def test_partition_periods_and_ddl():
+    """Границы периодов и REORGANIZE p_future"""
+    moment = datetime(2025, 1, 31, 17, 45)
+    assert period_start(moment, "day") == datetime(2025, 1, 31)
+    assert next_period(period_start(moment, "month"), "month") == datetime(2025, 2, 1)
+    assert next_period(datetime(2025, 12, 1), "month") == datetime(2026, 1, 1)
+
+    sql = split_future_sql([datetime(2025, 1, 31), datetime(2025, 2, 1)], "day")
+    assert sql == (
+        "ALTER TABLE cryptos REORGANIZE PARTITION p_future INTO ("
+        "PARTITION p20250131 VALUES LESS THAN (UNIX_TIMESTAMP('2025-02-01 00:00:00')), "
+        "PARTITION p20250201 VALUES LESS THAN (UNIX_TIMESTAMP('2025-02-02 00:00:00')), "
+        "PARTITION p_future VALUES LESS THAN MAXVALUE)"
+    )
+
+
+@pytest_asyncio.fixture
+async def expired_store(tmp_path, monkeypatch):
+    """Тики BTC и ETH за 1–4 января; всё раньше 3 января выгружено в Parquet и удалено из базы"""
+    async with TestingSessionLocal.create_session() as session:
+        await CryptoDAO.bulk_insert(session=session, values=[
+            SCryptoCreate(name=name, price_usd=price + day, fx_rate=1, dynamic=0.5 * day, created_at=datetime(2025, 1, day, hour))
+            for day in range(1, 5)
+            for hour in (9, 18)
+            for name, price in (("BTC", 100), ("ETH", 10))
+        ])
+        await session.commit()
+
+    store = archive.ParquetArchive(str(tmp_path))
+    monkeypatch.setattr(archive, "cryptos_archive", store)
+    await maintain_cryptos_storage(
+        now=datetime(2025, 1, 5, 0, 10),
+        session_maker=TestingSessionLocal.session_maker,
+        store=store,
+        retention_days=2
+    )
+    return store
+
+
+@pytest.mark.asyncio
+async def test_expired_periods_move_to_archive(expired_store):
+    """Периоды раньше срока хранения лежат в Parquet, в базе — только свежие тики"""
+    assert [(item.start, item.end) for item in expired_store.ranges()] == [
+        (datetime(2025, 1, 1), datetime(2025, 1, 2)),
+        (datetime(2025, 1, 2), datetime(2025, 1, 3)),
+    ]
+    async with TestingSessionLocal.create_session() as session:
+        oldest, count = (await session.execute(select(func.min(Crypto.created_at), func.count()))).one()
+    assert (oldest, count) == (datetime(2025, 1, 3, 9), 8)
+
+
+def test_history_reads_archive(client, expired_store):
+    """История и страницы по курсору сквозь границу архива, в том же порядке и формате"""
+    params = {"dateFrom": "2025-01-01", "dateTo": "2025-01-10"}
+    full = client.get("/crypto/BTC", params=params).json()
+    assert [item["created_at"] for item in full] == [
+        f"2025-01-0{day}T{hour}:00:00" for day in (4, 3, 2, 1) for hour in (18, "09")
+    ]
+    assert full[-1]["price"] == "101.000000"
+    assert full[-1]["dynamic"] == "0.5"
+
+    pages, cursor = [], None
+    while True:
+        resp = client.get("/crypto/BTC", params={**params, "limit": 3, **({"cursor": cursor} if cursor else {})})
+        pages.extend(resp.json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert pages == full
+
+    assert len(client.get("/crypto/", params=params).json()) == 16
+    lines = client.get("/crypto/", params={**params, "format": "ndjson"}).text.splitlines()
+    assert [json.loads(line)["created_at"] for line in lines][-2:] == ["2025-01-01T09:00:00", "2025-01-01T09:00:00"]
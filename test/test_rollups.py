@@ -0,0 +1,174 @@
+import re
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.exc import OperationalError
+
+from app.config import settings
+from app.crypto import scheduler
+from app.crypto.backfill import backfill
+from app.crypto.cache import response_cache
+from app.crypto.dao import CryptoDailyDAO, CryptoHourlyDAO, CryptoRollupStaleDAO
+from app.crypto.models import CryptoDaily, CryptoHourly
+from app.crypto.schemas import SCryptoCreate
+from app.crypto.services.CryptoQueryService import CryptoQueryService
+from test.conftest import TestingSessionLocal, test_engine
+
+
+async def apply(session, tick_at: datetime, price: str, dynamic: str | None):
+    rows = [SCryptoCreate(name="BTC", price_usd=Decimal(price), fx_rate=1, dynamic=dynamic, created_at=tick_at)]
+    await CryptoHourlyDAO.apply_tick(session=session, rows=rows, tick_at=tick_at)
+    await CryptoDailyDAO.apply_tick(session=session, rows=rows, tick_at=tick_at)
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_apply_tick_updates_rollups():
+    """Каждый тик дополняет часовой и дневной агрегат"""
+    async with TestingSessionLocal.create_session() as session:
+        await apply(session, datetime(2025, 1, 2, 12, 0), "100", "1.5")
+        await apply(session, datetime(2025, 1, 2, 12, 1), "120", "-2")
+        await apply(session, datetime(2025, 1, 2, 13, 0), "90", None)
+
+        hourly = (await session.execute(select(CryptoHourly).order_by(CryptoHourly.bucket))).scalars().all()
+        daily = (await session.execute(select(CryptoDaily))).scalars().one()
+
+    assert [(h.bucket.hour, h.open, h.high, h.low, h.close, h.ticks) for h in hourly] == [
+        (12, Decimal(100), Decimal(120), Decimal(100), Decimal(120), 2),
+        (13, Decimal(90), Decimal(90), Decimal(90), Decimal(90), 1),
+    ]
+    assert (daily.open, daily.close, daily.ticks) == (Decimal(100), Decimal(90), 3)
+    assert (daily.max_dynamic, daily.max_dynamic_price) == (1.5, Decimal(100))
+    assert (daily.min_dynamic, daily.min_dynamic_at) == (-2.0, datetime(2025, 1, 2, 12, 1))
+
+
+@pytest.mark.asyncio
+async def test_backfill_and_dynamic_range_from_rollups(client, crypto_data):
+    """Backfill строит агрегаты, эндпоинт динамики отвечает по ним так же, как по сырым данным"""
+    params = {"dateFrom": "2025-01-01", "dateTo": "2025-01-10"}
+    expected = client.get("/crypto/dynamic/BTC", params=params).json()
+
+    ticks = await backfill(date(2025, 1, 1), date(2025, 1, 10), session_maker=TestingSessionLocal.session_maker)
+    ticks_again = await backfill(session_maker=TestingSessionLocal.session_maker)
+
+    async with TestingSessionLocal.create_session() as session:
+        daily = (await session.execute(select(CryptoDaily).order_by(CryptoDaily.name))).scalars().all()
+        extremes = await CryptoDailyDAO.get_dynamic_extremes(
+            session=session, currency="BTC", date_from=date(2025, 1, 1), date_to=date(2025, 1, 10)
+        )
+
+    assert ticks == ticks_again == 3
+    assert [(d.name, d.bucket.day) for d in daily] == [("BTC", 2), ("BTC", 3), ("ETH", 2)]
+    assert [row.dynamic for row in extremes] == [1.5, -3.0]
+    response_cache.clear()
+    assert client.get("/crypto/dynamic/BTC", params=params).json() == expected
+
+
+@pytest.fixture
+def save_tick(monkeypatch):
+    monkeypatch.setattr(scheduler, "write_session_maker", TestingSessionLocal.session_maker)
+
+    async def save(tick_at: datetime, price: str, dynamic: str | None):
+        rows = [SCryptoCreate(name="BTC", price_usd=Decimal(price), fx_rate=1, dynamic=dynamic, created_at=tick_at)]
+        await scheduler.save_tick(rows, tick_at)
+    return save
+
+
+@pytest.fixture
+def statements():
+    """SQL, выполненный через тестовый движок"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+    event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+
+
+async def dynamic_range(date_from: date, date_to: date):
+    response_cache.clear()
+    async with TestingSessionLocal.create_session() as session:
+        return await CryptoQueryService.get_currency_dynamic_range(
+            session=session, currency="BTC", date_from=date_from, date_to=date_to
+        )
+
+
+@pytest.mark.asyncio
+async def test_dynamic_range_reads_no_ticks_when_rollups_complete(save_tick, statements):
+    """Полные агрегаты: экстремумы читаются только из них, тики не сканируются"""
+    await save_tick(datetime(2025, 1, 1, 9, 0), "90", "-4")
+    await save_tick(datetime(2025, 1, 2, 12, 0), "100", "1.5")
+    statements.clear()
+
+    result = await dynamic_range(date(2025, 1, 1), date(2025, 1, 10))
+
+    assert (result.max_dynamic.dynamic, result.min_dynamic.dynamic) == (1.5, -4.0)
+    assert statements
+    assert not [sql for sql in statements if re.search(r"\bcryptos\b", sql)]
+
+
+@pytest.mark.asyncio
+async def test_dynamic_range_fills_days_missing_from_rollups(save_tick, monkeypatch, statements):
+    """Дни, для которых агрегаты не обновились, считаются по тикам до backfill"""
+    monkeypatch.setattr(settings, "ROLLUPS_ENABLED", False)
+    await save_tick(datetime(2025, 1, 1, 9, 0), "90", "-4")
+    monkeypatch.setattr(settings, "ROLLUPS_ENABLED", True)
+    await save_tick(datetime(2025, 1, 2, 12, 0), "100", "1.5")
+
+    async def fail(**kwargs):
+        raise OperationalError("UPDATE crypto_rollups_daily", {}, Exception("lock wait timeout"))
+    with monkeypatch.context() as patch:
+        patch.setattr(CryptoDailyDAO, "apply_tick", fail)
+        await save_tick(datetime(2025, 1, 2, 18, 0), "130", "7")
+
+    async with TestingSessionLocal.create_session() as session:
+        stale = await CryptoRollupStaleDAO.get_days(session=session, date_from=date(2025, 1, 1), date_to=date(2025, 1, 10))
+    assert stale == [date(2025, 1, 1), date(2025, 1, 2)]
+
+    result = await dynamic_range(date(2025, 1, 1), date(2025, 1, 10))
+    assert (result.max_dynamic.dynamic, result.max_dynamic.price) == (7.0, Decimal(130))
+    assert (result.min_dynamic.dynamic, result.min_dynamic.price) == (-4.0, Decimal(90))
+
+    await backfill(session_maker=TestingSessionLocal.session_maker)
+    statements.clear()
+    assert await dynamic_range(date(2025, 1, 1), date(2025, 1, 10)) == result
+    assert not [sql for sql in statements if re.search(r"\bcryptos\b", sql)]
+
+
+async def ohlc(resolution: str):
+    response_cache.clear()
+    async with TestingSessionLocal.create_session() as session:
+        return await CryptoQueryService.get_currency_ohlc(
+            session=session, currency="btc", date_from=date(2025, 1, 1), date_to=date(2025, 1, 10), resolution=resolution
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("resolution", ["1h", "1d"])
+async def test_candles_from_rollups_match_ticks(save_tick, monkeypatch, statements, resolution):
+    """Часовые и дневные свечи читаются из агрегатов и совпадают со свечами по тикам"""
+    for tick_at, price, dynamic in (
+        (datetime(2025, 1, 1, 9, 0), "90", "-4"),
+        (datetime(2025, 1, 1, 9, 30), "95", None),
+        (datetime(2025, 1, 1, 10, 0), "92", "2"),
+        (datetime(2025, 1, 2, 12, 0), "100", "1.5"),
+    ):
+        await save_tick(tick_at, price, dynamic)
+    monkeypatch.setattr(settings, "ROLLUPS_ENABLED", False)
+    expected = await ohlc(resolution)
+    monkeypatch.setattr(settings, "ROLLUPS_ENABLED", True)
+
+    statements.clear()
+    assert await ohlc(resolution) == expected
+    assert not [sql for sql in statements if re.search(r"\bcryptos\b", sql)]
+
+    # Тик без агрегатов: его день строится по тикам, остальные — по агрегатам
+    monkeypatch.setattr(settings, "ROLLUPS_ENABLED", False)
+    await save_tick(datetime(2025, 1, 2, 13, 0), "130", "7")
+    expected = await ohlc(resolution)
+    monkeypatch.setattr(settings, "ROLLUPS_ENABLED", True)
+    assert await ohlc(resolution) == expected
+    assert [candle.count for candle in expected.candles] == ([2, 1, 1, 1] if resolution == "1h" else [3, 2])
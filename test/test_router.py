@@ -1,4 +1,12 @@
+import csv
+import io
+import json
+
 import pytest
+from pydantic import TypeAdapter
+
+from app.config import settings
+from app.crypto.schemas import CryptoHistoryResponse
 
 
 @pytest.mark.asyncio
@@ -38,6 +46,24 @@ def test_get_currency_history(client, crypto_data):
     assert all(item["name"] == "BTC" for item in data)
 
 
+def test_history_json_matches_response_model(client, crypto_data):
+    """Быстрый путь сериализации отдаёт то же, что и валидация по CryptoHistoryResponse"""
+    resp = client.get("/crypto/BTC", params={"dateFrom": "2025-01-01", "dateTo": "2025-01-10"})
+
+    data = resp.json()
+    expected = TypeAdapter(list[CryptoHistoryResponse]).dump_python(
+        TypeAdapter(list[CryptoHistoryResponse]).validate_python(data), mode="json"
+    )
+    assert data == expected
+    assert data[0] == {
+        "id": data[0]["id"],
+        "name": "BTC",
+        "price": "80.000000",
+        "dynamic": "-3.0",
+        "created_at": "2025-01-03T12:00:00",
+    }
+
+
 @pytest.mark.asyncio
 def test_get_currency_dynamic_range(client, crypto_data):
     """max/min динамика"""
@@ -57,3 +83,85 @@ def test_get_currency_dynamic_range(client, crypto_data):
 
     assert data["max_dynamic"]["dynamic"] == "1.5"
     assert data["min_dynamic"]["dynamic"] == "-3.0"
+
+
+def test_get_currency_history_ndjson(client, crypto_data):
+    """Потоковая выдача NDJSON совпадает с обычным JSON"""
+    params = {"dateFrom": "2025-01-01", "dateTo": "2025-01-10"}
+    expected = client.get("/crypto/BTC", params=params).json()
+
+    resp = client.get("/crypto/BTC", params={**params, "format": "ndjson"})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in resp.text.splitlines()] == expected
+
+
+def test_get_all_crypto_history_csv_by_accept(client, crypto_data):
+    """CSV выбирается по заголовку Accept"""
+    resp = client.get(
+        "/crypto/",
+        params={"dateFrom": "2025-01-01", "dateTo": "2025-01-10"},
+        headers={"Accept": "text/csv"}
+    )
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert len(rows) == 3
+    assert rows[0]["name"] == "BTC"
+    assert rows[0]["dynamic"] == "-3.0"
+
+
+def test_get_all_crypto_history_keyset_pages(client, crypto_data):
+    """Постраничный обход по курсору отдаёт все записи по одному разу"""
+    params = {"dateFrom": "2025-01-01", "dateTo": "2025-01-10", "limit": 2}
+    expected = client.get("/crypto/", params={"dateFrom": "2025-01-01", "dateTo": "2025-01-10"}).json()
+
+    first = client.get("/crypto/", params=params)
+    assert first.status_code == 200
+    assert len(first.json()) == 2
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get("/crypto/", params={**params, "cursor": cursor})
+    assert second.status_code == 200
+    assert "X-Next-Cursor" not in second.headers
+    assert first.json() + second.json() == expected
+
+
+def test_history_paged_by_default(client, crypto_data, monkeypatch):
+    """Без limit история всё равно отдаётся страницей размера по умолчанию"""
+    monkeypatch.setattr(settings, "HISTORY_PAGE_SIZE_DEFAULT", 2)
+    resp = client.get("/crypto/", params={"dateFrom": "2025-01-01", "dateTo": "2025-01-10"})
+
+    assert resp.status_code == 200
+    assert len(resp.json()) == 2
+    assert "X-Next-Cursor" in resp.headers
+
+
+def test_get_currency_history_bad_cursor(client, crypto_data):
+    """Битый курсор — 400"""
+    resp = client.get(
+        "/crypto/BTC",
+        params={"dateFrom": "2025-01-01", "dateTo": "2025-01-10", "cursor": "not-a-cursor"}
+    )
+
+    assert resp.status_code == 400
+
+
+def test_get_currency_ohlc(client, crypto_data):
+    """Дневные свечи по валюте"""
+    resp = client.get(
+        "/crypto/ohlc/btc",
+        params={"dateFrom": "2025-01-01", "dateTo": "2025-01-10", "resolution": "1d"}
+    )
+
+    assert resp.status_code == 200
+
+    data = resp.json()
+    assert data["currency"] == "BTC"
+    assert [c["bucket"] for c in data["candles"]] == ["2025-01-02T00:00:00", "2025-01-03T00:00:00"]
+    assert data["candles"][1]["close"] == "80.000000"
+    assert data["candles"][1]["count"] == 1
+
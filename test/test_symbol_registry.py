@@ -0,0 +1,80 @@
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.crypto.services.SymbolRegistry import SymbolRegistry
+
+PRODUCTS = [
+    {"base_currency": "BTC", "status": "online"},
+    {"base_currency": "ETH", "status": "online"},
+    {"base_currency": "BTC", "status": "online"},
+    {"base_currency": "OLD", "status": "delisted"},
+]
+
+
+@pytest_asyncio.fixture
+async def products_server():
+    """Локальная замена /products с поддержкой ETag"""
+    state = {"requests": [], "fail": False}
+
+    async def products(request):
+        state["requests"].append(request.headers.get("If-None-Match"))
+        if state["fail"]:
+            return web.Response(status=503)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.json_response(PRODUCTS, headers={"ETag": '"v1"'})
+
+    app = web.Application()
+    app.router.add_get("/products", products)
+    server = TestServer(app)
+    await server.start_server()
+    yield server, state
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_symbols_cached_within_ttl(products_server, tmp_path):
+    """В пределах TTL список отдаётся из памяти"""
+    server, state = products_server
+    registry = SymbolRegistry(str(server.make_url("/products")), ttl=60, cache_file=str(tmp_path / "s.json"))
+
+    assert await registry.get_symbols() == ["BTC", "ETH"]
+    assert await registry.get_symbols() == ["BTC", "ETH"]
+    assert len(state["requests"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_conditional_refresh(products_server, tmp_path):
+    """После TTL запрос идёт с If-None-Match, 304 сохраняет список"""
+    server, state = products_server
+    registry = SymbolRegistry(str(server.make_url("/products")), ttl=0, cache_file=str(tmp_path / "s.json"))
+
+    await registry.get_symbols()
+    assert await registry.get_symbols() == ["BTC", "ETH"]
+    assert state["requests"] == [None, '"v1"']
+
+
+@pytest.mark.asyncio
+async def test_last_known_good_survives_restart(products_server, tmp_path):
+    """Сохранённый список используется, если Coinbase недоступен"""
+    server, state = products_server
+    cache_file = str(tmp_path / "s.json")
+    await SymbolRegistry(str(server.make_url("/products")), ttl=60, cache_file=cache_file).get_symbols()
+
+    state["fail"] = True
+    restarted = SymbolRegistry(str(server.make_url("/products")), ttl=60, cache_file=cache_file)
+
+    assert restarted.symbols == ["BTC", "ETH"]
+    assert await restarted.get_symbols() == ["BTC", "ETH"]
+
+
+@pytest.mark.asyncio
+async def test_cache_file_without_directory(products_server, tmp_path, monkeypatch):
+    """Файл кэша можно задать одним именем, без каталога"""
+    server, _ = products_server
+    monkeypatch.chdir(tmp_path)
+    await SymbolRegistry(str(server.make_url("/products")), ttl=60, cache_file="s.json").get_symbols()
+
+    assert SymbolRegistry(str(server.make_url("/products")), ttl=60, cache_file="s.json").symbols == ["BTC", "ETH"]
@@ -0,0 +1,157 @@
+import asyncio
+from datetime import datetime, UTC
+from decimal import Decimal
+
+import aiohttp
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from sqlalchemy import select
+
+from app.crypto import scheduler
+from app.crypto.models import Crypto, FxRate, Symbol
+from app.crypto.services.FetchPipeline import FetchPipeline
+from app.crypto.services.FxRates import FxQuote, FxRateCache
+from app.crypto.services.TickerStream import TickerStream
+from app.crypto.snapshot import latest_prices
+from app.metrics import TICK_SKIPPED
+from test.conftest import TestingSessionLocal
+
+
+def ticker(product_id: str, price: str, sequence: int, open_24h: str | None = None) -> dict:
+    return {"type": "ticker", "product_id": product_id, "price": price, "open_24h": open_24h, "sequence": sequence}
+
+
+@pytest_asyncio.fixture
+async def ws_server():
+    """Локальная замена ws-feed: первое соединение обрывается сразу после подписки"""
+    state = {"subscriptions": [], "connections": 0}
+    messages = [
+        {"type": "subscriptions", "channels": [{"name": "ticker"}]},
+        ticker("BTC-USD", "100", 1, open_24h="90"),
+        ticker("BTC-USD", "110", 2, open_24h="90"),
+        ticker("BTC-USD", "50", 1, open_24h="90"),
+        ticker("ETH-EUR", "9", 7),
+        ticker("ETH-USD", "10", 3),
+    ]
+
+    async def feed(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        state["connections"] += 1
+        state["subscriptions"].append(await ws.receive_json())
+        if state["connections"] == 1:
+            await ws.close()
+            return ws
+        for message in messages:
+            await ws.send_json(message)
+        async for _ in ws:
+            pass
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/ws", feed)
+    server = TestServer(app)
+    await server.start_server()
+    state["url"] = str(server.make_url("/ws"))
+    yield state
+    await server.close()
+
+
+@pytest.fixture
+def fx():
+    fx = FxRateCache(ttl=3600, max_age=3600, url="http://fx.invalid")
+    fx.last_good = FxQuote(rate=Decimal("90"), fetched_at=datetime.now(UTC))
+    return fx
+
+
+@pytest.fixture(autouse=True)
+def test_sessions(monkeypatch):
+    monkeypatch.setattr(scheduler, "write_session_maker", TestingSessionLocal.session_maker)
+    yield
+    latest_prices.clear()
+
+
+async def stored_prices() -> list[tuple[str, Decimal, Decimal | None]]:
+    async with TestingSessionLocal.create_session() as session:
+        result = await session.execute(
+            select(Symbol.name, Crypto.price_usd * FxRate.rate, Crypto.dynamic)
+            .join_from(Crypto, Symbol)
+            .join_from(Crypto, FxRate)
+            .order_by(Crypto.id)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+@pytest.mark.asyncio
+async def test_stream_subscribes_and_reconnects(ws_server):
+    """Подписка на пары к USD, переподключение после обрыва, устаревшие и чужие сообщения пропускаются"""
+    stream = TickerStream(ws_server["url"], reconnect_delay=0.01)
+
+    async def symbols():
+        return ["BTC", "ETH"]
+
+    async with aiohttp.ClientSession() as session:
+        task = asyncio.create_task(stream.run(session, symbols))
+        try:
+            async with asyncio.timeout(5):
+                while stream.messages < 3:
+                    await asyncio.sleep(0.01)
+        finally:
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    assert stream.reconnects == 1
+    assert ws_server["subscriptions"][-1] == {
+        "type": "subscribe", "product_ids": ["BTC-USD", "ETH-USD"], "channels": ["ticker"]
+    }
+    assert stream.latest["BTC"].price == Decimal("110")
+    assert set(stream.pending()) == {"BTC", "ETH"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("symbols", [aiohttp.ClientError("products down"), []])
+async def test_tick_skipped_without_symbols(monkeypatch, symbols):
+    """Недоступный список валют на холодном старте — пропущенный тик, а не упавшая задача"""
+    class Registry:
+        async def get_symbols(self, session):
+            if isinstance(symbols, Exception):
+                raise symbols
+            return symbols
+
+    pipeline = FetchPipeline(max_concurrency=1, limit_per_host=1)
+    monkeypatch.setattr(scheduler, "symbol_registry", Registry())
+    monkeypatch.setattr(scheduler, "fetch_pipeline", pipeline)
+    skipped = TICK_SKIPPED.value("symbols_unavailable")
+    try:
+        await scheduler.scheduled_price_collection()
+    finally:
+        await pipeline.close()
+
+    assert TICK_SKIPPED.value("symbols_unavailable") == skipped + 1
+    assert await stored_prices() == []
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_only_changed_prices(fx):
+    """Сброс пишет только изменившиеся цены, снимок /latest дополняется, а не заменяется"""
+    stream = TickerStream("ws://unused")
+    pipeline = FetchPipeline(max_concurrency=1, limit_per_host=1)
+    stream.handle_message(ticker("BTC-USD", "110", 1, open_24h="100"))
+    stream.handle_message(ticker("ETH-USD", "10", 2))
+
+    await scheduler.flush_ticker_stream(stream, fx=fx, pipeline=pipeline)
+    assert sorted(await stored_prices()) == [("BTC", Decimal("9900"), Decimal("10")), ("ETH", Decimal("900"), None)]
+    assert stream.pending() == {}
+
+    # Повтор той же цены — не изменение
+    stream.handle_message(ticker("BTC-USD", "110", 3, open_24h="100"))
+    await scheduler.flush_ticker_stream(stream, fx=fx, pipeline=pipeline)
+    assert len(await stored_prices()) == 2
+
+    stream.handle_message(ticker("BTC-USD", "120", 4, open_24h="100"))
+    await scheduler.flush_ticker_stream(stream, fx=fx, pipeline=pipeline)
+    assert (await stored_prices())[-1] == ("BTC", Decimal("10800"), Decimal("20"))
+    assert latest_prices.snapshot.count == 2
@@ -0,0 +1,46 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.crypto.cache import TickCache
+from app.crypto.dao import CryptoDAO
+from app.crypto.schemas import SCryptoCreate
+from app.crypto.snapshot import LatestPrices
+from app.crypto.watcher import TickWatcher
+from test.conftest import TestingSessionLocal
+
+
+async def write_tick(tick_at: datetime, prices: dict[str, str]) -> None:
+    async with TestingSessionLocal.create_session() as session:
+        await CryptoDAO.bulk_insert(session=session, values=[
+            SCryptoCreate(name=name, price_usd=Decimal(price), fx_rate=90, created_at=tick_at)
+            for name, price in prices.items()
+        ])
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_watcher_follows_ticks_written_elsewhere():
+    """Тики другого процесса попадают в снимок /latest, кэш сбрасывается только на новом тике"""
+    prices, cache = LatestPrices(), TickCache(max_size=10, ttl=60, max_items=100)
+    watcher = TickWatcher(TestingSessionLocal.session_maker, prices=prices, cache=cache)
+
+    assert await watcher.poll() is False
+    assert prices.snapshot is None
+
+    await write_tick(datetime(2025, 1, 2, 12, 0), {"BTC": "100", "ETH": "10"})
+    await write_tick(datetime(2025, 1, 2, 12, 1), {"BTC": "101"})
+    assert await watcher.poll() is True
+    assert (prices.snapshot.tick_at, prices.snapshot.count, cache.generation) == (datetime(2025, 1, 2, 12, 1), 2, 1)
+
+    assert await watcher.poll() is False
+    assert cache.generation == 1
+
+    await write_tick(datetime(2025, 1, 2, 12, 2), {"ETH": "11"})
+    assert await watcher.poll() is True
+    assert (prices.snapshot.count, cache.generation) == (2, 2)
+    assert {item["name"]: Decimal(item["price"]) for item in json.loads(prices.snapshot.body)} == {
+        "BTC": Decimal("9090"), "ETH": Decimal("990")
+    }